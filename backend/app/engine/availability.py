@@ -0,0 +1,203 @@
+"""Per-user availability bitmaps at 30-minute slot granularity.
+
+A calendar covers a fixed horizon. Three layers of blocked time are
+precomputed once:
+
+* leave: per user, blocks every shift type
+* clinic: OPD clinic core hours from the user's post clinic_constraints
+  (or UserConstraints.opd_days). It blocks day calls on the clinic day,
+  and blocks night calls the evening before when the night's post-call
+  recovery would run into the clinic.
+* protected: PROTECTED_TEACHING on Wednesdays and the daily HANDOVER_BLOCKS,
+  shared by all users, blocking non-call sessions such as supervision
+
+Checks for a shift are bit tests over the handful of slots it covers.
+Leave can be added or removed incrementally without rebuilding the
+calendar.
+"""
+from datetime import datetime, time, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+from .shift_store import to_minutes
+
+SLOT_MINUTES = 30
+
+WEEKDAYS = ("MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN")
+TEACHING_DAY = "WED"
+CLINIC_HOURS = (time(9, 0), time(17, 0))
+# Post-call recovery that a night call needs clear of clinics on the following day
+NIGHT_RECOVERY = timedelta(hours=8)
+
+CLINIC_BLOCKED_TYPES = frozenset({"day_call", "night_call"})
+PROTECTED_BLOCKED_TYPES = frozenset({"supervision"})
+
+
+def _set_range(buf: bytearray, i0: int, i1: int, value: bool = True):
+    for i in range(max(i0, 0), min(i1, len(buf) * 8)):
+        if value:
+            buf[i >> 3] |= 1 << (i & 7)
+        else:
+            buf[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+
+def clinic_span(start: datetime, end: datetime, shift_type: str) -> Tuple[datetime, datetime]:
+    """The span a shift must keep clear of clinic hours (night calls add post-call recovery)"""
+    return (start, end + NIGHT_RECOVERY) if shift_type == "night_call" else (start, end)
+
+
+def overlaps_clinic(opd_days: Iterable[str], start: datetime, end: datetime) -> bool:
+    """Whether [start, end) meets CLINIC_HOURS on any OPD weekday (the check without a calendar)"""
+    opd_days = {d.upper() for d in opd_days}
+    day = start.date()
+    while datetime.combine(day, time(0, 0)) < end:
+        if WEEKDAYS[day.weekday()] in opd_days and \
+                start < datetime.combine(day, CLINIC_HOURS[1]) and end > datetime.combine(day, CLINIC_HOURS[0]):
+            return True
+        day += timedelta(days=1)
+    return False
+
+
+def _any_in_range(buf: bytearray, i0: int, i1: int) -> bool:
+    i0, i1 = max(i0, 0), min(i1, len(buf) * 8)
+    if i1 <= i0:
+        return False
+    chunk = int.from_bytes(buf[i0 >> 3:((i1 - 1) >> 3) + 1], "little")
+    return bool((chunk >> (i0 & 7)) & ((1 << (i1 - i0)) - 1))
+
+
+class AvailabilityCalendar:
+    """Blocked-time bitmaps per user over [start, end)"""
+
+    def __init__(self, start: datetime, end: datetime, slot_minutes: int = SLOT_MINUTES):
+        self.start = start
+        self.end = end
+        self.slot_minutes = slot_minutes
+        self._base = to_minutes(start)
+        self.slots = -(-(to_minutes(end) - self._base) // slot_minutes)
+        self._nbytes = (self.slots + 7) // 8
+        self.protected = self._new()
+        self.leave: Dict[int, bytearray] = {}
+        self.clinic: Dict[int, bytearray] = {}
+        self.clinic_blocks: Dict[int, FrozenSet[str]] = {}
+        self._leave_periods: Dict[int, List[Tuple[datetime, datetime]]] = {}
+        self._clinic_cache: Dict[FrozenSet[str], bytearray] = {}
+
+    # --- construction -----------------------------------------------------
+    def _new(self) -> bytearray:
+        return bytearray(self._nbytes)
+
+    def _slot(self, dt: datetime) -> int:
+        return (to_minutes(dt) - self._base) // self.slot_minutes
+
+    def _slot_end(self, dt: datetime) -> int:
+        return -(-(to_minutes(dt) - self._base) // self.slot_minutes)
+
+    def _days(self) -> Iterable[datetime]:
+        day = datetime.combine(self.start.date(), time(0, 0))
+        while day < self.end:
+            yield day
+            day += timedelta(days=1)
+
+    def _mark_daily(self, buf: bytearray, weekdays: Iterable[str], window: Tuple[time, time]):
+        weekdays = set(weekdays)
+        for day in self._days():
+            if WEEKDAYS[day.weekday()] in weekdays:
+                _set_range(buf, self._slot(datetime.combine(day, window[0])),
+                           self._slot_end(datetime.combine(day, window[1])))
+
+    def mark_protected(self, teaching: Tuple[time, time], handovers: Iterable[Tuple[time, time]]):
+        self._mark_daily(self.protected, [TEACHING_DAY], teaching)
+        for window in handovers:
+            self._mark_daily(self.protected, WEEKDAYS, window)
+
+    def set_clinic(self, user_id: int, opd_days: Iterable[str], blocks_day_call: bool = True,
+                   blocks_night_call_before: bool = True):
+        """Share one bitmap between all users with the same OPD weekdays"""
+        key = frozenset(d.upper() for d in opd_days)
+        if not key:
+            self.clinic.pop(user_id, None)
+            return
+        buf = self._clinic_cache.get(key)
+        if buf is None:
+            buf = self._clinic_cache[key] = self._new()
+            self._mark_daily(buf, key, CLINIC_HOURS)
+        self.clinic[user_id] = buf
+        self.clinic_blocks[user_id] = frozenset(
+            t for t, blocked in (("day_call", blocks_day_call), ("night_call", blocks_night_call_before))
+            if blocked
+        )
+
+    def set_leave(self, user_id: int, periods: Iterable[Tuple[datetime, datetime]]):
+        self._leave_periods[user_id] = list(periods)
+        buf = self._new()
+        for start, end in self._leave_periods[user_id]:
+            _set_range(buf, self._slot(start), self._slot_end(end))
+        self.leave[user_id] = buf
+
+    # --- incremental updates ----------------------------------------------
+    def add_leave(self, user_id: int, start: datetime, end: datetime):
+        self._leave_periods.setdefault(user_id, []).append((start, end))
+        buf = self.leave.get(user_id)
+        if buf is None:
+            buf = self.leave[user_id] = self._new()
+        _set_range(buf, self._slot(start), self._slot_end(end))
+
+    def remove_leave(self, user_id: int, start: datetime, end: datetime) -> bool:
+        """Clear one leave period, re-marking any remaining leave that overlaps it"""
+        periods = self._leave_periods.get(user_id, [])
+        if (start, end) not in periods:
+            return False
+        periods.remove((start, end))
+        buf = self.leave[user_id]
+        i0, i1 = self._slot(start), self._slot_end(end)
+        _set_range(buf, i0, i1, False)
+        for other_start, other_end in periods:
+            j0, j1 = self._slot(other_start), self._slot_end(other_end)
+            if j0 < i1 and j1 > i0:
+                _set_range(buf, max(i0, j0), min(i1, j1))
+        return True
+
+    # --- queries ----------------------------------------------------------
+    def covers(self, start: datetime, end: datetime) -> bool:
+        return self.start <= start and end <= self.end
+
+    def on_leave(self, user_id: int, start: datetime, end: datetime) -> bool:
+        return self.on_leave_minutes(user_id, to_minutes(start), to_minutes(end))
+
+    def on_leave_minutes(self, user_id: int, start: int, end: int) -> bool:
+        """on_leave for epoch-minute bounds (validator hot path)"""
+        buf = self.leave.get(user_id)
+        if buf is None:
+            return False
+        i0 = (start - self._base) // self.slot_minutes
+        i1 = -(-(end - self._base) // self.slot_minutes)
+        return _any_in_range(buf, i0, i1)
+
+    def blocked_by_clinic(self, user_id: int, start: datetime, end: datetime, shift_type: str) -> bool:
+        buf = self.clinic.get(user_id)
+        if buf is None or shift_type not in self.clinic_blocks.get(user_id, CLINIC_BLOCKED_TYPES):
+            return False
+        start, end = clinic_span(start, end, shift_type)
+        return _any_in_range(buf, self._slot(start), self._slot_end(end))
+
+    def blocked_by_protected(self, start: datetime, end: datetime, shift_type: str) -> bool:
+        return shift_type in PROTECTED_BLOCKED_TYPES and \
+            _any_in_range(self.protected, self._slot(start), self._slot_end(end))
+
+    def reasons(self, user_id: int, start: datetime, end: datetime, shift_type: str) -> List[str]:
+        """Why a user cannot take [start, end) (empty when available)"""
+        reasons = []
+        if self.on_leave(user_id, start, end):
+            reasons.append("on leave")
+        if self.blocked_by_clinic(user_id, start, end, shift_type):
+            reasons.append("OPD day")
+        if self.blocked_by_protected(start, end, shift_type):
+            reasons.append("protected time")
+        return reasons
+
+    def is_available(self, user_id: int, start: datetime, end: datetime, shift_type: str) -> bool:
+        return not self.reasons(user_id, start, end, shift_type)
+
+    def nbytes(self) -> int:
+        shared = {id(b): len(b) for b in list(self.leave.values()) + list(self.clinic.values())}
+        return len(self.protected) + sum(shared.values())
@@ -0,0 +1,128 @@
+"""Batch night-call generation across on-call pools and multi-month horizons.
+
+Pools that share no users are independent and are solved in parallel
+processes. Pools that do share users are merged into one component and
+solved together, month by month. Each component works on its own
+sub-engine, so the shifts generated for one month stay in the timeline
+index when the next month is solved. That carries the rest owed after a
+month-end night and any consecutive-night run across the boundary.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from .roster_engine import RosterEngine
+from .solver import process_context
+
+
+@dataclass
+class PoolSpec:
+    group_id: int
+    name: str
+    post_ids: List[int]
+    user_ids: List[int]
+    caps: Dict[str, Any] = field(default_factory=dict)
+    shift_rules: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def month_horizon(year: int, month: int, months: int) -> List[Tuple[int, int]]:
+    """(year, month) pairs for ``months`` consecutive months starting at year/month"""
+    horizon = []
+    for _ in range(months):
+        horizon.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return horizon
+
+
+def _components(pools: List[PoolSpec]) -> List[List[PoolSpec]]:
+    """Group pools that share users (union-find over pool indices)"""
+    parent = list(range(len(pools)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: Dict[int, int] = {}
+    for i, pool in enumerate(pools):
+        for uid in pool.user_ids:
+            if uid in owner:
+                parent[find(i)] = find(owner[uid])
+            else:
+                owner[uid] = i
+
+    groups: Dict[int, List[PoolSpec]] = {}
+    for i, pool in enumerate(pools):
+        groups.setdefault(find(i), []).append(pool)
+    return list(groups.values())
+
+
+def _solve_component(engine: RosterEngine, pools: List[PoolSpec],
+                     horizon: List[Tuple[int, int]], options: Dict[str, Any]) -> Dict[int, Dict]:
+    """Generate every month of the horizon for the pools of one component"""
+    results = {pool.group_id: {'months': [], 'shifts': []} for pool in pools}
+    # One sub-engine per pool for the whole horizon; each month's shifts are shared below
+    engines = {}
+    for pool in pools:
+        pool_engine = engines[pool.group_id] = engine.subset(pool.user_ids)
+        for uid, constraint in pool_engine.user_constraints.items():
+            pool_engine.user_constraints[uid] = replace(constraint, **pool.caps)
+    for year, month in horizon:
+        for pool in pools:
+            pool_engine = engines[pool.group_id]
+            before = pool_engine.store.row_count
+            summary = pool_engine.generate_night_calls(
+                month=month, year=year, post_ids=pool.post_ids,
+                shift_rules=pool.shift_rules, **options
+            )
+            new_shifts = pool_engine.shifts_since(before)
+            # Feed the month into the engines of the other pools sharing these users
+            for other in pools:
+                other_engine = engines[other.group_id]
+                if other_engine is pool_engine:
+                    continue
+                for shift in new_shifts:
+                    if shift.user_id in other_engine.user_constraints:
+                        other_engine.add_shift(shift)
+            summary.update(year=year, month=month)
+            results[pool.group_id]['months'].append(summary)
+            results[pool.group_id]['shifts'].extend(new_shifts)
+    return results
+
+
+def generate_pools(engine: RosterEngine, pools: List[PoolSpec], year: int, month: int,
+                   months: int = 1, workers: Optional[int] = None,
+                   **options) -> Dict[int, Dict]:
+    """Generate night calls for several pools over a horizon, adding the shifts to ``engine``
+
+    ``options`` are passed to RosterEngine.generate_night_calls. Returns per group id
+    ``{'months': [summary, ...], 'shifts': [Shift, ...]}``.
+    """
+    horizon = month_horizon(year, month, months)
+    components = _components([p for p in pools if p.user_ids])
+    # Nested process pools are not allowed; multi-start runs stay in the component's process
+    options = dict(options, workers=1)
+
+    jobs = []
+    for component in components:
+        user_ids = sorted({uid for pool in component for uid in pool.user_ids})
+        jobs.append((engine.subset(user_ids), component))
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    if workers == 1 or len(jobs) <= 1:
+        outputs = [_solve_component(sub, component, horizon, options) for sub, component in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=process_context()) as pool:
+            futures = [pool.submit(_solve_component, sub, component, horizon, options)
+                       for sub, component in jobs]
+            outputs = [f.result() for f in futures]
+
+    results: Dict[int, Dict] = {p.group_id: {'months': [], 'shifts': []} for p in pools}
+    for output in outputs:
+        for group_id, result in output.items():
+            for shift in result['shifts']:
+                engine.add_shift(shift)
+            results[group_id] = result
+    return results
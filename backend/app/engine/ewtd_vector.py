@@ -0,0 +1,239 @@
+"""Columnar (NumPy) EWTD validation over many users at once.
+
+Shifts are held as int64 epoch-minute arrays sorted by (user, start). Every
+rule is evaluated with array operations; the rolling reference-period
+average uses a prefix sum of worked minutes queried with ``searchsorted``.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+MINUTES_PER_HOUR = 60
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Composite (user, minute) keys keep one global sort order across all users
+_USER_STRIDE = np.int64(1) << np.int64(32)
+
+MAX_DUTY = "MAX_DUTY"
+DAILY_REST = "DAILY_REST"
+OVERLAP = "OVERLAP"
+WEEKLY_REST = "WEEKLY_REST"
+AVG_WEEKLY_HOURS = "AVG_WEEKLY_HOURS"
+
+ALL_RULES = (MAX_DUTY, DAILY_REST, OVERLAP, WEEKLY_REST, AVG_WEEKLY_HOURS)
+
+
+def to_epoch_minutes(values: Iterable[datetime]) -> np.ndarray:
+    return np.array(list(values), dtype="datetime64[m]").astype(np.int64)
+
+
+def from_epoch_minutes(minutes: int) -> datetime:
+    return EPOCH + timedelta(minutes=int(minutes))
+
+
+@dataclass
+class ShiftColumns:
+    """Shift intervals as parallel arrays, sorted by (user_id, start)"""
+    user_ids: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+    @classmethod
+    def from_arrays(cls, user_ids, starts, ends) -> "ShiftColumns":
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        order = np.lexsort((ends, starts, user_ids))
+        return cls(user_ids[order], starts[order], ends[order])
+
+    @classmethod
+    def from_shifts(cls, shifts) -> "ShiftColumns":
+        """Build from engine shifts (anything with user_id/start/end)"""
+        shifts = list(shifts)
+        return cls.from_arrays(
+            [s.user_id for s in shifts],
+            to_epoch_minutes(s.start for s in shifts),
+            to_epoch_minutes(s.end for s in shifts),
+        )
+
+    @classmethod
+    def from_store(cls, store, rows: Optional[Iterable[int]] = None) -> "ShiftColumns":
+        """Build straight from a ShiftStore's array columns (no per-shift objects)"""
+        alive = np.frombuffer(store.alive, dtype=np.uint8).astype(bool)
+        if rows is not None:
+            mask = np.zeros(len(alive), dtype=bool)
+            mask[np.fromiter(rows, dtype=np.int64)] = True
+            alive &= mask
+        return cls.from_arrays(
+            np.frombuffer(store.user_ids, dtype=np.int64)[alive],
+            np.frombuffer(store.starts, dtype=np.int64)[alive],
+            np.frombuffer(store.ends, dtype=np.int64)[alive],
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+@dataclass
+class ViolationColumns:
+    """Violations of one rule as parallel arrays (user, anchor minute, measured hours, limit hours)"""
+    rule: str
+    user_ids: np.ndarray
+    at: np.ndarray
+    measured: np.ndarray
+    limit: float
+    severity: str = "violation"
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+
+@dataclass
+class ColumnarEWTDResult:
+    by_rule: Dict[str, ViolationColumns] = field(default_factory=dict)
+    reference_weeks: int = 17
+
+    @property
+    def compliant(self) -> bool:
+        return not any(len(v) for v in self.by_rule.values() if v.severity == "violation")
+
+    def messages(self, rules: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+        """Render violations in the same wording as RosterEngine.validate_roster"""
+        selected = set(rules) if rules is not None else set(ALL_RULES)
+        out = {"violations": [], "warnings": []}
+        for rule, cols in self.by_rule.items():
+            if rule not in selected:
+                continue
+            bucket = out["violations"] if cols.severity == "violation" else out["warnings"]
+            for uid, at, measured in zip(cols.user_ids.tolist(), cols.at.tolist(), cols.measured.tolist()):
+                bucket.append(self._message(rule, uid, from_epoch_minutes(at), measured, cols.limit))
+        return out
+
+    def to_validation_dict(self, rules: Optional[Iterable[str]] = None) -> Dict:
+        """Shape expected by EWTDValidationResponse"""
+        msgs = self.messages(rules)
+        return {
+            'compliant': not msgs['violations'],
+            'violations': msgs['violations'],
+            'warnings': msgs['warnings'],
+        }
+
+    def _message(self, rule: str, uid: int, at: datetime, measured: float, limit: float) -> str:
+        if rule == MAX_DUTY:
+            return f"User {uid}: Shift exceeds 24 hours ({measured:.1f}h)"
+        if rule == DAILY_REST:
+            return f"User {uid}: Insufficient rest before {at.isoformat()} ({measured:.1f}h < {limit:g}h)"
+        if rule == OVERLAP:
+            return f"User {uid}: Overlapping shifts at {at.isoformat()}"
+        if rule == WEEKLY_REST:
+            return f"User {uid}: No {limit:g}h rest in 7 days from {at.date().isoformat()} ({measured:.1f}h worked span)"
+        if rule == AVG_WEEKLY_HOURS:
+            return (f"User {uid}: Average {measured:.1f}h/week over {self.reference_weeks} weeks "
+                    f"to {at.date().isoformat()} (> {limit:g}h)")
+        return f"User {uid}: {rule} ({measured:.1f} > {limit:g})"
+
+
+def _select(rule: str, mask: np.ndarray, user_ids, at, measured, limit: float,
+            severity: str = "violation") -> ViolationColumns:
+    return ViolationColumns(rule, user_ids[mask], at[mask], measured[mask], limit, severity)
+
+
+def validate_columns(cols: ShiftColumns,
+                     reference_weeks: int = 17,
+                     max_duty_hours: float = 24,
+                     min_daily_rest_hours: float = 11,
+                     min_weekly_rest_hours: float = 24,
+                     max_avg_weekly_hours: float = 48,
+                     data_start: Optional[int] = None) -> ColumnarEWTDResult:
+    """Evaluate EWTD rules for every user in one vectorized pass
+
+    ``data_start`` (epoch minutes) is where the loaded shifts begin; it defaults to
+    the earliest shift start.
+    """
+    result = ColumnarEWTDResult(reference_weeks=reference_weeks)
+    users, starts, ends = cols.user_ids, cols.starts, cols.ends
+    n = len(starts)
+    if n == 0:
+        for rule in ALL_RULES:
+            empty = np.empty(0, dtype=np.int64)
+            result.by_rule[rule] = ViolationColumns(rule, empty, empty, empty.astype(float), 0.0)
+        return result
+
+    durations = ends - starts
+    duty_hours = durations / MINUTES_PER_HOUR
+    result.by_rule[MAX_DUTY] = _select(
+        MAX_DUTY, durations > max_duty_hours * MINUTES_PER_HOUR,
+        users, starts, duty_hours, max_duty_hours,
+    )
+
+    # Composite (user, minute) keys: a running max of the end keys never leaks across users
+    base = starts.min()
+    user_rank = np.searchsorted(np.unique(users), users).astype(np.int64)
+    offset = user_rank * _USER_STRIDE - base
+    start_keys = starts + offset
+    end_keys = ends + offset
+
+    # Rest gaps run from the latest end so far, not just the previous shift's end: a long
+    # shift can outlast shorter ones starting inside it (gap 0 = back-to-back duty)
+    same_user = users[1:] == users[:-1]
+    gaps = start_keys[1:] - np.maximum.accumulate(end_keys)[:-1]
+    gap_hours = gaps / MINUTES_PER_HOUR
+    short_rest = same_user & (gaps > 0) & (gaps < min_daily_rest_hours * MINUTES_PER_HOUR)
+    result.by_rule[DAILY_REST] = _select(
+        DAILY_REST, short_rest, users[1:], starts[1:], gap_hours, min_daily_rest_hours,
+    )
+    result.by_rule[OVERLAP] = _select(
+        OVERLAP, same_user & (gaps < 0), users[1:], starts[1:], -gap_hours, 0.0,
+    )
+
+    # Weekly rest: a stretch of work starts after a rest >= 24h (or at a user's first shift).
+    # Any stretch spanning more than 7 days minus that rest leaves a 7-day period without it.
+    weekly_rest = min_weekly_rest_hours * MINUTES_PER_HOUR
+    stretch_start = np.ones(n, dtype=bool)
+    stretch_start[1:] = ~same_user | (gaps >= weekly_rest)
+    stretch_idx = np.flatnonzero(stretch_start)
+    stretch_ends = np.maximum.reduceat(ends, stretch_idx)
+    spans = stretch_ends - starts[stretch_idx]
+    result.by_rule[WEEKLY_REST] = _select(
+        WEEKLY_REST, spans > MINUTES_PER_WEEK - weekly_rest,
+        users[stretch_idx], starts[stretch_idx], spans / MINUTES_PER_HOUR, min_weekly_rest_hours,
+    )
+
+    # Rolling average over the reference period, evaluated at every shift end.
+    # W(key) = minutes worked before ``key`` on the composite (user, minute) axis.
+    cum = np.concatenate(([0], np.cumsum(durations)))
+
+    def worked_before(keys: np.ndarray) -> np.ndarray:
+        k = np.searchsorted(start_keys, keys, side="right") - 1
+        kc = np.maximum(k, 0)
+        partial = np.clip(keys - start_keys[kc], 0, durations[kc])
+        return np.where(k >= 0, cum[kc] + partial, 0)
+
+    # Windows reaching back past the data edge average over the part that is covered
+    # (at least a week, so one long first shift is not read as a weekly rate)
+    ref_minutes = reference_weeks * MINUTES_PER_WEEK
+    window_starts = np.maximum(ends - ref_minutes, base if data_start is None else data_start)
+    worked = worked_before(end_keys) - worked_before(window_starts + offset)
+    weeks = np.maximum(ends - window_starts, MINUTES_PER_WEEK) / MINUTES_PER_WEEK
+    avg_weekly = worked / MINUTES_PER_HOUR / weeks
+
+    # Report each user's worst window once
+    over = avg_weekly > max_avg_weekly_hours
+    if over.any():
+        idx = np.flatnonzero(over)
+        order = np.lexsort((-avg_weekly[idx], users[idx]))
+        idx = idx[order]
+        first = np.ones(len(idx), dtype=bool)
+        first[1:] = users[idx][1:] != users[idx][:-1]
+        mask = np.zeros(n, dtype=bool)
+        mask[idx[first]] = True
+    else:
+        mask = over
+    result.by_rule[AVG_WEEKLY_HOURS] = _select(
+        AVG_WEEKLY_HOURS, mask, users, ends, avg_weekly, max_avg_weekly_hours,
+    )
+    return result
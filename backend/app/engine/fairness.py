@@ -0,0 +1,159 @@
+"""Incremental fairness scoring over weighted on-call hours.
+
+FairnessAccumulator keeps each user's load together with the running sum
+and sum of squares of all loads, so the population stddev (the value
+``fairness_score`` computes) is available in O(1) after every assign,
+unassign or swap. Loads are on-call hours scaled by FairnessWeights, so a
+weekend or bank-holiday night can count for more than a weekday one; with
+the default weights a load is plain hours.
+"""
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Hashable, Iterable, List, Optional, Set
+
+WEEKEND_DAYS = (5, 6)  # Sat, Sun
+
+
+@dataclass(frozen=True)
+class FairnessWeights:
+    """Multipliers applied to on-call hours; bank holidays take precedence over weekends"""
+    night: float = 1.0
+    weekend: float = 1.0
+    bank_holiday: float = 1.0
+
+    @property
+    def unweighted(self) -> bool:
+        return self.night == self.weekend == self.bank_holiday == 1.0
+
+
+def _easter(year: int) -> date:
+    """Western Easter Sunday (anonymous Gregorian algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+def _first_monday(year: int, month: int) -> date:
+    d = date(year, month, 1)
+    return d + timedelta(days=(7 - d.weekday()) % 7)
+
+
+def _last_monday(year: int, month: int) -> date:
+    d = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return d - timedelta(days=d.weekday())
+
+
+def irish_bank_holidays(year: int) -> Set[date]:
+    """Irish public holidays for a year (no substitute days for weekend dates)"""
+    holidays = {
+        date(year, 1, 1),
+        date(year, 3, 17),
+        _easter(year) + timedelta(days=1),
+        _first_monday(year, 5),
+        _first_monday(year, 6),
+        _first_monday(year, 8),
+        _last_monday(year, 10),
+        date(year, 12, 25),
+        date(year, 12, 26),
+    }
+    if year >= 2023:
+        # St Brigid's Day: 1 February when it is a Friday, else the first Monday of February
+        feb1 = date(year, 2, 1)
+        holidays.add(feb1 if feb1.weekday() == 4 else _first_monday(year, 2))
+    return holidays
+
+
+def weighted_hours(start: datetime, end: datetime, shift_type: str,
+                   weights: FairnessWeights, bank_holidays: Iterable[date] = ()) -> float:
+    """On-call hours of one shift scaled by the weights for its type and start day"""
+    hours = (end - start).total_seconds() / 3600
+    if shift_type == 'night_call':
+        hours *= weights.night
+    if start.date() in bank_holidays:
+        hours *= weights.bank_holiday
+    elif start.weekday() in WEEKEND_DAYS:
+        hours *= weights.weekend
+    return hours
+
+
+class FairnessAccumulator:
+    """Per-user loads with running sums; ``score`` is their population stddev"""
+
+    __slots__ = ("_load", "_sum", "_sum_sq")
+
+    def __init__(self, user_ids: Iterable[Hashable] = (), baseline: Optional[Dict[Hashable, float]] = None):
+        baseline = baseline or {}
+        self._load: Dict[Hashable, float] = {uid: float(baseline.get(uid, 0.0)) for uid in user_ids}
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self.resync()
+
+    def __len__(self) -> int:
+        return len(self._load)
+
+    def load(self, user_id: Hashable) -> float:
+        return self._load[user_id]
+
+    def loads(self) -> Dict[Hashable, float]:
+        return dict(self._load)
+
+    def _set(self, user_id: Hashable, new: float):
+        old = self._load.get(user_id)
+        if old is None:
+            old = self._load[user_id] = 0.0
+        self._sum += new - old
+        self._sum_sq += new * new - old * old
+        self._load[user_id] = new
+
+    def assign(self, user_id: Hashable, hours: float):
+        self._set(user_id, self._load.get(user_id, 0.0) + hours)
+
+    def unassign(self, user_id: Hashable, hours: float):
+        self._set(user_id, self._load[user_id] - hours)
+
+    def move(self, from_user: Hashable, to_user: Hashable, hours: float):
+        """Reassign one shift's hours from one user to another"""
+        self.unassign(from_user, hours)
+        self.assign(to_user, hours)
+
+    def swap(self, user_a: Hashable, hours_a: float, user_b: Hashable, hours_b: float):
+        """Exchange a shift of ``hours_a`` held by user_a with one of ``hours_b`` held by user_b"""
+        delta = hours_b - hours_a
+        self._set(user_a, self._load[user_a] + delta)
+        self._set(user_b, self._load[user_b] - delta)
+
+    @property
+    def mean(self) -> float:
+        return self._sum / len(self._load) if self._load else 0.0
+
+    @property
+    def score(self) -> float:
+        """Population stddev of the loads (0 with no users, as fairness_score)"""
+        n = len(self._load)
+        if not n:
+            return 0.0
+        mean = self._sum / n
+        return math.sqrt(max(self._sum_sq / n - mean * mean, 0.0))
+
+    def score_if(self, user_id: Hashable, hours: float) -> float:
+        """Score after adding ``hours`` (negative to remove) to one user, without applying it"""
+        old = self._load.get(user_id, 0.0)
+        n = len(self._load) + (user_id not in self._load)
+        new = old + hours
+        total = self._sum + hours
+        sq = self._sum_sq + new * new - old * old
+        mean = total / n
+        return math.sqrt(max(sq / n - mean * mean, 0.0))
+
+    def resync(self):
+        """Recompute the running sums from the loads (drops accumulated float error)"""
+        values: List[float] = list(self._load.values())
+        self._sum = math.fsum(values)
+        self._sum_sq = math.fsum(v * v for v in values)
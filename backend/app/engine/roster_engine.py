@@ -1,6 +1,18 @@
-from datetime import datetime, timedelta, date, time
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
+from datetime import datetime, timedelta, time
+from typing import Callable, Iterable, List, Dict, Tuple, Optional
+from collections import Counter
+from time import perf_counter
+from dataclasses import dataclass, replace
+
+from .shift_store import ShiftStore, ShiftView, to_minutes, from_minutes
+from .timeline import TimelineIndex
+from .availability import AvailabilityCalendar, NIGHT_RECOVERY, clinic_span, overlaps_clinic
+from .slot_calendar import slot_calendar
+from .fairness import FairnessAccumulator, FairnessWeights, irish_bank_holidays, weighted_hours
+from .solver import NightCallSolver, ProgressCallback, SolverResult, solve_multistart
+from .ewtd_vector import DAILY_REST, MAX_DUTY, OVERLAP
+from .violations import (Violation, VIOLATION, WARNING, SHORT_SHIFT, CONTINUOUS_DUTY, WEEKLY_HOURS,
+                         MONTHLY_NIGHTS, CONSECUTIVE_NIGHTS, LEAVE_OVERLAP)
 
 # Canonical shift timings per spec (simplified; production should read from config)
 SHIFT_DEFS = {
@@ -17,6 +29,8 @@ SHIFT_DEFS = {
 PROTECTED_TEACHING = (time(14,0), time(16,30))
 HANDOVER_BLOCKS = [(time(16,30), time(17,0)), (time(9,0), time(9,30))]
 
+MINUTES_PER_DAY = 24 * 60
+
 @dataclass
 class UserConstraints:
     user_id: int
@@ -25,6 +39,9 @@ class UserConstraints:
     max_consecutive_nights: int = 3
     opd_days: set = None
     leave_periods: List[Tuple[datetime, datetime]] = None
+    max_weekly_hours: float = 48
+    opd_blocks_day_call: bool = True
+    opd_blocks_night_call_before: bool = True
     
     def __post_init__(self):
         if self.opd_days is None:
@@ -49,101 +66,525 @@ class RosterEngine:
     """Main roster generation engine"""
     
     def __init__(self):
-        self.shifts: List[Shift] = []
+        self.store = ShiftStore()
         self.user_constraints: Dict[int, UserConstraints] = {}
+        self.timelines = TimelineIndex(self.store)
+        self.availability: Optional[AvailabilityCalendar] = None
+    
+    @property
+    def shifts(self) -> ShiftStore:
+        """All live shifts, iterated as ShiftViews over the column store"""
+        return self.store
     
     def import_existing_roster(self, roster_data: List[Dict], user_constraints: Dict[int, UserConstraints]):
         """Import existing shifts and constraints"""
+        self.load_rows((
+            (d['user_id'], d['post_id'], d['start'], d['end'], d['type'], d.get('labels') or None)
+            for d in roster_data
+        ), user_constraints)
+    
+    def load_rows(self, rows: Iterable[tuple], user_constraints: Dict[int, UserConstraints]):
+        """Import (user_id, post_id, start, end, shift_type, labels) tuples and constraints"""
         self.user_constraints = user_constraints
-        for shift_dict in roster_data:
-            shift = Shift(
-                user_id=shift_dict['user_id'],
-                post_id=shift_dict['post_id'],
-                start=shift_dict['start'],
-                end=shift_dict['end'],
-                shift_type=shift_dict['type'],
-                labels=shift_dict.get('labels', {})
-            )
-            self.shifts.append(shift)
+        self.availability = None
+        self.timelines.build(self.store.extend_rows(rows))
+        
+        for user_id, constraint in user_constraints.items():
+            self.timelines.get(user_id).set_leave(constraint.leave_periods)
+    
+    def build_availability(self, start: datetime, end: datetime) -> AvailabilityCalendar:
+        """Precompute availability bitmaps for every constrained user over [start, end)"""
+        calendar = AvailabilityCalendar(start, end)
+        calendar.mark_protected(PROTECTED_TEACHING, HANDOVER_BLOCKS)
+        for uid, constraint in self.user_constraints.items():
+            calendar.set_clinic(uid, constraint.opd_days, constraint.opd_blocks_day_call,
+                                constraint.opd_blocks_night_call_before)
+            if constraint.leave_periods:
+                calendar.set_leave(uid, constraint.leave_periods)
+        self.availability = calendar
+        return calendar
+    
+    def _availability_for(self, start: datetime, end: datetime) -> Optional[AvailabilityCalendar]:
+        """The calendar if it covers [start, end) plus any post-call recovery, else None"""
+        if self.availability is not None and self.availability.covers(start, end + NIGHT_RECOVERY):
+            return self.availability
+        return None
+    
+    def add_leave(self, user_id: int, start: datetime, end: datetime):
+        """Record a leave period in the constraints, timeline and availability bitmaps"""
+        constraint = self.user_constraints.setdefault(user_id, UserConstraints(user_id=user_id))
+        constraint.leave_periods.append((start, end))
+        self.timelines.get(user_id).leave.index.add(to_minutes(start), to_minutes(end), 0)
+        if self.availability is not None:
+            self.availability.add_leave(user_id, start, end)
+    
+    def remove_leave(self, user_id: int, start: datetime, end: datetime) -> bool:
+        """Drop a leave period; returns False if the user had no such period"""
+        constraint = self.user_constraints.get(user_id)
+        if constraint is None or (start, end) not in constraint.leave_periods:
+            return False
+        constraint.leave_periods.remove((start, end))
+        self.timelines.get(user_id).leave.index.remove(to_minutes(start), 0, to_minutes(end))
+        if self.availability is not None:
+            self.availability.remove_leave(user_id, start, end)
+        return True
+    
+    def add_shift(self, shift) -> ShiftView:
+        """Add a shift (anything with Shift attributes) to the store and the timeline index"""
+        row = self.store.add(shift)
+        self.timelines.add(row)
+        return self.store.view(row)
+    
+    def remove_shift(self, shift: ShiftView) -> bool:
+        """Remove a shift from the store and the per-user timeline index"""
+        if shift.store is not self.store or not self.timelines.remove(shift.row):
+            return False
+        return self.store.remove(shift.row)
+    
+    def shifts_since(self, row: int) -> List[Shift]:
+        """Plain Shift copies of the rows appended at or after ``row`` (picklable)"""
+        return [
+            Shift(user_id=v.user_id, post_id=v.post_id, start=v.start, end=v.end,
+                  shift_type=v.shift_type, labels=dict(v.labels))
+            for v in self.store.views(range(row, self.store.row_count))
+        ]
+    
+    def copy(self) -> 'RosterEngine':
+        """Independent engine with the same shifts, constraints and leave (no availability)"""
+        clone = RosterEngine()
+        clone.user_constraints = {
+            uid: replace(c, opd_days=set(c.opd_days), leave_periods=list(c.leave_periods))
+            for uid, c in self.user_constraints.items()
+        }
+        clone.timelines.build(clone.store.copy_rows(self.store, range(self.store.row_count)))
+        for uid, constraint in clone.user_constraints.items():
+            clone.timelines.get(uid).set_leave(constraint.leave_periods)
+        return clone
+    
+    def subset(self, user_ids: List[int]) -> 'RosterEngine':
+        """New engine holding only these users' constraints, shifts and leave"""
+        sub = RosterEngine()
+        sub.user_constraints = {
+            uid: self.user_constraints.get(uid) or UserConstraints(user_id=uid) for uid in user_ids
+        }
+        for uid in user_ids:
+            if uid in self.timelines:
+                sub.timelines.build(sub.store.copy_rows(self.store, self.timelines.get(uid).shifts.rows()))
+        for uid, constraint in sub.user_constraints.items():
+            sub.timelines.get(uid).set_leave(constraint.leave_periods)
+        if self.availability is not None:
+            sub.build_availability(self.availability.start, self.availability.end)
+        return sub
+    
+    def check_assignment(self, user_id: int, start: datetime, end: datetime,
+                         shift_type: str) -> List[str]:
+        """Return the UserConstraints a candidate shift would break (empty if assignable)"""
+        constraint = self.user_constraints.get(user_id) or UserConstraints(user_id=user_id)
+        timeline = self.timelines.get(user_id)
+        
+        calendar = self._availability_for(start, end)
+        if calendar is not None:
+            reasons = calendar.reasons(user_id, start, end, shift_type)
+        else:
+            reasons = []
+            if timeline.on_leave(start, end):
+                reasons.append("on leave")
+            # Same rule as AvailabilityCalendar.blocked_by_clinic, tested against the clock
+            blocked = (constraint.opd_blocks_night_call_before if shift_type == 'night_call'
+                       else shift_type == 'day_call' and constraint.opd_blocks_day_call)
+            if blocked and overlaps_clinic(constraint.opd_days, *clinic_span(start, end, shift_type)):
+                reasons.append("OPD day")
+        if timeline.shifts.overlapping(start, end):
+            reasons.append("overlaps existing shift")
+        
+        min_rest = timedelta(hours=constraint.min_rest_hours)
+        rest_before, rest_after = timeline.rest_gaps(start, end)
+        if rest_before is not None and timedelta(0) < rest_before < min_rest:
+            reasons.append(f"insufficient rest before ({rest_before.total_seconds() / 3600:.1f}h)")
+        if rest_after is not None and timedelta(0) < rest_after < min_rest:
+            reasons.append(f"insufficient rest after ({rest_after.total_seconds() / 3600:.1f}h)")
+        # Back-to-back shifts (e.g. Fri and Sat weekend nights) merge into one duty period
+        if timedelta(0) in (rest_before, rest_after):
+            duty = end - start
+            for neighbour, gap in ((timeline.shifts.last_ending_before(start), rest_before),
+                                   (timeline.shifts.first_from(start), rest_after)):
+                if gap == timedelta(0):
+                    duty += neighbour.end - neighbour.start
+            if duty > timedelta(hours=24):
+                reasons.append(f"continuous duty exceeds 24 hours ({duty.total_seconds() / 3600:.1f}h)")
+
+        if shift_type == 'night_call':
+            if timeline.nights_in_month(start.year, start.month) >= constraint.max_nights_per_month:
+                reasons.append("max nights per month reached")
+            if timeline.night_run_through(start.date()) > constraint.max_consecutive_nights:
+                reasons.append("max consecutive nights reached")
+        
+        return reasons
     
     def generate_night_calls(self, month: int, year: int, post_ids: List[int], 
-                            calls_per_night: int = 1) -> Dict:
-        """Generate night call shifts for a month"""
-        from calendar import monthrange
+                            calls_per_night: int = 1, solver: str = 'round_robin',
+                            time_budget: float = 1.0, seed: Optional[int] = None,
+                            restarts: int = 1, workers: Optional[int] = None,
+                            shift_rules: Optional[List[Dict]] = None,
+                            fairness_weights: Optional[FairnessWeights] = None,
+                            user_posts: Optional[Dict[int, int]] = None,
+                            progress: Optional[ProgressCallback] = None) -> Dict:
+        """Generate night call shifts for a month
         
-        _, num_days = monthrange(year, month)
-        assigned = 0
-        unassigned_dates = []
+        Night windows come from the month's slot calendar: SHIFT_DEFS, overridden by
+        ``shift_rules`` (the ``Group.rules["shifts"]`` entries of the on-call pool).
+        
+        ``solver='round_robin'`` rotates through users; ``solver='anneal'`` runs the
+        local-search solver for up to ``time_budget`` seconds to minimise fairness_score.
+        With ``restarts > 1`` that many seeded runs are spread over ``workers`` processes
+        and the best one is kept. ``fairness_weights`` scale night, weekend and bank-holiday
+        hours in the fairness objective; the default weights score plain hours.
+        Each call is booked to the user's own post from ``user_posts``, falling back to
+        the first of ``post_ids`` for users without one.
+        ``progress`` receives the annealer's best cost so far (see solver.ProgressCallback).
+        """
+        nights = slot_calendar(year, month, shift_rules).of_type('night_call')
         
-        # Simple round-robin assignment
         user_ids = list(self.user_constraints.keys())
-        if not user_ids:
+        if not user_ids or not nights:
             return {
                 'assigned': 0,
-                'unassigned_dates': list(range(1, num_days + 1)),
-                'total_nights': num_days
+                'unassigned_dates': [slot.start.day for slot in nights],
+                'total_nights': len(nights)
             }
         
-        user_idx = 0
-        for day in range(1, num_days + 1):
-            for _ in range(calls_per_night):
-                if user_idx < len(user_ids):
-                    user_id = user_ids[user_idx % len(user_ids)]
-                    post_id = post_ids[0] if post_ids else 1
-                    
-                    start = datetime(year, month, day, 17, 0)
-                    end = datetime(year, month, day + 1 if day < num_days else 1, 9, 0)
-                    
-                    shift = Shift(
+        slots = []
+        for slot in nights:
+            slots.extend((slot.start.day, slot.start, slot.end) for _ in range(calls_per_night))
+        
+        month_start = datetime(year, month, 1)
+        horizon_end = datetime.combine(slots[-1][2].date() + timedelta(days=1), time(0, 0))
+        if self._availability_for(month_start, horizon_end) is None:
+            self.build_availability(month_start, horizon_end + NIGHT_RECOVERY)
+        
+        default_post = post_ids[0] if post_ids else 1
+        posts = {uid: (user_posts or {}).get(uid, default_post) for uid in user_ids}
+        if solver == 'anneal':
+            result = self._solve_night_calls(slots, user_ids, time_budget, seed,
+                                             restarts=restarts, workers=workers,
+                                             weights=fairness_weights, progress=progress)
+            # Hard violations are penalised, not forbidden, in the search: leave any
+            # call that still breaks a rule unfilled rather than book it
+            assignments = []
+            dropped = 0
+            for (_, start, end), user_id in zip(slots, result.assignments):
+                if user_id is not None and self.check_assignment(user_id, start, end, 'night_call'):
+                    user_id = None
+                    dropped += 1
+                if user_id is not None:
+                    self.add_shift(Shift(
                         user_id=user_id,
-                        post_id=post_id,
+                        post_id=posts[user_id],
                         start=start,
                         end=end,
                         shift_type='night_call'
-                    )
-                    self.shifts.append(shift)
-                    assigned += 1
-                    user_idx += 1
-                else:
-                    unassigned_dates.append(day)
+                    ))
+                assignments.append(user_id)
+        elif solver == 'round_robin':
+            result = None
+            assignments = self._round_robin_night_calls(slots, user_ids, posts)
+        else:
+            raise ValueError(f"Unknown solver '{solver}'")
         
-        return {
+        assigned = 0
+        unassigned_dates = []
+        weights = fairness_weights or FairnessWeights()
+        holidays = irish_bank_holidays(year)
+        loads = FairnessAccumulator(user_ids)
+        for (day, start, end), user_id in zip(slots, assignments):
+            if user_id is None:
+                unassigned_dates.append(day)
+                continue
+            loads.assign(user_id, weighted_hours(start, end, 'night_call', weights, holidays))
+            assigned += 1
+        
+        summary = {
             'assigned': assigned,
             'unassigned_dates': unassigned_dates,
-            'total_nights': num_days
+            'total_nights': len(nights),
+            'fairness_score': loads.score,
         }
+        if result is not None:
+            summary['hard_violations'] = dropped
+            summary['iterations'] = result.iterations
+        return summary
+    
+    def _round_robin_night_calls(self, slots: List[Tuple[int, datetime, datetime]],
+                                 user_ids: List[int], posts: Dict[int, int]) -> List[Optional[int]]:
+        """Rotate through users, skipping those the timeline index rules out"""
+        assignments = []
+        user_idx = 0
+        for _, start, end in slots:
+            for offset in range(len(user_ids)):
+                user_id = user_ids[(user_idx + offset) % len(user_ids)]
+                if not self.check_assignment(user_id, start, end, 'night_call'):
+                    break
+            else:
+                assignments.append(None)
+                continue
+            
+            self.add_shift(Shift(
+                user_id=user_id,
+                post_id=posts[user_id],
+                start=start,
+                end=end,
+                shift_type='night_call'
+            ))
+            assignments.append(user_id)
+            user_idx += offset + 1
+        return assignments
+    
+    def _solve_night_calls(self, slots: List[Tuple[int, datetime, datetime]],
+                           user_ids: List[int], time_budget: float,
+                           seed: Optional[int], restarts: int = 1,
+                           workers: Optional[int] = None,
+                           weights: Optional[FairnessWeights] = None,
+                           progress: Optional[ProgressCallback] = None) -> SolverResult:
+        """Run the annealing solver with static constraints taken from the timeline index
+        
+        Building the constraints counts against ``time_budget``.
+        """
+        began = perf_counter()
+        weights = weights or FairnessWeights()
+        holidays = irish_bank_holidays(slots[0][1].year)
+        allowed = [
+            {uid for uid in user_ids if not self.check_assignment(uid, start, end, 'night_call')}
+            for _, start, end in slots
+        ]
+        
+        month_start = datetime(slots[0][1].year, slots[0][1].month, 1)
+        month_end = datetime.combine(slots[-1][1].date() + timedelta(days=1), time(0, 0))
+        caps, min_rest, max_run, history, baseline = {}, {}, {}, {}, {}
+        for uid in user_ids:
+            constraint = self.user_constraints[uid]
+            timeline = self.timelines.get(uid)
+            existing = timeline.nights.starting_between(month_start, month_end)
+            caps[uid] = max(constraint.max_nights_per_month - len(existing), 0)
+            min_rest[uid] = constraint.min_rest_hours
+            max_run[uid] = constraint.max_consecutive_nights
+            history[uid] = set(timeline.night_dates())
+            baseline[uid] = sum(weighted_hours(s.start, s.end, 'night_call', weights, holidays)
+                                for s in existing)
+        
+        problem = dict(
+            slots=[(start, end) for _, start, end in slots],
+            user_ids=user_ids,
+            allowed=allowed,
+            caps=caps,
+            min_rest_hours=min_rest,
+            max_consecutive=max_run,
+            history_nights=history,
+            baseline_hours=baseline,
+            slot_loads=[weighted_hours(start, end, 'night_call', weights, holidays)
+                        for _, start, end in slots],
+        )
+        time_budget = max(time_budget - (perf_counter() - began), 0.0)
+        if restarts > 1:
+            return solve_multistart(problem, restarts, time_budget=time_budget,
+                                    workers=workers, seed=seed, progress=progress)
+        return NightCallSolver(**problem, seed=seed).solve(time_budget=time_budget, progress=progress)
     
     def validate_roster(self, user_id: Optional[int] = None) -> Dict:
         """Validate EWTD compliance"""
-        violations = []
-        warnings = []
+        return self._as_messages(self.violations(user_id))
+    
+    def validate_window(self, user_id: int, start: datetime, end: datetime) -> Dict:
+        """Validate one user's shifts around [start, end) only (incremental checks)"""
+        return self._as_messages(self.violations(user_id, window=(start, end)))
+    
+    def violations(self, user_id: Optional[int] = None,
+                   window: Optional[Tuple[datetime, datetime]] = None) -> List[Violation]:
+        """Structured EWTD findings (violations and warnings) for one or all users
+        
+        With ``window`` only one user's shifts around [start, end) are checked.
+        """
+        if user_id is None:
+            timelines = list(self.timelines)
+        elif user_id in self.timelines:
+            timelines = [self.timelines.get(user_id)]
+        else:
+            timelines = []
         
-        shifts_to_check = [s for s in self.shifts if user_id is None or s.user_id == user_id]
+        issues: List[Violation] = []
+        for timeline in timelines:
+            self._validate_timeline(timeline, issues, window)
+        return issues
+    
+    @staticmethod
+    def _as_messages(issues: List[Violation]) -> Dict:
+        violations = [v.message for v in issues if v.severity == VIOLATION]
+        return {
+            'compliant': len(violations) == 0,
+            'violations': violations,
+            'warnings': [v.message for v in issues if v.severity == WARNING]
+        }
+    
+    def _validate_timeline(self, timeline, issues: List[Violation],
+                           window: Optional[Tuple[datetime, datetime]] = None):
+        """Run the EWTD checks over one user's timeline, optionally restricted to a window
         
-        for shift in shifts_to_check:
-            duration = (shift.end - shift.start).total_seconds() / 3600
+        Works on the store's epoch-minute columns; datetimes are only built for findings.
+        """
+        uid = timeline.user_id
+        constraint = self.user_constraints.get(uid) or UserConstraints(user_id=uid)
+        min_rest = constraint.min_rest_hours * 60
+        starts, ends = self.store.starts, self.store.ends
+        
+        def finding(rule, severity, lo, hi, measured, limit, message, shift_rows=()):
+            issues.append(Violation(
+                rule, severity, uid, from_minutes(lo), from_minutes(hi), measured, limit, message,
+                tuple((from_minutes(starts[r]), from_minutes(ends[r])) for r in shift_rows)
+            ))
+        
+        if window is None:
+            rows = list(timeline.shifts.rows())
+            night_rows = list(timeline.nights.rows())
+            leave = list(timeline.leave.index.intervals())
+        else:
+            lo, hi = to_minutes(window[0]), to_minutes(window[1])
+            run_margin = constraint.max_consecutive_nights * MINUTES_PER_DAY
+            rows = timeline.shifts.index.overlapping(lo, hi)
+            night_rows = timeline.nights.index.starting_between(lo - run_margin, hi + run_margin)
+            leave = timeline.leave.index.overlapping_intervals(lo, hi)
+        
+        # Walk the sorted shifts once, merging back-to-back shifts into duty periods
+        duty_start = duty_end = None
+        duty_rows = []
+        for row in rows:
+            start, end = starts[row], ends[row]
+            duration = (end - start) / 60
             
             if duration > 24:
-                violations.append(f"User {shift.user_id}: Shift exceeds 24 hours ({duration:.1f}h)")
+                finding(MAX_DUTY, VIOLATION, start, end, duration, 24,
+                        f"User {uid}: Shift exceeds 24 hours ({duration:.1f}h)", (row,))
             
             if duration < 1:
-                warnings.append(f"User {shift.user_id}: Very short shift ({duration:.1f}h)")
-        
-        # Check night call limits
-        if user_id:
-            night_shifts = [s for s in shifts_to_check if s.shift_type == 'night_call']
-            constraint = self.user_constraints.get(user_id)
-            if constraint and len(night_shifts) > constraint.max_nights_per_month:
-                violations.append(
-                    f"User {user_id}: Exceeds max night calls "
-                    f"({len(night_shifts)} > {constraint.max_nights_per_month})"
-                )
+                finding(SHORT_SHIFT, WARNING, start, end, duration, 1,
+                        f"User {uid}: Very short shift ({duration:.1f}h)", (row,))
+            
+            if duty_end is not None and start <= duty_end:
+                if start < duty_end:
+                    previous = max(duty_rows, key=lambda r: ends[r])
+                    overlap_end = min(duty_end, end)
+                    finding(OVERLAP, VIOLATION, start, overlap_end, (overlap_end - start) / 60, 0,
+                            f"User {uid}: Overlapping shifts at {from_minutes(start).isoformat()}",
+                            (previous, row))
+                duty_end = max(duty_end, end)
+                duty_rows.append(row)
+                continue
+            
+            if duty_end is not None:
+                self._check_duty_period(uid, duty_start, duty_end, duty_rows, finding)
+                rest = start - duty_end
+                if rest < min_rest:
+                    previous = max(duty_rows, key=lambda r: ends[r])
+                    finding(DAILY_REST, VIOLATION, duty_end, start, rest / 60, constraint.min_rest_hours,
+                            f"User {uid}: Insufficient rest before {from_minutes(start).isoformat()} "
+                            f"({rest / 60:.1f}h < {constraint.min_rest_hours}h)",
+                            (previous, row))
+            duty_start, duty_end, duty_rows = start, end, [row]
         
-        return {
-            'compliant': len(violations) == 0,
-            'violations': violations,
-            'warnings': warnings
-        }
+        if duty_end is not None:
+            self._check_duty_period(uid, duty_start, duty_end, duty_rows, finding)
+        
+        self._check_weekly_hours(uid, rows, starts, ends, constraint, finding)
+        
+        # Night call limits per calendar month and per run of consecutive nights
+        if window is None:
+            nights_per_month = Counter()
+            for row in night_rows:
+                night_start = from_minutes(starts[row])
+                nights_per_month[(night_start.year, night_start.month)] += 1
+        else:
+            months = []
+            year, month = window[0].year, window[0].month
+            while (year, month) <= (window[1].year, window[1].month):
+                months.append((year, month))
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            nights_per_month = {m: timeline.nights_in_month(*m) for m in months}
+        for (year, month), count in sorted(nights_per_month.items()):
+            if count > constraint.max_nights_per_month:
+                month_start = to_minutes(datetime(year, month, 1))
+                month_end = to_minutes(datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1))
+                finding(MONTHLY_NIGHTS, VIOLATION, month_start, month_end,
+                        count, constraint.max_nights_per_month,
+                        f"User {uid}: Exceeds max night calls in {year}-{month:02d} "
+                        f"({count} > {constraint.max_nights_per_month})",
+                        timeline.nights.index.starting_between(month_start, month_end))
+        
+        run_rows, run_end = [], None
+        for row in night_rows:
+            day = starts[row] // MINUTES_PER_DAY
+            if run_end == day:
+                continue
+            if run_end != day - 1:
+                run_rows = []
+            run_rows.append(row)
+            run_end = day
+            if len(run_rows) == constraint.max_consecutive_nights + 1:
+                finding(CONSECUTIVE_NIGHTS, VIOLATION, starts[run_rows[0]], ends[row],
+                        len(run_rows), constraint.max_consecutive_nights,
+                        f"User {uid}: Exceeds max consecutive nights ending "
+                        f"{from_minutes(starts[row]).date().isoformat()} "
+                        f"(> {constraint.max_consecutive_nights})",
+                        run_rows)
+        
+        calendar = self.availability
+        if calendar is not None and rows and calendar.covers(
+                from_minutes(starts[rows[0]]), from_minutes(max(ends[r] for r in rows))):
+            # One bit test per shift against the precomputed leave bitmap
+            leave_rows = [r for r in rows if calendar.on_leave_minutes(uid, starts[r], ends[r])]
+        else:
+            leave_rows = [row for leave_start, leave_end, _ in leave
+                          for row in timeline.shifts.index.overlapping(leave_start, leave_end)]
+        for row in leave_rows:
+            finding(LEAVE_OVERLAP, VIOLATION, starts[row], ends[row], None, None,
+                    f"User {uid}: Shift on {from_minutes(starts[row]).date().isoformat()} overlaps leave",
+                    (row,))
+    
+    @staticmethod
+    def _check_duty_period(user_id: int, start: int, end: int, duty_rows: List[int], finding: Callable):
+        """Flag back-to-back shifts that add up to more than 24h continuous duty"""
+        duration = (end - start) / 60
+        if len(duty_rows) > 1 and duration > 24:
+            finding(CONTINUOUS_DUTY, VIOLATION, start, end, duration, 24,
+                    f"User {user_id}: Continuous duty exceeds 24 hours ({duration:.1f}h)", duty_rows)
+    
+    @staticmethod
+    def _check_weekly_hours(user_id: int, rows: List[int], starts, ends,
+                            constraint: UserConstraints, finding: Callable):
+        """Warn on rolling 7-day windows (anchored at each shift start) above the weekly cap"""
+        week = 7 * MINUTES_PER_DAY
+        limit = constraint.max_weekly_hours * 60
+        hi = 0
+        minutes = 0
+        reported_until = None
+        row_starts = [starts[r] for r in rows]
+        row_ends = [ends[r] for r in rows]
+        for lo, start in enumerate(row_starts):
+            window_end = start + week
+            while hi < len(row_starts) and row_starts[hi] < window_end:
+                minutes += row_ends[hi] - row_starts[hi]
+                hi += 1
+            # Shifts are sorted and (when compliant) disjoint, so only the tail can spill over
+            total = minutes
+            j = hi - 1
+            while j >= lo and row_ends[j] > window_end:
+                total -= row_ends[j] - window_end
+                j -= 1
+            if total > limit and (reported_until is None or start >= reported_until):
+                finding(WEEKLY_HOURS, WARNING, start, window_end, total / 60, constraint.max_weekly_hours,
+                        f"User {user_id}: {total / 60:.1f}h in 7 days from "
+                        f"{from_minutes(start).date().isoformat()} "
+                        f"(> {constraint.max_weekly_hours:g}h)",
+                        rows[lo:hi])
+                reported_until = window_end
+            minutes -= row_ends[lo] - start
 
 def ewtd_check(daily_records: List[Tuple[datetime, datetime, str]]) -> Dict[str, bool]:
     """Basic EWTD (European Working Time Directive) checks"""
@@ -0,0 +1,156 @@
+"""Compact column store for engine shifts.
+
+Each shift is one row across typed ``array`` columns (about 33 bytes per
+shift). Times are minutes since the Unix epoch. Shift types are interned
+to one-byte codes, and labels live in a side dict that only holds rows
+that actually have labels. Engine code reads rows through lightweight
+``ShiftView`` objects that behave like the ``Shift`` dataclass.
+"""
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+EPOCH = datetime(1970, 1, 1)
+_MINUTE = timedelta(minutes=1)
+
+
+def to_minutes(dt: datetime) -> int:
+    return (dt - EPOCH) // _MINUTE
+
+
+def from_minutes(minutes: int) -> datetime:
+    return EPOCH + timedelta(minutes=minutes)
+
+
+class ShiftView:
+    """Read-only view of one store row with the attributes of engine.Shift"""
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: "ShiftStore", row: int):
+        self.store = store
+        self.row = row
+
+    @property
+    def user_id(self) -> int:
+        return self.store.user_ids[self.row]
+
+    @property
+    def post_id(self) -> int:
+        return self.store.post_ids[self.row]
+
+    @property
+    def start(self) -> datetime:
+        return from_minutes(self.store.starts[self.row])
+
+    @property
+    def end(self) -> datetime:
+        return from_minutes(self.store.ends[self.row])
+
+    @property
+    def shift_type(self) -> str:
+        return self.store.type_names[self.store.type_codes[self.row]]
+
+    @property
+    def labels(self) -> Dict:
+        return self.store.labels.get(self.row, {})
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ShiftView) and other.store is self.store and other.row == self.row
+
+    def __hash__(self) -> int:
+        return hash((id(self.store), self.row))
+
+    def __repr__(self) -> str:
+        return (f"ShiftView(row={self.row}, user_id={self.user_id}, post_id={self.post_id}, "
+                f"start={self.start!r}, end={self.end!r}, shift_type={self.shift_type!r})")
+
+
+class ShiftStore:
+    """Append-only columns of shifts; removed rows are tombstoned"""
+
+    def __init__(self):
+        self.user_ids = array('q')
+        self.post_ids = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.type_codes = array('B')
+        self.alive = bytearray()
+        self.type_names: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        self.labels: Dict[int, Dict] = {}
+        self._live = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __iter__(self) -> Iterator[ShiftView]:
+        return self.views(range(len(self.alive)))
+
+    @property
+    def row_count(self) -> int:
+        """Rows ever appended, including removed ones (the next row id)"""
+        return len(self.alive)
+
+    def type_code(self, shift_type: str) -> int:
+        code = self._type_index.get(shift_type)
+        if code is None:
+            code = self._type_index[shift_type] = len(self.type_names)
+            self.type_names.append(shift_type)
+        return code
+
+    def append(self, user_id: int, post_id: int, start: int, end: int,
+               shift_type: str, labels: Optional[Dict] = None) -> int:
+        """Append a shift given epoch-minute times; returns its row id"""
+        row = len(self.alive)
+        self.user_ids.append(user_id)
+        self.post_ids.append(post_id)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.type_codes.append(self.type_code(shift_type))
+        self.alive.append(1)
+        if labels:
+            self.labels[row] = labels
+        self._live += 1
+        return row
+
+    def add(self, shift: Any) -> int:
+        """Append anything with Shift attributes (dataclass, view or ORM row)"""
+        return self.append(shift.user_id, shift.post_id, to_minutes(shift.start),
+                           to_minutes(shift.end), shift.shift_type, shift.labels or None)
+
+    def extend_rows(self, rows: Iterable[tuple]) -> range:
+        """Append (user_id, post_id, start, end, shift_type, labels) tuples with datetime times"""
+        first = len(self.alive)
+        for user_id, post_id, start, end, shift_type, labels in rows:
+            self.append(user_id, post_id, to_minutes(start), to_minutes(end), shift_type, labels)
+        return range(first, len(self.alive))
+
+    def remove(self, row: int) -> bool:
+        if row >= len(self.alive) or not self.alive[row]:
+            return False
+        self.alive[row] = 0
+        self.labels.pop(row, None)
+        self._live -= 1
+        return True
+
+    def view(self, row: int) -> ShiftView:
+        return ShiftView(self, row)
+
+    def views(self, rows: Iterable[int]) -> Iterator[ShiftView]:
+        alive = self.alive
+        return (ShiftView(self, r) for r in rows if alive[r])
+
+    def copy_rows(self, other: "ShiftStore", rows: Iterable[int]) -> range:
+        """Append rows copied from another store"""
+        first = len(self.alive)
+        for r in rows:
+            if other.alive[r]:
+                self.append(other.user_ids[r], other.post_ids[r], other.starts[r], other.ends[r],
+                            other.type_names[other.type_codes[r]], other.labels.get(r))
+        return range(first, len(self.alive))
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns"""
+        return sum(col.itemsize * len(col) for col in
+                   (self.user_ids, self.post_ids, self.starts, self.ends, self.type_codes)) + len(self.alive)
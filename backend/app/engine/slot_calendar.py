@@ -0,0 +1,132 @@
+"""Month slot calendars expanded from SHIFT_DEFS and group shift rules.
+
+A calendar is a flat, immutable tuple of (start, end, shift_type, weekday)
+slots for one month, with epoch-minute columns alongside. Calendars are
+memoized per (year, month, rules), so every generation run over the same
+month and rules reuses one precomputed calendar.
+
+Group rules use the seed format::
+
+    {"name": "Night Call", "window": ["17:00", "09:00+1"], "days": ["MON", ...]}
+
+A rule replaces the SHIFT_DEFS window of its shift type on the listed days.
+"""
+import json
+from array import array
+from calendar import monthrange
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .shift_store import to_minutes
+
+WEEKDAYS = ("MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN")
+
+# (start, end, days the end falls after the start date)
+Window = Tuple[time, time, int]
+
+
+class Slot(NamedTuple):
+    start: datetime
+    end: datetime
+    shift_type: str
+    weekday: str
+
+
+class SlotCalendar:
+    """Every shift slot of one month, sorted by start"""
+
+    __slots__ = ("year", "month", "slots", "starts", "ends", "_by_type")
+
+    def __init__(self, year: int, month: int, slots: Iterable[Slot]):
+        self.year = year
+        self.month = month
+        self.slots: Tuple[Slot, ...] = tuple(sorted(slots, key=lambda s: (s.start, s.shift_type)))
+        self.starts = array('q', (to_minutes(s.start) for s in self.slots))
+        self.ends = array('q', (to_minutes(s.end) for s in self.slots))
+        by_type: Dict[str, List[Slot]] = {}
+        for slot in self.slots:
+            by_type.setdefault(slot.shift_type, []).append(slot)
+        self._by_type = {t: tuple(v) for t, v in by_type.items()}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __iter__(self):
+        return iter(self.slots)
+
+    def of_type(self, shift_type: str) -> Tuple[Slot, ...]:
+        return self._by_type.get(shift_type, ())
+
+    def shift_types(self) -> List[str]:
+        return list(self._by_type)
+
+
+def _expand_days(spec: str) -> List[str]:
+    """'Mon-Thu' -> ['MON', 'TUE', 'WED', 'THU']; 'Fri' -> ['FRI']"""
+    first, _, last = spec.upper().partition("-")
+    i = WEEKDAYS.index(first[:3])
+    j = WEEKDAYS.index(last[:3]) if last else i
+    return list(WEEKDAYS[i:j + 1])
+
+
+def _parse_time(value: str) -> Tuple[time, int]:
+    """'09:00+1' -> (09:00, 1)"""
+    clock, _, plus = value.partition("+")
+    hours, minutes = clock.split(":")
+    return time(int(hours), int(minutes)), int(plus or 0)
+
+
+def _window(start: time, end: time, end_days: Optional[int] = None) -> Window:
+    if end_days is None:
+        end_days = 1 if end <= start else 0
+    return start, end, end_days
+
+
+def shift_type_name(name: str) -> str:
+    """Rule names such as 'Night Call' map to engine shift types ('night_call')"""
+    return "_".join(name.lower().split())
+
+
+def _windows(shift_defs: Dict, rules: List[Dict]) -> Dict[Tuple[str, str], Window]:
+    windows: Dict[Tuple[str, str], Window] = {}
+    for (shift_type, days), (start, end) in shift_defs.items():
+        for weekday in _expand_days(days):
+            windows[(shift_type, weekday)] = _window(start, end)
+    for rule in rules:
+        start, _ = _parse_time(rule["window"][0])
+        end, end_days = _parse_time(rule["window"][1])
+        window = _window(start, end, end_days if "+" in rule["window"][1] else None)
+        shift_type = rule.get("shift_type") or shift_type_name(rule["name"])
+        for weekday in rule.get("days") or WEEKDAYS:
+            windows[(shift_type, weekday.upper()[:3])] = window
+    return windows
+
+
+@lru_cache(maxsize=64)
+def _cached_calendar(year: int, month: int, rules_key: str) -> SlotCalendar:
+    from .roster_engine import SHIFT_DEFS
+
+    windows = _windows(SHIFT_DEFS, json.loads(rules_key))
+    slots = []
+    for day in range(1, monthrange(year, month)[1] + 1):
+        d = date(year, month, day)
+        weekday = WEEKDAYS[d.weekday()]
+        for (shift_type, wd), (start, end, end_days) in windows.items():
+            if wd == weekday:
+                slots.append(Slot(
+                    datetime.combine(d, start),
+                    datetime.combine(d + timedelta(days=end_days), end),
+                    shift_type,
+                    weekday,
+                ))
+    return SlotCalendar(year, month, slots)
+
+
+def slot_calendar(year: int, month: int, shift_rules: Optional[List[Dict]] = None) -> SlotCalendar:
+    """Memoized slot calendar for a month from SHIFT_DEFS overridden by ``shift_rules``"""
+    rules_key = json.dumps(
+        [{k: r[k] for k in ("name", "shift_type", "window", "days") if k in r} for r in shift_rules or []],
+        sort_keys=True,
+    )
+    return _cached_calendar(year, month, rules_key)
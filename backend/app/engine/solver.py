@@ -0,0 +1,398 @@
+"""Simulated-annealing night-call solver.
+
+Slots are fixed (start, end) periods; the solver decides which user covers
+each one. Hard constraints (monthly night cap, minimum rest between the
+user's own calls, consecutive-night runs) are penalised rather than
+forbidden so the search can pass through infeasible states; static
+constraints (leave, OPD days, clashes with existing shifts) are applied up
+front by only offering users that the engine allows for a slot.
+
+All moves are evaluated incrementally: placing or lifting one slot touches
+only that user's counters and the slots near it in time.
+"""
+import math
+import multiprocessing
+import os
+import random
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .fairness import FairnessAccumulator
+
+HARD_WEIGHT = 1000.0
+UNFILLED_WEIGHT = 100.0
+
+UNASSIGNED = -1
+
+# Minimum seconds between progress callbacks
+PROGRESS_INTERVAL = 0.25
+
+# progress({'fraction', 'iterations', 'best_cost'}); raising from it aborts the solve
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# Start method for solver worker processes. Generation runs on request and job
+# threads, and forking a threaded process can copy held locks into the child.
+SOLVER_START_METHOD = os.getenv("SOLVER_START_METHOD", "forkserver")
+
+
+@dataclass
+class SolverResult:
+    assignments: List[Optional[int]]  # user_id per slot, None when unfilled
+    hard_violations: int
+    unfilled: int
+    fairness: float
+    iterations: int
+    elapsed: float
+    seed: Optional[int] = None
+
+    @property
+    def feasible(self) -> bool:
+        return self.hard_violations == 0
+
+    def rank(self) -> Tuple[int, int, float]:
+        """Sort key: hard-constraint feasibility first, then coverage, then fairness"""
+        return (self.hard_violations, self.unfilled, self.fairness)
+
+    @property
+    def cost(self) -> float:
+        """The solver objective for this assignment (see NightCallSolver.cost)"""
+        return HARD_WEIGHT * self.hard_violations + UNFILLED_WEIGHT * self.unfilled + self.fairness
+
+
+class NightCallSolver:
+    """Assign users to night-call slots minimising hard violations, gaps and unfairness"""
+
+    def __init__(self, slots: Sequence[Tuple[datetime, datetime]], user_ids: Sequence[int],
+                 allowed: Sequence[Set[int]], caps: Dict[int, int],
+                 min_rest_hours: Dict[int, float], max_consecutive: Dict[int, int],
+                 history_nights: Optional[Dict[int, Set[date]]] = None,
+                 baseline_hours: Optional[Dict[int, float]] = None,
+                 slot_loads: Optional[Sequence[float]] = None,
+                 seed: Optional[int] = None):
+        # Setup counts against the time budget (see solve)
+        self._created = time.perf_counter()
+        self.rng = random.Random(seed)
+        self.user_ids = list(user_ids)
+        n_users = len(self.user_ids)
+        index_of = {uid: i for i, uid in enumerate(self.user_ids)}
+
+        order = sorted(range(len(slots)), key=lambda i: slots[i][0])
+        self._slot_order = order
+        epoch = slots[order[0]][0] if slots else datetime(1970, 1, 1)
+        self.start = [int((slots[i][0] - epoch).total_seconds() // 60) for i in order]
+        self.end = [int((slots[i][1] - epoch).total_seconds() // 60) for i in order]
+        self.day = [slots[i][0].date().toordinal() for i in order]
+        # Fairness load of each slot: weighted hours when given, else plain hours
+        if slot_loads is None:
+            self.load_of = [(e - s) / 60.0 for s, e in zip(self.start, self.end)]
+        else:
+            self.load_of = [float(slot_loads[i]) for i in order]
+        self.allowed = [sorted(index_of[u] for u in allowed[i] if u in index_of) for i in order]
+        self.allowed_set = [set(a) for a in self.allowed]
+
+        self.cap = [caps.get(uid, 7) for uid in self.user_ids]
+        self.rest = [int(min_rest_hours.get(uid, 11) * 60) for uid in self.user_ids]
+        self.max_run = [max_consecutive.get(uid, 3) for uid in self.user_ids]
+        history_nights = history_nights or {}
+        self.history = [{d.toordinal() for d in history_nights.get(uid, ())} for uid in self.user_ids]
+        baseline_hours = baseline_hours or {}
+
+        # Slots close enough in time to interact through the rest rule
+        max_len = max((e - s for s, e in zip(self.start, self.end)), default=0)
+        reach = max_len + max(self.rest, default=0)
+        self.neighbours: List[List[int]] = []
+        for i, s in enumerate(self.start):
+            lo = bisect_left(self.start, s - reach)
+            hi = bisect_right(self.start, s + reach)
+            self.neighbours.append([j for j in range(lo, hi) if j != i])
+
+        # Mutable state
+        self.assign = [UNASSIGNED] * len(self.start)
+        self.count = [0] * n_users
+        self.days: List[Dict[int, int]] = [dict() for _ in range(n_users)]
+        self.loads = FairnessAccumulator(
+            range(n_users), {i: baseline_hours.get(uid, 0.0) for i, uid in enumerate(self.user_ids)}
+        )
+        self.over_cap = 0
+        self.conflicts = 0
+        # Excess added to consecutive-night runs by placed slots; runs already too long in
+        # the history alone are not counted, since no assignment can shorten them
+        self.run_excess = 0
+        self.unfilled = len(self.start)
+
+    # --- incremental state ------------------------------------------------
+    def _gap(self, a: int, b: int) -> int:
+        if self.start[b] >= self.start[a]:
+            return self.start[b] - self.end[a]
+        return self.start[a] - self.end[b]
+
+    def _conflicts_with(self, s: int, u: int) -> int:
+        rest = self.rest[u]
+        assign = self.assign
+        return sum(1 for n in self.neighbours[s] if assign[n] == u and self._gap(s, n) < rest)
+
+    def _has_night(self, u: int, d: int) -> bool:
+        return d in self.days[u] or d in self.history[u]
+
+    def _run_len(self, u: int, d: int, step: int) -> int:
+        n = 0
+        d += step
+        while self._has_night(u, d):
+            n += 1
+            d += step
+        return n
+
+    def _run_excess_around(self, u: int, d: int) -> int:
+        limit = self.max_run[u]
+        left = self._run_len(u, d, -1)
+        right = self._run_len(u, d, 1)
+        if self._has_night(u, d):
+            return max(0, left + right + 1 - limit)
+        return max(0, left - limit) + max(0, right - limit)
+
+    def place(self, s: int, u: int):
+        self.conflicts += self._conflicts_with(s, u)
+        if self.count[u] >= self.cap[u]:
+            self.over_cap += 1
+        self.count[u] += 1
+        d = self.day[s]
+        before = self._run_excess_around(u, d)
+        self.days[u][d] = self.days[u].get(d, 0) + 1
+        self.run_excess += self._run_excess_around(u, d) - before
+        self.loads.assign(u, self.load_of[s])
+        self.assign[s] = u
+        self.unfilled -= 1
+
+    def lift(self, s: int):
+        u = self.assign[s]
+        self.assign[s] = UNASSIGNED
+        self.conflicts -= self._conflicts_with(s, u)
+        self.count[u] -= 1
+        if self.count[u] >= self.cap[u]:
+            self.over_cap -= 1
+        d = self.day[s]
+        before = self._run_excess_around(u, d)
+        self.days[u][d] -= 1
+        if not self.days[u][d]:
+            del self.days[u][d]
+        self.run_excess += self._run_excess_around(u, d) - before
+        self.loads.unassign(u, self.load_of[s])
+        self.unfilled += 1
+        return u
+
+    # --- objective --------------------------------------------------------
+    @property
+    def hard(self) -> int:
+        return self.over_cap + self.conflicts + self.run_excess
+
+    @property
+    def fairness(self) -> float:
+        """Population stddev of (weighted) on-call hours (same as fairness_score)"""
+        return self.loads.score
+
+    def cost(self) -> float:
+        return HARD_WEIGHT * self.hard + UNFILLED_WEIGHT * self.unfilled + self.fairness
+
+    # --- search -----------------------------------------------------------
+    def _greedy(self):
+        """Fill each slot with the least-loaded allowed user that adds no hard violation"""
+        for s in range(len(self.start)):
+            best = None
+            for u in sorted(self.allowed[s], key=lambda u: (self.loads.load(u), self.rng.random())):
+                hard = self.hard
+                self.place(s, u)
+                clean = self.hard == hard
+                self.lift(s)
+                if clean:
+                    best = u
+                    break
+            if best is not None:
+                self.place(s, best)
+
+    def _propose(self):
+        """Apply a random move and return an undo list of (slot, previous user)"""
+        n = len(self.start)
+        s = self.rng.randrange(n)
+        if self.rng.random() < 0.5 and n > 1:
+            t = self.rng.randrange(n)
+            a, b = self.assign[s], self.assign[t]
+            if a == b or (b != UNASSIGNED and b not in self.allowed_set[s]) \
+                    or (a != UNASSIGNED and a not in self.allowed_set[t]):
+                return None
+            if a != UNASSIGNED:
+                self.lift(s)
+            if b != UNASSIGNED:
+                self.lift(t)
+            if b != UNASSIGNED:
+                self.place(s, b)
+            if a != UNASSIGNED:
+                self.place(t, a)
+            return [(s, a), (t, b)]
+
+        candidates = self.allowed[s]
+        if not candidates:
+            return None
+        current = self.assign[s]
+        new = candidates[self.rng.randrange(len(candidates))]
+        if self.rng.random() < 0.02:
+            new = UNASSIGNED
+        if new == current:
+            return None
+        if current != UNASSIGNED:
+            self.lift(s)
+        if new != UNASSIGNED:
+            self.place(s, new)
+        return [(s, current)]
+
+    def _undo(self, undo):
+        for s, _ in undo:
+            if self.assign[s] != UNASSIGNED:
+                self.lift(s)
+        for s, u in undo:
+            if u != UNASSIGNED:
+                self.place(s, u)
+
+    def solve(self, time_budget: float = 1.0, max_stale: Optional[int] = None,
+              t_start: float = 5.0, t_end: float = 0.01,
+              progress: Optional[ProgressCallback] = None) -> SolverResult:
+        """Anneal for up to ``time_budget`` seconds; ``progress`` gets the best cost so far
+
+        The budget runs from the solver's construction, so setup counts against it. Stops
+        early once the best assignment is feasible and leaves unfilled only the slots
+        nobody may take, and ``max_stale`` moves in a row have not improved it.
+        """
+        began = self._created
+        deadline = began + time_budget
+        reported = began
+        max_stale = max_stale or max(20000, 50 * len(self.start))
+
+        self._greedy()
+        current = self.cost()
+        best_cost, best = current, list(self.assign)
+        best_hard, best_unfilled = self.hard, self.unfilled
+        floor = self._unfillable()
+        iterations = stale = 0
+
+        if self.start and not (best_hard == 0 and best_unfilled == floor and self.fairness <= 1e-9):
+            temperature = t_start
+            while True:
+                iterations += 1
+                if iterations % 128 == 0:
+                    now = time.perf_counter()
+                    if now >= deadline:
+                        break
+                    frac = (now - began) / time_budget
+                    temperature = t_start * (t_end / t_start) ** frac
+                    if progress is not None and now - reported >= PROGRESS_INTERVAL:
+                        progress({'fraction': frac, 'iterations': iterations, 'best_cost': best_cost})
+                        reported = now
+                undo = self._propose()
+                if undo is None:
+                    continue
+                new = self.cost()
+                delta = new - current
+                if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                    current = new
+                    if current < best_cost - 1e-9:
+                        best_cost, best = current, list(self.assign)
+                        best_hard, best_unfilled = self.hard, self.unfilled
+                        stale = 0
+                        # Feasible, every fillable slot filled and loads equal: nothing left to gain
+                        if best_hard == 0 and best_unfilled == floor and self.fairness <= 1e-9:
+                            break
+                        continue
+                else:
+                    self._undo(undo)
+                stale += 1
+                # Once the best cannot improve on coverage, stop when fairness stalls too
+                if stale >= max_stale and best_hard == 0 and best_unfilled == floor:
+                    break
+
+        # Restore the best assignment so the reported metrics match it
+        for s in range(len(self.start)):
+            if self.assign[s] != UNASSIGNED:
+                self.lift(s)
+        for s, u in enumerate(best):
+            if u != UNASSIGNED:
+                self.place(s, u)
+        self.loads.resync()
+
+        assignments: List[Optional[int]] = [None] * len(self.start)
+        for s, u in enumerate(self.assign):
+            assignments[self._slot_order[s]] = self.user_ids[u] if u != UNASSIGNED else None
+        return SolverResult(
+            assignments=assignments,
+            hard_violations=self.hard,
+            unfilled=self.unfilled,
+            fairness=self.fairness,
+            iterations=iterations,
+            elapsed=time.perf_counter() - began,
+        )
+
+    def _unfillable(self) -> int:
+        return sum(1 for a in self.allowed if not a)
+
+
+def _solve_one(problem: Dict[str, Any], seed: Optional[int], time_budget: float,
+               progress: Optional[ProgressCallback] = None) -> SolverResult:
+    """Process-pool entry point: build a solver from plain data and run it"""
+    result = NightCallSolver(**problem, seed=seed).solve(time_budget=time_budget, progress=progress)
+    result.seed = seed
+    return result
+
+
+def process_context():
+    """multiprocessing context for solver pools (spawn where SOLVER_START_METHOD is unavailable)"""
+    if SOLVER_START_METHOD in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context(SOLVER_START_METHOD)
+    return multiprocessing.get_context("spawn")
+
+
+def solve_multistart(problem: Dict[str, Any], runs: int, time_budget: float = 1.0,
+                     workers: Optional[int] = None, seed: Optional[int] = None,
+                     progress: Optional[ProgressCallback] = None) -> SolverResult:
+    """Run independently seeded solvers across processes and keep the best by rank()
+
+    ``problem`` holds the NightCallSolver keyword arguments (everything but ``seed``)
+    and must be picklable. ``progress`` is called from this process only: within each
+    run when they run in-process, otherwise as each run finishes.
+    """
+    base = seed if seed is not None else random.SystemRandom().randrange(2 ** 31)
+    seeds = [base + i for i in range(runs)]
+    workers = max(1, min(workers or os.cpu_count() or 1, runs))
+
+    results: List[SolverResult] = []
+
+    def report(done: float, iterations: int, best_cost: Optional[float] = None):
+        costs = [r.cost for r in results] + ([best_cost] if best_cost is not None else [])
+        progress({'fraction': done / runs, 'iterations': iterations,
+                  'best_cost': min(costs) if costs else None})
+
+    if workers == 1:
+        for s in seeds:
+            run_progress = None
+            if progress is not None:
+                done, total = len(results), sum(r.iterations for r in results)
+                run_progress = lambda state, done=done, total=total: report(
+                    done + state['fraction'], total + state['iterations'], state['best_cost'])
+            results.append(_solve_one(problem, s, time_budget, run_progress))
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=process_context())
+        try:
+            futures = [pool.submit(_solve_one, problem, s, time_budget) for s in seeds]
+            for future in as_completed(futures):
+                results.append(future.result())
+                if progress is not None:
+                    report(len(results), sum(r.iterations for r in results))
+        finally:
+            # An aborting progress callback drops the runs that have not started
+            pool.shutdown(wait=True, cancel_futures=True)
+        results.sort(key=lambda r: r.seed)  # ties in rank() resolve by seed as before
+
+    best = min(results, key=lambda r: r.rank())
+    best.iterations = sum(r.iterations for r in results)
+    return best
@@ -0,0 +1,295 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime, timedelta, date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .shift_store import ShiftStore, ShiftView, to_minutes, from_minutes
+
+
+class IntervalList:
+    """Half-open [start, end) integer intervals kept sorted by start for bisect lookups
+
+    Starts, ends and item ids live in ``array('q')`` columns; callers pass epoch minutes.
+    """
+
+    __slots__ = ("_starts", "_ends", "_items", "_max_span")
+
+    def __init__(self):
+        self._starts = array('q')
+        self._ends = array('q')
+        self._items = array('q')
+        self._max_span = 0
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._items)
+
+    def load(self, intervals: Iterable[Tuple[int, int, int]]):
+        """Bulk load (start, end, item) triples with a single sort"""
+        rows = list(zip(self._starts, self._ends, self._items))
+        rows.extend(intervals)
+        rows.sort()
+        self._starts = array('q', (r[0] for r in rows))
+        self._ends = array('q', (r[1] for r in rows))
+        self._items = array('q', (r[2] for r in rows))
+        self._max_span = max((e - s for s, e, _ in rows), default=0)
+
+    def add(self, start: int, end: int, item: int):
+        i = bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._ends.insert(i, end)
+        self._items.insert(i, item)
+        if end - start > self._max_span:
+            self._max_span = end - start
+
+    def remove(self, start: int, item: int, end: Optional[int] = None) -> bool:
+        """Remove an item id (matching ``end`` too when given); returns False if it was not indexed
+
+        ``_max_span`` is left as it is, even if the longest interval goes: a stale
+        bound only widens the overlap scans, it never drops a match.
+        """
+        i = bisect_left(self._starts, start)
+        while i < len(self._starts) and self._starts[i] == start:
+            if self._items[i] == item and (end is None or self._ends[i] == end):
+                del self._starts[i], self._ends[i], self._items[i]
+                return True
+            i += 1
+        return False
+
+    def overlapping(self, start: int, end: int) -> List[int]:
+        """Items whose interval intersects [start, end)"""
+        return [item for _, _, item in self.overlapping_intervals(start, end)]
+
+    def overlapping_intervals(self, start: int, end: int) -> List[Tuple[int, int, int]]:
+        """(start, end, item) triples whose interval intersects [start, end)"""
+        lo = bisect_left(self._starts, start - self._max_span)
+        hi = bisect_left(self._starts, end)
+        starts, ends, items = self._starts, self._ends, self._items
+        return [(starts[i], ends[i], items[i]) for i in range(lo, hi) if ends[i] > start]
+
+    def starting_between(self, start: int, end: int) -> List[int]:
+        """Items whose start falls in [start, end)"""
+        return list(self._items[bisect_left(self._starts, start):bisect_left(self._starts, end)])
+
+    def count_starting_between(self, start: int, end: int) -> int:
+        return bisect_left(self._starts, end) - bisect_left(self._starts, start)
+
+    def last_before(self, at: int) -> Optional[int]:
+        """Latest item starting strictly before ``at``"""
+        i = bisect_left(self._starts, at)
+        return self._items[i - 1] if i else None
+
+    def first_from(self, at: int) -> Optional[int]:
+        """Earliest item starting at or after ``at``"""
+        i = bisect_left(self._starts, at)
+        return self._items[i] if i < len(self._items) else None
+
+    def last_ending_before(self, at: int) -> Optional[int]:
+        """Item ending last among those starting strictly before ``at``
+
+        Not always the latest-starting one: a long shift can outlast shorter ones
+        that start inside it. Only items starting within ``_max_span`` of the
+        latest start can end after it, so the scan stays short.
+        """
+        hi = bisect_left(self._starts, at)
+        if not hi:
+            return None
+        lo = bisect_left(self._starts, self._starts[hi - 1] - self._max_span)
+        ends = self._ends
+        return self._items[max(range(lo, hi), key=ends.__getitem__)]
+
+    def intervals(self) -> Iterator[Tuple[int, int, int]]:
+        return zip(self._starts, self._ends, self._items)
+
+
+class ShiftIntervals:
+    """Datetime-facing wrapper over an IntervalList of store rows, yielding ShiftViews"""
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: ShiftStore):
+        self.store = store
+        self.index = IntervalList()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[ShiftView]:
+        return self.store.views(self.index)
+
+    def rows(self) -> Iterator[int]:
+        return iter(self.index)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[ShiftView]:
+        return list(self.store.views(self.index.overlapping(to_minutes(start), to_minutes(end))))
+
+    def starting_between(self, start: datetime, end: datetime) -> List[ShiftView]:
+        return list(self.store.views(self.index.starting_between(to_minutes(start), to_minutes(end))))
+
+    def count_starting_between(self, start: datetime, end: datetime) -> int:
+        return self.index.count_starting_between(to_minutes(start), to_minutes(end))
+
+    def last_before(self, at: datetime) -> Optional[ShiftView]:
+        row = self.index.last_before(to_minutes(at))
+        return self.store.view(row) if row is not None else None
+
+    def first_from(self, at: datetime) -> Optional[ShiftView]:
+        row = self.index.first_from(to_minutes(at))
+        return self.store.view(row) if row is not None else None
+
+    def last_ending_before(self, at: datetime) -> Optional[ShiftView]:
+        row = self.index.last_ending_before(to_minutes(at))
+        return self.store.view(row) if row is not None else None
+
+
+class LeaveIntervals:
+    """Leave periods as an IntervalList, yielding (start, end) datetime pairs"""
+
+    __slots__ = ("index",)
+
+    def __init__(self):
+        self.index = IntervalList()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def load(self, periods: Iterable[Tuple[datetime, datetime]]):
+        self.index.load((to_minutes(s), to_minutes(e), 0) for s, e in periods)
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        return [(from_minutes(s), from_minutes(e))
+                for s, e, _ in self.index.overlapping_intervals(to_minutes(start), to_minutes(end))]
+
+    def intervals(self) -> Iterator[Tuple[datetime, datetime, None]]:
+        return ((from_minutes(s), from_minutes(e), None) for s, e, _ in self.index.intervals())
+
+
+def _month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+class UserTimeline:
+    """Per-user shift and leave timeline sorted by start time"""
+
+    __slots__ = ("user_id", "store", "shifts", "nights", "leave", "_night_dates")
+
+    def __init__(self, user_id: int, store: ShiftStore):
+        self.user_id = user_id
+        self.store = store
+        self.shifts = ShiftIntervals(store)
+        self.nights = ShiftIntervals(store)
+        self.leave = LeaveIntervals()
+        self._night_dates: Counter = Counter()
+
+    def _is_night(self, row: int) -> bool:
+        return self.store.type_names[self.store.type_codes[row]] == 'night_call'
+
+    def _night_date(self, row: int) -> date:
+        return from_minutes(self.store.starts[row]).date()
+
+    def load(self, rows: List[int]):
+        starts, ends = self.store.starts, self.store.ends
+        self.shifts.index.load((starts[r], ends[r], r) for r in rows)
+        nights = [r for r in rows if self._is_night(r)]
+        self.nights.index.load((starts[r], ends[r], r) for r in nights)
+        self._night_dates.update(self._night_date(r) for r in nights)
+
+    def add(self, row: int):
+        start, end = self.store.starts[row], self.store.ends[row]
+        self.shifts.index.add(start, end, row)
+        if self._is_night(row):
+            self.nights.index.add(start, end, row)
+            self._night_dates[self._night_date(row)] += 1
+
+    def remove(self, row: int) -> bool:
+        if not self.shifts.index.remove(self.store.starts[row], row):
+            return False
+        if self._is_night(row):
+            self.nights.index.remove(self.store.starts[row], row)
+            day = self._night_date(row)
+            self._night_dates[day] -= 1
+            if self._night_dates[day] <= 0:
+                del self._night_dates[day]
+        return True
+
+    def set_leave(self, periods: Iterable[Tuple[datetime, datetime]]):
+        self.leave = LeaveIntervals()
+        self.leave.load(periods)
+
+    def on_leave(self, start: datetime, end: datetime) -> bool:
+        return bool(self.leave.index.overlapping(to_minutes(start), to_minutes(end)))
+
+    def nights_in_month(self, year: int, month: int) -> int:
+        return self.nights.count_starting_between(*_month_bounds(year, month))
+
+    def night_dates(self) -> List[date]:
+        return list(self._night_dates.keys())
+
+    def night_run_through(self, day: date) -> int:
+        """Length of the run of consecutive night dates that would include ``day``"""
+        run = 1
+        d = day - timedelta(days=1)
+        while d in self._night_dates:
+            run += 1
+            d -= timedelta(days=1)
+        d = day + timedelta(days=1)
+        while d in self._night_dates:
+            run += 1
+            d += timedelta(days=1)
+        return run
+
+    def rest_gaps(self, start: datetime, end: datetime) -> Tuple[Optional[timedelta], Optional[timedelta]]:
+        """Rest before and after a candidate [start, end) period, None if unbounded
+
+        Rest before runs from the latest end among earlier-starting shifts.
+        """
+        index, store = self.shifts.index, self.store
+        prev_row = index.last_ending_before(to_minutes(start))
+        next_row = index.first_from(to_minutes(start))
+        before = timedelta(minutes=to_minutes(start) - store.ends[prev_row]) if prev_row is not None else None
+        after = timedelta(minutes=store.starts[next_row] - to_minutes(end)) if next_row is not None else None
+        return before, after
+
+
+class TimelineIndex:
+    """Maps user_id to its UserTimeline over a shared ShiftStore"""
+
+    def __init__(self, store: ShiftStore):
+        self.store = store
+        self._timelines: Dict[int, UserTimeline] = {}
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._timelines
+
+    def __iter__(self) -> Iterator[UserTimeline]:
+        return iter(self._timelines.values())
+
+    def get(self, user_id: int) -> UserTimeline:
+        timeline = self._timelines.get(user_id)
+        if timeline is None:
+            timeline = self._timelines[user_id] = UserTimeline(user_id, self.store)
+        return timeline
+
+    def user_ids(self) -> List[int]:
+        return list(self._timelines.keys())
+
+    def build(self, rows: Iterable[int]):
+        """Group store rows by user and sort each timeline once (O(n log n))"""
+        user_ids = self.store.user_ids
+        by_user: Dict[int, List[int]] = {}
+        for row in rows:
+            by_user.setdefault(user_ids[row], []).append(row)
+        for user_id, user_rows in by_user.items():
+            self.get(user_id).load(user_rows)
+
+    def add(self, row: int):
+        self.get(self.store.user_ids[row]).add(row)
+
+    def remove(self, row: int) -> bool:
+        timeline = self._timelines.get(self.store.user_ids[row])
+        return timeline.remove(row) if timeline is not None else False
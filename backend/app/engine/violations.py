@@ -0,0 +1,51 @@
+"""Structured EWTD findings produced by RosterEngine validation.
+
+Each finding carries a rule code, the user, the period it measures, the
+measured value against its limit and the (start, end) spans of the shifts
+involved. ``message`` is the legacy free-text form, so string reports are
+rendered from the same objects.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from .ewtd_vector import DAILY_REST, MAX_DUTY, OVERLAP
+
+SHORT_SHIFT = "SHORT_SHIFT"
+CONTINUOUS_DUTY = "CONTINUOUS_DUTY"
+WEEKLY_HOURS = "WEEKLY_HOURS"
+MONTHLY_NIGHTS = "MONTHLY_NIGHTS"
+CONSECUTIVE_NIGHTS = "CONSECUTIVE_NIGHTS"
+LEAVE_OVERLAP = "LEAVE_OVERLAP"
+
+ENGINE_RULES = (MAX_DUTY, SHORT_SHIFT, OVERLAP, DAILY_REST, CONTINUOUS_DUTY,
+                WEEKLY_HOURS, MONTHLY_NIGHTS, CONSECUTIVE_NIGHTS, LEAVE_OVERLAP)
+
+VIOLATION = "violation"
+WARNING = "warning"
+
+
+@dataclass(frozen=True)
+class Violation:
+    """One rule breach (or warning) for one user"""
+    rule: str
+    severity: str
+    user_id: int
+    start: datetime  # period the rule measured
+    end: datetime
+    measured: Optional[float]  # hours, or nights for the night call rules
+    limit: Optional[float]
+    message: str
+    shifts: Tuple[Tuple[datetime, datetime], ...] = ()
+
+    def to_dict(self) -> Dict:
+        return {
+            'rule': self.rule,
+            'severity': self.severity,
+            'user_id': self.user_id,
+            'start': self.start,
+            'end': self.end,
+            'measured': self.measured,
+            'limit': self.limit,
+            'message': self.message,
+        }
@@ -3,8 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 import time
 from sqlalchemy.exc import OperationalError
 
-from .db import engine, Base, SessionLocal
+from .db import engine, async_engine, Base, SessionLocal
 from .seed import seed
+from .services.jobs import job_runner
 
 # Import routers
 from .routers.api import router as posts_router
@@ -46,8 +47,19 @@ def on_startup():
     else:
         Base.metadata.create_all(bind=engine)
 
+    # create_all skips tables that already exist, so add indexes introduced later
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
     db = SessionLocal()
     try:
         seed(db)
     finally:
         db.close()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    job_runner.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, JSON, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, JSON, ForeignKey, Table, Index, and_, true
 from sqlalchemy.orm import relationship
 # from sqlalchemy.dialects.postgresql import JSONB
-from datetime import datetime
+from datetime import datetime, timedelta
 from .db import Base
 
+# Longest shift the windowed queries expect; bounds their index range scans on start
+MAX_SHIFT_SPAN = timedelta(days=7)
+
+# Only approved leave blocks rostering
+LEAVE_APPROVED = "approved"
+
 # Association table for Post-Group many-to-many
 post_group = Table(
     'post_group',
@@ -78,7 +84,7 @@ class Shift(Base):
     post_id = Column(Integer, ForeignKey('posts.id'), nullable=False, index=True)
     
     start = Column(DateTime, nullable=False, index=True)
-    end = Column(DateTime, nullable=False)
+    end = Column(DateTime, nullable=False, index=True)
     shift_type = Column(String, nullable=False)  # base, day_call, night_call, teaching, supervision
     
     labels = Column(JSON, default={})  # Additional metadata (paid_break, notes, etc.)
@@ -90,8 +96,27 @@ class Shift(Base):
     user = relationship("User", back_populates="shifts")
     post = relationship("Post", back_populates="shifts")
     
+    __table_args__ = (
+        Index('ix_shifts_user_start', 'user_id', 'start'),
+        Index('ix_shifts_post_start', 'post_id', 'start'),
+    )
+    
     def duration_hours(self):
         return (self.end - self.start).total_seconds() / 3600.0
+    
+    @classmethod
+    def overlapping(cls, window_start=None, window_end=None):
+        """Filter for shifts intersecting [window_start, window_end); either bound may be None
+        
+        The lower bound on start lets (user_id, start)/(post_id, start) serve it as a range scan.
+        """
+        conditions = []
+        if window_end is not None:
+            conditions.append(cls.start < window_end)
+        if window_start is not None:
+            conditions.append(cls.end > window_start)
+            conditions.append(cls.start > window_start - MAX_SHIFT_SPAN)
+        return and_(true(), *conditions)
 
 class Leave(Base):
     """Represents leave periods for users"""
@@ -103,7 +128,7 @@ class Leave(Base):
     start = Column(DateTime, nullable=False)
     end = Column(DateTime, nullable=False)
     leave_type = Column(String)  # annual, sick, study, etc.
-    status = Column(String, default="approved")  # pending, approved, rejected
+    status = Column(String, default=LEAVE_APPROVED)  # pending, approved, rejected
     notes = Column(String)
     
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,11 +1,14 @@
 # backend/app/routers/api.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import Any, Dict, List
 import json
 
-from ..db import get_db
+from ..db import get_db, get_async_db
 from .. import models
+from ..services.http_cache import cached_response
 
 router = APIRouter(tags=["core"])
 
@@ -26,17 +29,17 @@ def _as_json(obj) -> Dict[str, Any]:
             return {}
     return {}
 
+# Shared (read-only) default for posts without a call_policy
+DEFAULT_CALL_POLICY = {
+    "role": "NCHD",
+    "min_rest_hours": 11,
+    "max_nights_per_month": 7,
+    "participates_in_call": True,
+}
+
 def _post_to_dict(p: models.Post) -> Dict[str, Any]:
     eligibility = _as_json(p.eligibility)
-    call_policy = eligibility.get(
-        "call_policy",
-        {
-            "role": "NCHD",
-            "min_rest_hours": 11,
-            "max_nights_per_month": 7,
-            "participates_in_call": True,
-        },
-    )
+    call_policy = eligibility.get("call_policy", DEFAULT_CALL_POLICY)
     return {
         "id": p.id,
         "title": p.title,
@@ -55,9 +58,11 @@ def health():
 
 # --- posts ---------------------------------------------------------------------
 @router.get("/posts", response_model=List[Dict[str, Any]])
-def list_posts(db: Session = Depends(get_db)):
-    posts = db.query(models.Post).order_by(models.Post.id.asc()).all()
-    return [_post_to_dict(p) for p in posts]
+async def list_posts(request: Request, db=Depends(get_async_db)):
+    async def render():
+        posts = (await db.scalars(select(models.Post).order_by(models.Post.id.asc()))).all()
+        return JSONResponse([_post_to_dict(p) for p in posts])
+    return await cached_response(request, ("posts",), render)
 
 @router.post("/posts")
 def create_post(payload: Dict[str, Any], db: Session = Depends(get_db)):
@@ -1,10 +1,13 @@
 # backend/app/routers/groups.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import Any, Dict, List
 
-from ..db import get_db
+from ..db import get_db, get_async_db
 from .. import models
+from ..services.http_cache import cached_response
 
 router = APIRouter(prefix="/groups", tags=["groups"])
 
@@ -17,9 +20,11 @@ def _group_to_dict(g: models.Group) -> Dict[str, Any]:
     }
 
 @router.get("", response_model=List[Dict[str, Any]])
-def list_groups(db: Session = Depends(get_db)):
-    groups = db.query(models.Group).all()
-    return [_group_to_dict(g) for g in groups]
+async def list_groups(request: Request, db=Depends(get_async_db)):
+    async def render():
+        groups = (await db.scalars(select(models.Group))).all()
+        return JSONResponse([_group_to_dict(g) for g in groups])
+    return await cached_response(request, ("groups",), render)
 
 @router.post("", response_model=Dict[str, Any])
 def create_group(payload: Dict[str, Any], db: Session = Depends(get_db)):
@@ -1,47 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import anyio
+import asyncio
+import base64
+from contextlib import contextmanager
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import date
+from typing import FrozenSet, List, Optional, Tuple
+from datetime import date, datetime
 
-from ..db import get_db
-from ..models import Shift, User, Post
+from ..db import get_db, get_async_db, get_read_db, ReadSessionLocal, SessionLocal
+from ..models import Shift, User, Post, Group
 from ..schemas.roster import (
     ShiftCreate, ShiftUpdate, ShiftResponse, ShiftListResponse,
+    ShiftWriteResponse, ShiftDeleteResponse,
     GenerateRosterRequest, GenerateRosterResponse,
-    EWTDValidationResponse, ImportCSVRequest, ImportCSVResponse
+    BatchGenerateRequest, BatchGenerateResponse, PoolGenerateResult, PoolMonthResult,
+    GenerateRosterJobRequest, BatchGenerateJobRequest, JobResponse,
+    EWTDValidationResponse, ImportCSVRequest, ImportCSVResponse,
+    ImportProgress, ImportStreamResponse, ImportStreamError,
+    ImportGridRequest, ImportGridResponse, ViolationReportResponse,
+    SHIFT_LIST_ADAPTER, SHIFT_COLUMNS_ADAPTER, GENERATE_ROSTER_ADAPTER, VIOLATION_REPORT_ADAPTER
 )
-from ..services.roster_service import RosterService
+from ..engine.batch import month_horizon
+from ..engine.violations import ENGINE_RULES
+from ..services.roster_service import RosterService, filter_shifts, EXPORT_COLUMNS
+from ..services.http_cache import cached_response
+from ..services.jobs import job_runner, JobConflict, JobQueueFull
+from ..services.change_stream import Subscription, stream_events
 
 router = APIRouter(prefix="/roster", tags=["roster"])
 
+def _encode_cursor(start: datetime, shift_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{start.isoformat()}|{shift_id}".encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        start, shift_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(start), int(shift_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/shifts", response_model=ShiftListResponse)
-def list_shifts(
+async def list_shifts(
+    request: Request,
     user_id: Optional[int] = Query(None),
     post_id: Optional[int] = Query(None),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    count: bool = Query(True, description="Include the total (an extra COUNT query)"),
+    format: str = Query("rows", pattern="^(rows|columns)$",
+                        description="columns: one array per field instead of one object per shift"),
+    db=Depends(get_async_db)
 ):
-    """List shifts with optional filtering"""
-    query = db.query(Shift)
+    """List shifts with optional filtering, ordered by (start, id)
     
-    if user_id:
-        query = query.filter(Shift.user_id == user_id)
-    if post_id:
-        query = query.filter(Shift.post_id == post_id)
-    if start_date:
-        query = query.filter(Shift.start >= start_date)
-    if end_date:
-        query = query.filter(Shift.end <= end_date)
-    
-    total = query.count()
-    shifts = query.offset(skip).limit(limit).all()
+    Pass ``cursor`` (keyset pagination) instead of ``skip`` so deep pages stay fast.
+    Rows are selected as column tuples and serialized straight to JSON bytes.
+    """
+    async def render():
+        table = Shift.__table__
+        stmt = filter_shifts(select(*(table.c[name] for name in EXPORT_COLUMNS)),
+                             user_id, post_id, start_date, end_date)
+        total = await db.scalar(select(func.count()).select_from(stmt.subquery())) if count else None
+        
+        stmt = stmt.order_by(Shift.start, Shift.id)
+        if cursor:
+            after_start, after_id = _decode_cursor(cursor)
+            # The redundant start >= bound keeps the seek on the start index
+            stmt = stmt.where(Shift.start >= after_start, or_(
+                Shift.start > after_start,
+                and_(Shift.start == after_start, Shift.id > after_id)
+            ))
+        elif skip:
+            stmt = stmt.offset(skip)
+        
+        rows = (await db.execute(stmt.limit(limit + 1))).all()
+        next_cursor = _encode_cursor(rows[limit - 1].start, rows[limit - 1].id) if len(rows) > limit else None
+        rows = rows[:limit]
+        
+        if format == "columns":
+            columns = dict(zip(EXPORT_COLUMNS, map(list, zip(*rows)))) if rows else {c: [] for c in EXPORT_COLUMNS}
+            body = SHIFT_COLUMNS_ADAPTER.dump_json({'columns': columns, 'total': total, 'next_cursor': next_cursor})
+        else:
+            body = SHIFT_LIST_ADAPTER.dump_json({
+                'shifts': [dict(zip(EXPORT_COLUMNS, row)) for row in rows],
+                'total': total,
+                'next_cursor': next_cursor
+            })
+        return Response(body, media_type="application/json")
+    return await cached_response(request, ("shifts",), render)
+
+@router.get("/shifts/export")
+def export_shifts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: Optional[int] = Query(None),
+    post_id: Optional[int] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None)
+):
+    """Stream every matching shift as NDJSON or CSV from a server-side cursor"""
+    def rows():
+        # The response outlives request dependencies, so the stream owns its session
+        db = ReadSessionLocal()
+        try:
+            yield from RosterService(db).export_shifts(format, user_id, post_id, start_date, end_date)
+        finally:
+            db.close()
     
-    return ShiftListResponse(shifts=shifts, total=total)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(rows(), media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="shifts.{format}"'
+    })
 
-@router.post("/shifts", response_model=ShiftResponse, status_code=201)
+def _write_response(shift: Shift, delta: dict) -> ShiftWriteResponse:
+    return ShiftWriteResponse(**ShiftResponse.model_validate(shift).model_dump(), ewtd=delta)
+
+@router.post("/shifts", response_model=ShiftWriteResponse, status_code=201)
 def create_shift(shift_data: ShiftCreate, db: Session = Depends(get_db)):
     """Create a new shift"""
     # Verify user and post exist
@@ -55,73 +134,211 @@ def create_shift(shift_data: ShiftCreate, db: Session = Depends(get_db)):
     
     # Create shift using service
     service = RosterService(db)
-    shift = service.create_shift(
-        user_id=shift_data.user_id,
-        post_id=shift_data.post_id,
-        start=shift_data.start,
-        end=shift_data.end,
-        shift_type=shift_data.shift_type,
-        labels=shift_data.labels
-    )
+    try:
+        shift, delta = service.create_shift_checked(
+            user_id=shift_data.user_id,
+            post_id=shift_data.post_id,
+            start=shift_data.start,
+            end=shift_data.end,
+            shift_type=shift_data.shift_type,
+            labels=shift_data.labels
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
     
-    return shift
+    return _write_response(shift, delta)
 
 @router.get("/shifts/{shift_id}", response_model=ShiftResponse)
-def get_shift(shift_id: int, db: Session = Depends(get_db)):
+def get_shift(shift_id: int, db: Session = Depends(get_read_db)):
     """Get a specific shift"""
     shift = db.query(Shift).filter(Shift.id == shift_id).first()
     if not shift:
         raise HTTPException(status_code=404, detail="Shift not found")
     return shift
 
-@router.put("/shifts/{shift_id}", response_model=ShiftResponse)
+@router.put("/shifts/{shift_id}", response_model=ShiftWriteResponse)
 def update_shift(shift_id: int, shift_data: ShiftUpdate, db: Session = Depends(get_db)):
     """Update a shift"""
     service = RosterService(db)
-    shift = service.update_shift(shift_id, **shift_data.dict(exclude_unset=True))
+    try:
+        shift, delta = service.update_shift_checked(shift_id, **shift_data.model_dump(exclude_unset=True))
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
     
     if not shift:
         raise HTTPException(status_code=404, detail="Shift not found")
     
-    return shift
+    return _write_response(shift, delta)
 
-@router.delete("/shifts/{shift_id}")
+@router.delete("/shifts/{shift_id}", response_model=ShiftDeleteResponse)
 def delete_shift(shift_id: int, db: Session = Depends(get_db)):
     """Delete a shift"""
     service = RosterService(db)
-    success = service.delete_shift(shift_id)
+    success, delta = service.delete_shift_checked(shift_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Shift not found")
     
-    return {"ok": True}
+    return ShiftDeleteResponse(ok=True, ewtd=delta)
+
+def _check_posts(db: Session, post_ids: List[int]):
+    posts = db.query(Post).filter(Post.id.in_(post_ids)).all()
+    if len(posts) != len(post_ids):
+        raise HTTPException(status_code=404, detail="One or more posts not found")
+
+def _run_generate(db: Session, request: GenerateRosterRequest, progress=None) -> dict:
+    result = RosterService(db).generate_roster(
+        month=request.month,
+        year=request.year,
+        post_ids=request.post_ids,
+        calls_per_night=request.calls_per_night,
+        solver=request.solver,
+        time_budget=request.time_budget,
+        seed=request.seed,
+        restarts=request.restarts,
+        workers=request.workers,
+        progress=progress
+    )
+    return {
+        'assigned': result['assigned'],
+        'unassigned_dates': [str(d) for d in result['unassigned_dates']],
+        'total_nights': result['total_nights'],
+        'fairness_score': result.get('fairness_score'),
+        'hard_violations': result.get('hard_violations'),
+        'shifts_created': result['shifts_created']
+    }
+
+# Generation solves every NCHD it loads (a batch, every pool member), so runs are scoped by
+# month: two runs over the same month would book the same people without seeing each other
+def _month_scope(year: int, month: int, months: int = 1) -> FrozenSet[Tuple[int, int]]:
+    return frozenset(month_horizon(year, month, months))
+
+@contextmanager
+def _claim(scope):
+    try:
+        with job_runner.claim(scope):
+            yield
+    except JobConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
 
 @router.post("/generate", response_model=GenerateRosterResponse)
 def generate_roster(request: GenerateRosterRequest, db: Session = Depends(get_db)):
     """Generate roster for a month"""
     # Verify all posts exist
-    posts = db.query(Post).filter(Post.id.in_(request.post_ids)).all()
-    if len(posts) != len(request.post_ids):
-        raise HTTPException(status_code=404, detail="One or more posts not found")
-    
-    service = RosterService(db)
-    result = service.generate_roster(
-        month=request.month,
+    _check_posts(db, request.post_ids)
+    with _claim(_month_scope(request.year, request.month)):
+        result = _run_generate(db, request)
+    return Response(GENERATE_ROSTER_ADAPTER.dump_json(result), media_type="application/json")
+
+def _check_pools(db: Session, group_ids: List[int]):
+    groups = db.query(Group).filter(Group.id.in_(group_ids)).all()
+    if len(groups) != len(set(group_ids)):
+        raise HTTPException(status_code=404, detail="One or more groups not found")
+    not_pools = [g.id for g in groups if g.kind != "on_call_pool"]
+    if not_pools:
+        raise HTTPException(status_code=400, detail=f"Groups {not_pools} are not on-call pools")
+    empty = [pool.name for pool in RosterService(db).pool_specs(group_ids) if not pool.user_ids]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"On-call pools {empty} have no members: "
+                                                    "link posts to them or set rules['user_ids']")
+
+def _run_generate_batch(db: Session, request: BatchGenerateRequest, progress=None) -> BatchGenerateResponse:
+    result = RosterService(db).generate_batch(
+        group_ids=list(dict.fromkeys(request.group_ids)),
         year=request.year,
-        post_ids=request.post_ids,
-        calls_per_night=request.calls_per_night
+        month=request.month,
+        months=request.months,
+        calls_per_night=request.calls_per_night,
+        solver=request.solver,
+        time_budget=request.time_budget,
+        seed=request.seed,
+        restarts=request.restarts,
+        workers=request.workers,
+        progress=progress
     )
     
-    return GenerateRosterResponse(
-        assigned=result['assigned'],
-        unassigned_dates=[str(d) for d in result['unassigned_dates']],
-        total_nights=result['total_nights'],
+    return BatchGenerateResponse(
+        pools=[
+            PoolGenerateResult(
+                group_id=pool['group_id'],
+                name=pool['name'],
+                members=pool['members'],
+                months=[
+                    PoolMonthResult(**{**m, 'unassigned_dates': [str(d) for d in m['unassigned_dates']]})
+                    for m in pool['months']
+                ]
+            )
+            for pool in result['pools']
+        ],
         shifts_created=result['shifts_created']
     )
 
+@router.post("/generate-batch", response_model=BatchGenerateResponse)
+def generate_batch(request: BatchGenerateRequest, db: Session = Depends(get_db)):
+    """Generate several on-call pools over a horizon of up to 12 months"""
+    _check_pools(db, request.group_ids)
+    with _claim(_month_scope(request.year, request.month, request.months)):
+        return _run_generate_batch(db, request)
+
+# --- background jobs ------------------------------------------------------------
+def _submit_job(kind: str, request, run, scope) -> dict:
+    def job_run(job):
+        db = SessionLocal()
+        try:
+            return run(db, request, job.report)
+        finally:
+            db.close()
+    try:
+        return job_runner.submit(kind, request.model_dump(), job_run, scope=frozenset(scope)).to_dict()
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full, retry later")
+    except JobConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+@router.post("/jobs/generate", response_model=JobResponse, status_code=202)
+def submit_generate_job(request: GenerateRosterJobRequest, db: Session = Depends(get_db)):
+    """Queue a month's generation and return the job straight away (poll /jobs/{id})"""
+    _check_posts(db, request.post_ids)
+    return _submit_job("generate", request, _run_generate, _month_scope(request.year, request.month))
+
+@router.post("/jobs/generate-batch", response_model=JobResponse, status_code=202)
+def submit_generate_batch_job(request: BatchGenerateJobRequest, db: Session = Depends(get_db)):
+    """Queue a multi-pool, multi-month generation as a background job"""
+    _check_pools(db, request.group_ids)
+    return _submit_job("generate-batch", request,
+                       lambda db, request, progress: _run_generate_batch(db, request, progress).model_dump(),
+                       _month_scope(request.year, request.month, request.months))
+
+@router.get("/jobs", response_model=List[JobResponse])
+def list_jobs(status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed|cancelled)$")):
+    """Jobs of this process, newest first (finished ones are kept up to JOB_HISTORY)"""
+    return [job.to_dict() for job in job_runner.list(status)]
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str):
+    """Status, phase, progress and best cost so far; the result once it has succeeded"""
+    job = job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobResponse, status_code=202)
+def cancel_job(job_id: str):
+    """Cancel a queued job, or stop a running one before it writes any shifts"""
+    job = job_runner.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 @router.get("/validate", response_model=EWTDValidationResponse)
 @router.get("/validate/{user_id}", response_model=EWTDValidationResponse)
-def validate_ewtd(user_id: Optional[int] = None, db: Session = Depends(get_db)):
+def validate_ewtd(
+    user_id: Optional[int] = None,
+    reference_weeks: Optional[int] = Query(None, ge=1, le=52),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: Session = Depends(get_read_db)
+):
     """Validate EWTD compliance for all users or specific user"""
     if user_id:
         user = db.query(User).filter(User.id == user_id).first()
@@ -129,7 +346,8 @@ def validate_ewtd(user_id: Optional[int] = None, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="User not found")
     
     service = RosterService(db)
-    result = service.validate_ewtd(user_id)
+    result = service.validate_ewtd(user_id, reference_weeks=reference_weeks,
+                                   start_date=start_date, end_date=end_date)
     
     return EWTDValidationResponse(
         compliant=result['compliant'],
@@ -137,14 +355,166 @@ def validate_ewtd(user_id: Optional[int] = None, db: Session = Depends(get_db)):
         warnings=result.get('warnings', [])
     )
 
+@router.get("/violations", response_model=ViolationReportResponse)
+async def violation_report(
+    request: Request,
+    year: int = Query(..., ge=2020, le=2100),
+    month: int = Query(..., ge=1, le=12),
+    user_id: Optional[int] = Query(None),
+    group_id: Optional[int] = Query(None, description="Members of an on-call pool group"),
+    rule: Optional[str] = Query(None, pattern=f"^({'|'.join(ENGINE_RULES)})$"),
+    severity: Optional[str] = Query(None, pattern="^(violation|warning)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db)
+):
+    """Structured EWTD findings starting in one month, served from the per-user-per-month report cache
+    
+    ``counts`` and ``compliant`` cover every finding in scope; ``rule`` and ``severity``
+    filter the paginated ``violations`` list and its ``total``.
+    """
+    def build() -> bytes:
+        if user_id is not None and db.get(User, user_id) is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        if group_id is not None and db.get(Group, group_id) is None:
+            raise HTTPException(status_code=404, detail="Group not found")
+        report = RosterService(db).violation_report(year, month, user_id=user_id, group_id=group_id,
+                                                    rule=rule, severity=severity, offset=offset, limit=limit)
+        return VIOLATION_REPORT_ADAPTER.dump_json(report)
+    
+    async def render():
+        return Response(await run_in_threadpool(build), media_type="application/json")
+    return await cached_response(request, ("shifts", "leave", "users", "posts", "groups"), render)
+
 @router.post("/import-csv", response_model=ImportCSVResponse)
 def import_csv(request: ImportCSVRequest, db: Session = Depends(get_db)):
     """Import roster from CSV"""
     service = RosterService(db)
-    result = service.import_csv(request.csv_content)
+    result = service.import_csv(
+        request.csv_content,
+        batch_size=request.batch_size,
+        commit_mode=request.commit_mode,
+        return_shifts=request.return_shifts
+    )
     
     return ImportCSVResponse(
         imported=result['imported'],
         errors=result['errors'],
-        shifts=result['shifts']
+        shifts=result['shifts'],
+        chunks=result['chunks']
+    )
+
+@router.post("/import-grid", response_model=ImportGridResponse)
+def import_grid(request: ImportGridRequest, db: Session = Depends(get_db)):
+    """Import a weekly call grid laid out like roster_template.csv"""
+    service = RosterService(db)
+    result = service.import_grid(request.csv_content, skip_unresolved=request.skip_unresolved)
+    
+    return ImportGridResponse(
+        imported=result['imported'],
+        errors=result['errors'],
+        shifts=result['shifts'],
+        chunks=result['chunks'],
+        ewtd=result['ewtd']
+    )
+
+class _NDJSONResponse(StreamingResponse):
+    """Streams while the endpoint is still reading the request body
+    
+    StreamingResponse also listens on ``receive`` for a disconnect, which would
+    swallow the body chunks the import is reading.
+    """
+    media_type = "application/x-ndjson"
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+def _ndjson(record) -> bytes:
+    return record.model_dump_json().encode() + b"\n"
+
+@router.post("/import-csv/stream", response_class=_NDJSONResponse)
+async def import_csv_stream(
+    request: Request,
+    batch_size: int = Query(5000, ge=1, le=100000),
+    commit_mode: str = Query("atomic", pattern="^(atomic|chunk)$")
+):
+    """Import roster from a raw CSV request body, parsed row by row as it arrives
+    
+    Send the file as the body (e.g. ``curl --data-binary @roster.csv``). The body is
+    never buffered whole. The response is NDJSON, written as the import runs: one
+    ``{"type": "progress", ...}`` line per chunk, then one ``result`` line (or an
+    ``error`` line if the import failed).
+    """
+    body = request.stream()
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def next_chunk() -> bytes:
+        return await body.__anext__()
+    
+    def body_chunks():
+        # Runs in the worker thread: pull each chunk from the event loop on demand
+        while True:
+            try:
+                chunk = anyio.from_thread.run(next_chunk)
+            except StopAsyncIteration:
+                return
+            if chunk:
+                yield chunk
+    
+    def run():
+        # Own session: the response outlives the route's dependencies
+        db = SessionLocal()
+        try:
+            return RosterService(db).import_csv_stream(
+                body_chunks(), batch_size=batch_size, commit_mode=commit_mode,
+                on_progress=lambda event: loop.call_soon_threadsafe(queue.put_nowait, dict(event))
+            )
+        finally:
+            db.close()
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+    
+    async def records():
+        task = asyncio.ensure_future(run_in_threadpool(run))
+        while (event := await queue.get()) is not None:
+            yield _ndjson(ImportProgress(**event))
+        try:
+            result = await task
+        except Exception as exc:
+            yield _ndjson(ImportStreamError(detail=str(exc) or exc.__class__.__name__))
+            return
+        yield _ndjson(ImportStreamResponse.model_validate(result))
+    
+    return _NDJSONResponse(records())
+
+@router.get("/stream")
+async def change_stream(
+    request: Request,
+    site: Optional[str] = Query(None, description="Only posts of this site (and their current NCHDs' leave)"),
+    group_id: Optional[int] = Query(None, description="Only posts and members of this group")
+):
+    """Server-Sent Events feed of committed shift, leave and post changes
+    
+    Without filters every change is sent. Reconnecting clients resume from the
+    ``Last-Event-ID`` header; a ``resync`` event means re-fetch.
+    """
+    def scope():
+        db = ReadSessionLocal()
+        try:
+            if group_id is not None and db.get(Group, group_id) is None:
+                raise HTTPException(status_code=404, detail="Group not found")
+            return RosterService(db).subscription_scope(site=site, group_id=group_id)
+        finally:
+            db.close()
+    
+    subscription = Subscription(loop=asyncio.get_running_loop(), site=site)
+    if site is not None or group_id is not None:
+        post_ids, user_ids = await run_in_threadpool(scope)
+        subscription.post_ids, subscription.user_ids = frozenset(post_ids), frozenset(user_ids)
+    
+    last_event_id = request.headers.get("last-event-id")
+    return StreamingResponse(
+        stream_events(request, subscription, int(last_event_id) if last_event_id and last_event_id.isdigit() else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
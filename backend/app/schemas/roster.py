@@ -1,6 +1,9 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, TypeAdapter, validator
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Any, Optional, Dict, List
+from typing_extensions import TypedDict
+
+from ..models import MAX_SHIFT_SPAN
 
 class ShiftBase(BaseModel):
     user_id: int
@@ -15,6 +18,8 @@ class ShiftCreate(ShiftBase):
     def end_after_start(cls, v, values):
         if 'start' in values and v <= values['start']:
             raise ValueError('end must be after start')
+        if 'start' in values and v - values['start'] > MAX_SHIFT_SPAN:
+            raise ValueError(f'shift cannot span more than {MAX_SHIFT_SPAN.days} days')
         return v
     
     @validator('shift_type')
@@ -29,6 +34,12 @@ class ShiftUpdate(BaseModel):
     end: Optional[datetime]
     shift_type: Optional[str]
     labels: Optional[Dict]
+    
+    @validator('end')
+    def span_within_limit(cls, v, values):
+        if v is not None and values.get('start') is not None and v - values['start'] > MAX_SHIFT_SPAN:
+            raise ValueError(f'shift cannot span more than {MAX_SHIFT_SPAN.days} days')
+        return v
 
 class ShiftResponse(ShiftBase):
     id: int
@@ -36,33 +47,222 @@ class ShiftResponse(ShiftBase):
     updated_at: datetime
     
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+class EWTDDeltaResponse(BaseModel):
+    """EWTD changes caused by a single shift write, scoped to the affected user's window"""
+    compliant: bool
+    new_violations: List[str] = []
+    resolved_violations: List[str] = []
+    new_warnings: List[str] = []
+    resolved_warnings: List[str] = []
+
+class ShiftWriteResponse(ShiftResponse):
+    ewtd: EWTDDeltaResponse
+
+class ShiftDeleteResponse(BaseModel):
+    ok: bool
+    ewtd: EWTDDeltaResponse
 
 class ShiftListResponse(BaseModel):
     shifts: List[ShiftResponse]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+# Fast paths: plain column dicts serialized by precompiled adapters, no per-row model validation
+class ShiftRow(TypedDict):
+    id: int
+    user_id: int
+    post_id: int
+    start: datetime
+    end: datetime
+    shift_type: str
+    labels: Optional[Dict[str, Any]]
+    created_at: datetime
+    updated_at: datetime
+
+class ShiftListPage(TypedDict):
+    shifts: List[ShiftRow]
+    total: Optional[int]
+    next_cursor: Optional[str]
+
+class ShiftColumnsPage(TypedDict):
+    """format=columns: one array per field, aligned by index"""
+    columns: Dict[str, List[Any]]
+    total: Optional[int]
+    next_cursor: Optional[str]
+
+class GenerateRosterPage(TypedDict):
+    assigned: int
+    unassigned_dates: List[str]
+    total_nights: int
+    fairness_score: Optional[float]
+    hard_violations: Optional[int]
+    shifts_created: List[ShiftRow]
+
+SHIFT_LIST_ADAPTER = TypeAdapter(ShiftListPage)
+SHIFT_COLUMNS_ADAPTER = TypeAdapter(ShiftColumnsPage)
+GENERATE_ROSTER_ADAPTER = TypeAdapter(GenerateRosterPage)
 
 class GenerateRosterRequest(BaseModel):
     month: int = Field(..., ge=1, le=12)
     year: int = Field(..., ge=2020, le=2100)
     post_ids: List[int]
     calls_per_night: int = Field(1, ge=1, le=5)
+    solver: str = Field("round_robin", pattern="^(round_robin|anneal)$")
+    time_budget: float = Field(1.0, gt=0, le=60)
+    seed: Optional[int] = None
+    restarts: int = Field(1, ge=1, le=64)
+    workers: Optional[int] = Field(None, ge=1, le=64)
 
 class GenerateRosterResponse(BaseModel):
     assigned: int
     unassigned_dates: List[str]
     total_nights: int
+    fairness_score: Optional[float] = None
+    hard_violations: Optional[int] = None
     shifts_created: List[ShiftResponse]
 
+class BatchGenerateRequest(BaseModel):
+    group_ids: List[int]
+    month: int = Field(..., ge=1, le=12)
+    year: int = Field(..., ge=2020, le=2100)
+    months: int = Field(1, ge=1, le=12)
+    calls_per_night: int = Field(1, ge=1, le=5)
+    solver: str = Field("round_robin", pattern="^(round_robin|anneal)$")
+    time_budget: float = Field(1.0, gt=0, le=60)
+    seed: Optional[int] = None
+    restarts: int = Field(1, ge=1, le=64)
+    workers: Optional[int] = Field(None, ge=1, le=64)
+
+# Background jobs may run the solver far longer than a request can wait
+class GenerateRosterJobRequest(GenerateRosterRequest):
+    time_budget: float = Field(1.0, gt=0, le=900)
+
+class BatchGenerateJobRequest(BatchGenerateRequest):
+    time_budget: float = Field(1.0, gt=0, le=900)
+
+class JobResponse(BaseModel):
+    """A background job; ``result`` holds the generate response once it has succeeded"""
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str  # queued, running, succeeded, failed, cancelled
+    phase: Optional[str] = None  # starting, loading, solving, persisting, done
+    progress: float
+    iterations: int
+    best_cost: Optional[float] = None
+    cancel_requested: bool
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class PoolMonthResult(BaseModel):
+    year: int
+    month: int
+    assigned: int
+    unassigned_dates: List[str]
+    total_nights: int
+    fairness_score: Optional[float] = None
+    hard_violations: Optional[int] = None
+
+class PoolGenerateResult(BaseModel):
+    group_id: int
+    name: str
+    members: int
+    months: List[PoolMonthResult]
+
+class BatchGenerateResponse(BaseModel):
+    pools: List[PoolGenerateResult]
+    shifts_created: int
+
 class EWTDValidationResponse(BaseModel):
     compliant: bool
     violations: List[str]
     warnings: List[str]
 
+class ViolationResponse(BaseModel):
+    """One structured EWTD finding; measured and limit are hours (nights for night call rules)"""
+    rule: str
+    severity: str
+    user_id: int
+    start: datetime
+    end: datetime
+    measured: Optional[float] = None
+    limit: Optional[float] = None
+    message: str
+    shift_ids: List[int] = []
+
+class ViolationReportResponse(BaseModel):
+    year: int
+    month: int
+    users_checked: int
+    compliant: bool
+    counts: Dict[str, int]
+    total: int
+    violations: List[ViolationResponse]
+
+# Report pages are cached as dicts and serialized without model validation
+class ViolationRow(TypedDict):
+    rule: str
+    severity: str
+    user_id: int
+    start: datetime
+    end: datetime
+    measured: Optional[float]
+    limit: Optional[float]
+    message: str
+    shift_ids: List[int]
+
+class ViolationReportPage(TypedDict):
+    year: int
+    month: int
+    users_checked: int
+    compliant: bool
+    counts: Dict[str, int]
+    total: int
+    violations: List[ViolationRow]
+
+VIOLATION_REPORT_ADAPTER = TypeAdapter(ViolationReportPage)
+
 class ImportCSVRequest(BaseModel):
     csv_content: str
+    batch_size: int = Field(5000, ge=1, le=100000)
+    commit_mode: str = Field("atomic", pattern="^(atomic|chunk)$")
+    return_shifts: bool = True
 
 class ImportCSVResponse(BaseModel):
     imported: int
     errors: List[str]
     shifts: List[ShiftResponse]
+    chunks: int = 0
+
+class ImportGridRequest(BaseModel):
+    csv_content: str
+    skip_unresolved: bool = False
+
+class ImportGridResponse(ImportCSVResponse):
+    ewtd: EWTDDeltaResponse
+
+# NDJSON lines of /import-csv/stream: progress per chunk, then a result or an error
+class ImportProgress(BaseModel):
+    type: str = "progress"
+    rows_read: int
+    imported: int
+    chunks: int
+    errors: int
+    bytes_read: int
+
+class ImportStreamResponse(BaseModel):
+    type: str = "result"
+    imported: int
+    errors: List[str]
+    chunks: int
+    rows_read: int
+    bytes_read: int
+
+class ImportStreamError(BaseModel):
+    type: str = "error"
+    detail: str
@@ -0,0 +1,193 @@
+"""Capture of the rows each transaction writes, published once it commits.
+
+One set of session listeners serves every consumer that reacts to writes:
+the engine snapshot cache, the HTTP table versions and the live change
+stream subscribe to ``change_capture`` instead of hooking the session
+themselves.
+
+Rows written through the ORM are recorded at flush time with their column
+values (and, for updates and deletes, the previous values of the changed
+columns). Insert, update and delete statements are recorded per statement;
+an ``executemany`` insert keeps a summary of its rows, and the rows
+themselves up to MAX_CAPTURED_ROWS per transaction. The changes of a
+transaction are published as one ChangeSet after it commits. A rollback
+discards them, so subscribers never see writes that did not land.
+"""
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Union
+
+from sqlalchemy import event, inspect
+
+from ..db import SessionLocal
+
+_WRITES = "change_capture_writes"
+_WRITING = "change_capture_writing"
+_KEPT = "change_capture_kept_rows"
+
+# Insert parameter sets held per transaction; past this only summaries are kept
+MAX_CAPTURED_ROWS = 10_000
+
+
+@dataclass
+class RowChange:
+    """One row flushed by the ORM"""
+    table: str
+    op: str  # created, updated or deleted
+    values: Dict[str, Any]  # column values as flushed
+    old: Dict[str, Any] = field(default_factory=dict)  # previous values of the changed columns
+
+    @property
+    def previous(self) -> Dict[str, Any]:
+        """Column values before the write (updates and deletes)"""
+        return {**self.values, **self.old}
+
+
+@dataclass
+class StatementChange:
+    """An insert, update or delete statement executed through the session
+
+    An insert carries a summary of its parameter sets. The parameter sets themselves
+    are kept only while the transaction has captured at most MAX_CAPTURED_ROWS of them.
+    """
+    table: str
+    op: str  # insert, update or delete
+    rows: Optional[List[Dict[str, Any]]] = None  # an insert's parameter sets, None once over the cap
+    count: int = 0
+    start: Optional[datetime] = None  # earliest 'start' among the rows
+    end: Optional[datetime] = None  # latest 'end' among the rows
+    user_ids: FrozenSet[int] = frozenset()
+    post_ids: FrozenSet[int] = frozenset()
+
+    @classmethod
+    def insert(cls, table: str, rows: List[Dict[str, Any]]) -> "StatementChange":
+        starts = [r['start'] for r in rows if r.get('start')]
+        ends = [r['end'] for r in rows if r.get('end')]
+        return cls(table, 'insert', list(rows), len(rows),
+                   start=min(starts) if starts else None, end=max(ends) if ends else None,
+                   user_ids=frozenset(r['user_id'] for r in rows if r.get('user_id') is not None),
+                   post_ids=frozenset(r['post_id'] for r in rows if r.get('post_id') is not None))
+
+
+Write = Union[RowChange, StatementChange]
+
+
+@dataclass
+class ChangeSet:
+    """Everything one committed transaction wrote, in flush order"""
+    writes: List[Write]
+
+    @property
+    def tables(self) -> FrozenSet[str]:
+        return frozenset(w.table for w in self.writes)
+
+
+class ChangeCapture:
+    """Subscribers to committed change sets, plus a count of transactions writing right now"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self._listeners: List[Callable[[ChangeSet], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Callable[[ChangeSet], None]):
+        """Call ``listener(change_set)`` in the committing thread after every commit that wrote rows"""
+        self._listeners.append(listener)
+
+    def publish(self, change_set: ChangeSet):
+        for listener in self._listeners:
+            listener(change_set)
+
+    def begin_write(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end_write(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+change_capture = ChangeCapture()
+
+
+def _row_change(obj, op: str) -> RowChange:
+    state = inspect(obj)
+    values, old = {}, {}
+    for attr in state.mapper.column_attrs:
+        values[attr.key] = getattr(obj, attr.key)
+        if op != 'created':
+            history = state.attrs[attr.key].history
+            if history.deleted:
+                old[attr.key] = history.deleted[0]
+    return RowChange(state.mapper.local_table.name, op, values, old)
+
+
+def _capture(session, writes: List[Write]):
+    """Queue writes on the session, holding ``in_flight`` from the first one until the transaction ends"""
+    if not session.info.get(_WRITING):
+        session.info[_WRITING] = True
+        change_capture.begin_write()
+    session.info.setdefault(_WRITES, []).extend(writes)
+
+
+def _finish(session):
+    session.info.pop(_WRITES, None)
+    session.info.pop(_KEPT, None)
+    if session.info.pop(_WRITING, False):
+        change_capture.end_write()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _capture_flush(session, flush_context):
+    writes: List[Write] = [_row_change(obj, 'created') for obj in session.new]
+    writes += [_row_change(obj, 'updated') for obj in session.dirty if session.is_modified(obj)]
+    writes += [_row_change(obj, 'deleted') for obj in session.deleted]
+    if writes:
+        _capture(session, writes)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _capture_execute(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    table = mapper.local_table.name
+    session = orm_execute_state.session
+    if not orm_execute_state.is_insert:
+        _capture(session, [StatementChange(table, 'update' if orm_execute_state.is_update else 'delete')])
+        return
+    params = orm_execute_state.parameters
+    change = StatementChange.insert(table, params if isinstance(params, list) else [params] if params else [])
+    kept = session.info.get(_KEPT, 0) + change.count
+    if kept > MAX_CAPTURED_ROWS:
+        # A bulk load: drop the rows held so far so the transaction's memory stays flat
+        change.rows = None
+        for write in session.info.get(_WRITES, []):
+            if isinstance(write, StatementChange):
+                write.rows = None
+    session.info[_KEPT] = kept
+    _capture(session, [change])
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish(session):
+    writes = session.info.pop(_WRITES, None)
+    try:
+        if writes:
+            change_capture.publish(ChangeSet(writes))
+    finally:
+        _finish(session)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard(session):
+    _finish(session)
+
+
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _end(session, transaction):
+    if transaction.parent is None:
+        _finish(session)
@@ -0,0 +1,208 @@
+"""Live feed of committed shift, leave and post changes for Server-Sent Events.
+
+Events are built from the change sets change_capture publishes after each commit
+and encoded once for every subscriber; slow or stale clients get a ``resync``.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, FrozenSet, List, Optional
+
+from ..models import Leave, Post, Shift
+from .change_capture import ChangeSet, RowChange, StatementChange, change_capture
+
+STREAM_QUEUE = int(os.getenv("STREAM_QUEUE", "256"))
+STREAM_BACKLOG = int(os.getenv("STREAM_BACKLOG", "1000"))
+STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", "15"))  # seconds
+
+
+@dataclass
+class ChangeEvent:
+    seq: int
+    kind: str  # shift, leave, post or resync
+    payload: Dict[str, Any]
+    post_ids: FrozenSet[int] = frozenset()
+    user_ids: FrozenSet[int] = frozenset()
+    site: Optional[str] = None
+    broad: bool = False  # no ids known (bulk update/delete): goes to every subscriber
+    data: bytes = b""
+
+    def encode(self):
+        body = json.dumps({'seq': self.seq, 'type': self.kind, **self.payload},
+                          default=datetime.isoformat, separators=(",", ":"))
+        self.data = f"id: {self.seq}\nevent: {self.kind}\ndata: {body}\n\n".encode()
+
+
+@dataclass
+class Subscription:
+    """One client's filter and queue; post_ids/user_ids of None accept everything"""
+    loop: asyncio.AbstractEventLoop
+    post_ids: Optional[FrozenSet[int]] = None
+    user_ids: Optional[FrozenSet[int]] = None
+    site: Optional[str] = None
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=STREAM_QUEUE))
+
+    def wants(self, change: ChangeEvent) -> bool:
+        """Shift and post events match by post, leave events by user"""
+        if self.post_ids is None or change.broad:
+            return True
+        if change.kind == 'leave':
+            return bool(self.user_ids and change.user_ids & self.user_ids)
+        if change.kind == 'post' and self.site is not None and change.site == self.site:
+            return True
+        return bool(change.post_ids & self.post_ids)
+
+    def track(self, change: ChangeEvent):
+        """Follow posts that move into or out of a subscribed site
+
+        Called by the broker as it matches each event, so the next event is filtered
+        against the new set. The set is replaced rather than mutated, since
+        publishers read it from other threads.
+        """
+        if change.kind == 'post' and self.site is not None and self.post_ids is not None:
+            post_id = change.payload['id']
+            if change.payload['op'] != 'deleted' and change.site == self.site:
+                self.post_ids = self.post_ids | {post_id}
+            else:
+                self.post_ids = self.post_ids - {post_id}
+
+    def push(self, change: ChangeEvent):
+        """Runs on the subscriber's loop; an overflowing queue collapses into one resync"""
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(resync_event(change.seq))
+
+
+def resync_event(seq: int) -> ChangeEvent:
+    change = ChangeEvent(seq, 'resync', {'reason': 'missed events'}, broad=True)
+    change.encode()
+    return change
+
+
+class ChangeBroker:
+    """Fan committed changes out to subscriber queues, keeping a short backlog"""
+
+    def __init__(self, backlog: int = STREAM_BACKLOG):
+        self.seq = 0
+        self._backlog: Deque[ChangeEvent] = deque(maxlen=backlog)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, subscription: Subscription, last_event_id: Optional[int] = None) -> Subscription:
+        """Register a subscriber, queueing the backlog after ``last_event_id`` (or a resync)"""
+        with self._lock:
+            if last_event_id is not None and last_event_id != self.seq:
+                missed = [c for c in self._backlog if c.seq > last_event_id]
+                # An id ahead of this broker comes from before a restart
+                if last_event_id > self.seq or not missed or missed[0].seq != last_event_id + 1:
+                    subscription.push(resync_event(self.seq))
+                else:
+                    for change in missed:
+                        if subscription.wants(change):
+                            subscription.track(change)
+                            subscription.push(change)
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def publish(self, changes: List[Dict[str, Any]]):
+        """Number, encode and broadcast captured changes (called from any thread)"""
+        with self._lock:
+            for captured in changes:
+                self.seq += 1
+                change = ChangeEvent(self.seq, **captured)
+                change.encode()
+                self._backlog.append(change)
+                for subscription in self._subscribers:
+                    if subscription.wants(change):
+                        subscription.track(change)
+                        try:
+                            subscription.loop.call_soon_threadsafe(subscription.push, change)
+                        except RuntimeError:
+                            # The subscriber's loop has closed; its stream is going away
+                            pass
+
+
+change_broker = ChangeBroker()
+
+
+async def stream_events(request, subscription: Subscription, last_event_id: Optional[int] = None):
+    """SSE body for one subscriber: queued events, with comment heartbeats while idle"""
+    change_broker.subscribe(subscription, last_event_id)
+    try:
+        yield b": connected\n\n"
+        while True:
+            try:
+                change = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": ping\n\n"
+                continue
+            yield change.data
+    finally:
+        change_broker.unsubscribe(subscription)
+
+
+# --- change capture ------------------------------------------------------------
+def _shift_event(write: RowChange) -> Dict[str, Any]:
+    row = write.values
+    # A shift moved between posts is sent to both sides
+    post_ids = {row['post_id'], write.previous['post_id']}
+    return dict(kind='shift', payload={
+        'op': write.op, 'id': row['id'], 'user_id': row['user_id'], 'post_id': row['post_id'],
+        'start': row['start'], 'end': row['end'], 'shift_type': row['shift_type'],
+    }, post_ids=frozenset(post_ids))
+
+
+def _leave_event(write: RowChange) -> Dict[str, Any]:
+    row = write.values
+    return dict(kind='leave', payload={
+        'op': write.op, 'id': row['id'], 'user_id': row['user_id'], 'start': row['start'], 'end': row['end'],
+        'leave_type': row['leave_type'], 'status': row['status'],
+    }, user_ids=frozenset({row['user_id']}))
+
+
+def _post_event(write: RowChange) -> Dict[str, Any]:
+    row = write.values
+    return dict(kind='post', payload={
+        'op': write.op, 'id': row['id'], 'title': row['title'], 'site': row['site'], 'status': row['status'],
+    }, post_ids=frozenset({row['id']}), site=row['site'])
+
+
+_BUILDERS = {Shift.__tablename__: _shift_event, Leave.__tablename__: _leave_event, Post.__tablename__: _post_event}
+_KINDS = {Shift.__tablename__: 'shift', Leave.__tablename__: 'leave', Post.__tablename__: 'post'}
+
+
+def _statement_event(write: StatementChange) -> Dict[str, Any]:
+    kind = _KINDS[write.table]
+    if write.op != 'insert' or not write.count:
+        return dict(kind=kind, payload={'op': 'bulk'}, broad=True)
+    # One summary per bulk insert; clients re-fetch the range it covers
+    return dict(kind=kind, payload={
+        'op': 'bulk', 'count': write.count, 'start': write.start, 'end': write.end,
+    }, post_ids=write.post_ids, user_ids=write.user_ids, broad=not (write.post_ids or write.user_ids))
+
+
+def _committed(change_set: ChangeSet):
+    changes = [_statement_event(w) if isinstance(w, StatementChange) else _BUILDERS[w.table](w)
+               for w in change_set.writes if w.table in _KINDS]
+    if changes:
+        change_broker.publish(changes)
+
+
+change_capture.subscribe(_committed)
@@ -0,0 +1,215 @@
+"""Process-level cache of engine snapshots, versioned by committed roster writes.
+
+Shift and leave changes are replayed onto a copy of each snapshot on its next
+read; writes that cannot be replayed drop every snapshot.
+"""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from ..models import LEAVE_APPROVED, Leave, Post, Shift, User
+from ..engine.roster_engine import RosterEngine, Shift as EngineShift
+from .change_capture import ChangeSet, StatementChange, change_capture
+
+ENGINE_CACHE_BYTES = int(float(os.getenv("ENGINE_CACHE_MB", "64")) * 1024 * 1024)
+
+# Timeline index overhead per store row on top of the store's own columns
+TIMELINE_BYTES_PER_ROW = 200
+
+# Changes queued by one commit before it falls back to dropping every snapshot
+MAX_PENDING_CHANGES = 10_000
+
+# ('shift', +1/-1, user_id, post_id, start, end, shift_type, labels) or ('leave', +1/-1, user_id, start, end)
+Change = Tuple
+
+@dataclass
+class Snapshot:
+    engine: RosterEngine
+    window: Tuple[Optional[datetime], Optional[datetime]]
+    user_ids: Optional[FrozenSet[int]]
+    nbytes: int
+    pending: List[Change] = field(default_factory=list)
+
+    def covers(self, user_id: int, start: datetime, end: datetime) -> bool:
+        lo, hi = self.window
+        return ((self.user_ids is None or user_id in self.user_ids)
+                and (lo is None or end > lo) and (hi is None or start < hi))
+
+
+def _snapshot_bytes(engine: RosterEngine) -> int:
+    return engine.store.nbytes() + TIMELINE_BYTES_PER_ROW * engine.store.row_count
+
+
+def change_span(change: Change) -> Tuple[int, datetime, datetime]:
+    """(user_id, start, end) of a change"""
+    if change[0] == 'shift':
+        return change[2], change[4], change[5]
+    return change[2], change[3], change[4]
+
+
+def _apply(engine: RosterEngine, change: Change) -> bool:
+    """Replay one change on ``engine``; False when the snapshot cannot absorb it"""
+    if change[0] == 'shift':
+        _, sign, user_id, post_id, start, end, shift_type, labels = change
+        if user_id not in engine.user_constraints:
+            return False
+        if sign > 0:
+            engine.add_shift(EngineShift(user_id, post_id, start, end, shift_type, dict(labels or {})))
+            return True
+        for view in engine.timelines.get(user_id).shifts.overlapping(start, end):
+            if (view.start, view.end, view.post_id, view.shift_type) == (start, end, post_id, shift_type):
+                return engine.remove_shift(view)
+        return False
+
+    _, sign, user_id, start, end = change
+    if user_id not in engine.user_constraints:
+        return False
+    if sign > 0:
+        engine.add_leave(user_id, start, end)
+        return True
+    return engine.remove_leave(user_id, start, end)
+
+
+class EngineCache:
+    """LRU of engine snapshots bounded by estimated bytes"""
+
+    def __init__(self, max_bytes: int = ENGINE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.version = 0
+        self._snapshots: "OrderedDict[Hashable, Snapshot]" = OrderedDict()
+        self._bytes = 0
+        self._listeners: List[Callable[[Optional[List[Change]]], None]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get_or_load(self, key: Hashable, window: Tuple[Optional[datetime], Optional[datetime]],
+                    user_ids: Optional[List[int]], load: Callable[[], RosterEngine]) -> RosterEngine:
+        """The current snapshot for ``key``, loading it on a miss
+
+        The returned engine is shared: callers that mutate it must ``copy()`` it first.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+                if snapshot.pending:
+                    snapshot = self._catch_up(key, snapshot)
+                if snapshot is not None:
+                    return snapshot.engine
+            version = self.version
+
+        engine = load()
+        with self._lock:
+            # A write in flight or committed while loading may or may not be in this
+            # engine, and its changes would be queued on it again; keep it uncached
+            if version == self.version and not change_capture.in_flight and self.max_bytes > 0:
+                self._store(key, Snapshot(engine, window, None if user_ids is None else frozenset(user_ids),
+                                          _snapshot_bytes(engine)))
+        return engine
+
+    def _catch_up(self, key: Hashable, snapshot: Snapshot) -> Optional[Snapshot]:
+        engine = snapshot.engine.copy()
+        if not all(_apply(engine, change) for change in snapshot.pending):
+            self._drop(key)
+            return None
+        self._drop(key)
+        return self._store(key, Snapshot(engine, snapshot.window, snapshot.user_ids, _snapshot_bytes(engine)))
+
+    def _store(self, key: Hashable, snapshot: Snapshot) -> Snapshot:
+        self._drop(key)
+        self._snapshots[key] = snapshot
+        self._bytes += snapshot.nbytes
+        while self._bytes > self.max_bytes and self._snapshots:
+            self._drop(next(iter(self._snapshots)))
+        return snapshot
+
+    def _drop(self, key: Hashable):
+        snapshot = self._snapshots.pop(key, None)
+        if snapshot is not None:
+            self._bytes -= snapshot.nbytes
+
+    def subscribe(self, listener: Callable[[Optional[List[Change]]], None]):
+        """Call ``listener(changes)`` after every commit (None when the changes are unknown)"""
+        self._listeners.append(listener)
+
+    def commit(self, changes: Optional[List[Change]]):
+        """Bump the version and queue ``changes`` on every snapshot (None drops them all)"""
+        with self._lock:
+            self.version += 1
+            if changes is None:
+                self._snapshots.clear()
+                self._bytes = 0
+            else:
+                for snapshot in self._snapshots.values():
+                    snapshot.pending.extend(c for c in changes if snapshot.covers(*change_span(c)))
+        for listener in self._listeners:
+            listener(changes)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._bytes = 0
+
+
+engine_cache = EngineCache()
+
+
+# --- change capture ------------------------------------------------------------
+ENGINE_TABLES = frozenset(m.__tablename__ for m in (Shift, Leave, User, Post))
+_SHIFT_KEYS = ('user_id', 'post_id', 'start', 'end', 'shift_type')
+
+
+def _shift_change(row: Dict, sign: int) -> Change:
+    return ('shift', sign, row['user_id'], row['post_id'], row['start'], row['end'],
+            row['shift_type'], row.get('labels'))
+
+
+def _leave_change(row: Dict, sign: int) -> Optional[Change]:
+    # Snapshots only hold approved leave
+    if row.get('status') != LEAVE_APPROVED:
+        return None
+    return ('leave', sign, row['user_id'], row['start'], row['end'])
+
+
+def engine_changes(change_set: ChangeSet) -> Optional[List[Change]]:
+    """The shift and leave deltas of a commit, or None when they cannot be replayed"""
+    changes: List[Change] = []
+    for write in change_set.writes:
+        if write.table not in ENGINE_TABLES:
+            continue
+        if write.table in (User.__tablename__, Post.__tablename__):
+            return None
+        to_change = _shift_change if write.table == Shift.__tablename__ else _leave_change
+        if isinstance(write, StatementChange):
+            # Rows are dropped from bulk loads past MAX_CAPTURED_ROWS: invalidate everything
+            if not (write.op == 'insert' and write.table == Shift.__tablename__ and write.rows
+                    and all(all(k in row for k in _SHIFT_KEYS) for row in write.rows)):
+                return None
+            deltas = [to_change(row, +1) for row in write.rows]
+        elif write.op == 'created':
+            deltas = [to_change(write.values, +1)]
+        elif write.op == 'updated':
+            deltas = [to_change(write.previous, -1), to_change(write.values, +1)]
+        else:
+            deltas = [to_change(write.previous, -1)]
+        changes += [c for c in deltas if c is not None]
+        if len(changes) > MAX_PENDING_CHANGES:
+            return None
+    return changes
+
+
+def _committed(change_set: ChangeSet):
+    if change_set.tables & ENGINE_TABLES:
+        engine_cache.commit(engine_changes(change_set))
+
+
+change_capture.subscribe(_committed)
@@ -0,0 +1,114 @@
+"""Per-table version counters, strong ETags and an in-memory response cache.
+
+A read route's ETag comes from the versions of the tables it reads, which every
+committed write bumps, plus its path and query string.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from .change_capture import ChangeSet, change_capture
+
+HTTP_CACHE = os.getenv("HTTP_CACHE", "1") != "0"
+HTTP_CACHE_BYTES = int(float(os.getenv("HTTP_CACHE_MB", "16")) * 1024 * 1024)
+
+class TableVersions:
+    """Write counters per table name"""
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex[:12]
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, tables: Iterable[str]):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def etag(self, tables: Tuple[str, ...], key: str) -> str:
+        versions = "-".join(f"{t}{self.get(t)}" for t in tables)
+        digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        return f'"{self.token}-{versions}-{digest}"'
+
+
+class ResponseCache:
+    """LRU of rendered bodies keyed by ETag, bounded by bytes"""
+
+    def __init__(self, max_bytes: int = HTTP_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._bodies: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+    def get(self, etag: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._bodies.get(etag)
+            if entry is not None:
+                self._bodies.move_to_end(etag)
+            return entry
+
+    def put(self, etag: str, body: bytes, media_type: str):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._bodies.pop(etag, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._bodies[etag] = (body, media_type)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._bodies.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+            self._bytes = 0
+
+
+table_versions = TableVersions()
+response_cache = ResponseCache()
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def cached_response(request: Request, tables: Tuple[str, ...],
+                          render: Callable[[], Awaitable[Response]]) -> Response:
+    """Answer a GET from its ETag (304), the response cache, or ``render()`` on a miss"""
+    if not HTTP_CACHE:
+        return await render()
+    etag = table_versions.etag(tables, f"{request.url.path}?{sorted(request.query_params.multi_items())}")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    cached = response_cache.get(etag)
+    if cached is not None:
+        return Response(content=cached[0], media_type=cached[1], headers=headers)
+    response = await render()
+    if response.status_code == 200:
+        response_cache.put(etag, bytes(response.body), response.media_type)
+        response.headers.update(headers)
+    return response
+
+
+def _committed(change_set: ChangeSet):
+    table_versions.bump(change_set.tables)
+
+
+change_capture.subscribe(_committed)
@@ -0,0 +1,207 @@
+"""In-process background jobs for roster generation, with progress and cancellation.
+
+Runs whose scopes overlap (queued or running jobs, and synchronous runs holding a claim) are refused.
+"""
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "16"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "200"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's thread once its cancellation was requested"""
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobConflict(Exception):
+    def __init__(self, job: Optional["Job"]):
+        super().__init__(f"Job {job.id} is already {job.status} for an overlapping scope" if job is not None
+                         else "A generation request is already running for an overlapping scope")
+        self.job = job
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    scope: FrozenSet = frozenset()
+    status: str = QUEUED
+    phase: Optional[str] = None
+    progress: float = 0.0
+    iterations: int = 0
+    best_cost: Optional[float] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+
+    def report(self, phase: str, state: Dict[str, Any]):
+        """Progress callback for the generation paths; raises JobCancelled once cancelled"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        self.phase = phase
+        if state.get('fraction') is not None:
+            self.progress = min(max(state['fraction'], 0.0), 1.0)
+        if state.get('iterations') is not None:
+            self.iterations = state['iterations']
+        if state.get('best_cost') is not None:
+            self.best_cost = state['best_cost']
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'phase': self.phase,
+            'progress': self.progress,
+            'iterations': self.iterations,
+            'best_cost': self.best_cost,
+            'cancel_requested': self.cancel_event.is_set(),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobRunner:
+    """Bounded thread pool plus an in-memory job table"""
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_limit: int = JOB_QUEUE_LIMIT,
+                 history: int = JOB_HISTORY):
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self.history = history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._claims: List[FrozenSet] = []
+        self._lock = threading.Lock()
+
+    def _check_scope(self, scope: FrozenSet):
+        for job in self._jobs.values():
+            if job.status in ACTIVE and job.scope & scope:
+                raise JobConflict(job)
+        if any(claim & scope for claim in self._claims):
+            raise JobConflict(None)
+
+    def submit(self, kind: str, params: Dict[str, Any], run: Callable[[Job], Any],
+               scope: FrozenSet = frozenset()) -> Job:
+        """Queue ``run(job)``; its return value becomes ``job.result``"""
+        with self._lock:
+            if sum(1 for j in self._jobs.values() if j.status == QUEUED) >= self.queue_limit:
+                raise JobQueueFull()
+            self._check_scope(scope)
+            job = Job(id=uuid.uuid4().hex, kind=kind, params=params, scope=scope)
+            self._jobs[job.id] = job
+            self._trim()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="roster-job")
+            job.future = self._executor.submit(self._run, job, run)
+        return job
+
+    @contextmanager
+    def claim(self, scope: FrozenSet):
+        """Hold ``scope`` while a synchronous run works on it; overlapping jobs and claims are refused"""
+        with self._lock:
+            self._check_scope(scope)
+            self._claims.append(scope)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._claims.remove(scope)
+
+    def _run(self, job: Job, run: Callable[[Job], Any]):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_at = datetime.utcnow()
+        status, result, error = SUCCEEDED, None, None
+        try:
+            job.report('starting', {})
+            result = run(job)
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as exc:
+            logger.exception(f"Job {job.id} ({job.kind}) failed")
+            status, error = FAILED, str(exc) or exc.__class__.__name__
+        # Pollers and the scope check read these under the lock, so set them together
+        with self._lock:
+            if status == SUCCEEDED:
+                job.result = result
+                job.progress = 1.0
+                job.phase = 'done'
+            job.error = error
+            job.status = status
+            job.finished_at = datetime.utcnow()
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond ``history``"""
+        finished = [j.id for j in self._jobs.values() if j.status not in ACTIVE]
+        for job_id in finished[:max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, status: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j for j in reversed(jobs) if status is None or j.status == status]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Drop a queued job or ask a running one to stop; finished jobs are left as they are"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == QUEUED:
+                job.cancel_event.set()
+                job.status = CANCELLED
+                job.finished_at = datetime.utcnow()
+                job.future.cancel()
+            elif job.status == RUNNING:
+                job.cancel_event.set()
+        return job
+
+    def shutdown(self):
+        """Cancel every job and stop the pool without waiting for running solves"""
+        with self._lock:
+            job_ids = [j.id for j in self._jobs.values() if j.status in ACTIVE]
+        for job_id in job_ids:
+            self.cancel(job_id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+job_runner = JobRunner()
@@ -0,0 +1,193 @@
+"""Importer for the weekly call grid layout of ``roster_template.csv``.
+
+Each row is one week ("Week Commencing" dd/mm/yyyy) and each column header
+names a weekday, a call type and its times, e.g. "Friday Night Call 1300 to
+1200 next day". Cells hold post aliases ("DLHG 1", "Greystones 2") or NCHD
+names ("Khalid").
+
+Header slots are parsed once per distinct header, every distinct cell value
+is resolved once through a normalized alias index, and the shift times for
+all weeks x columns are computed with NumPy broadcasting.
+"""
+import csv
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+WEEKDAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+_HEADER = re.compile(
+    r"^(?P<day>monday|tuesday|wednesday|thursday|friday|saturday|sunday)\s+"
+    r"(?P<kind>day|night)\s+call\s+(?P<start>\d{4})\s+to\s+(?P<end>\d{4})(?P<next>\s+next\s+day)?",
+    re.IGNORECASE,
+)
+
+# Grid shorthand for sites whose post titles use a longer prefix
+SITE_ALIASES = {"dlhg": "ddlhg"}
+
+MINUTES_PER_DAY = 24 * 60
+
+
+@dataclass(frozen=True)
+class GridSlot:
+    column: int
+    header: str
+    shift_type: str
+    start_offset: int  # minutes from the week's Monday 00:00
+    end_offset: int
+
+
+@lru_cache(maxsize=16)
+def parse_grid_header(header: Tuple[str, ...]) -> Tuple[GridSlot, ...]:
+    """Call slots described by the column headers; other columns are ignored"""
+    slots = []
+    for column, text in enumerate(header):
+        match = _HEADER.match(text.strip())
+        if not match:
+            continue
+        day = WEEKDAY_NAMES.index(match["day"].lower()) * MINUTES_PER_DAY
+        start = int(match["start"][:2]) * 60 + int(match["start"][2:])
+        end = int(match["end"][:2]) * 60 + int(match["end"][2:])
+        if match["next"] or end <= start:
+            end += MINUTES_PER_DAY
+        slots.append(GridSlot(column, text.strip(), f"{match['kind'].lower()}_call", day + start, day + end))
+    return tuple(slots)
+
+
+def normalize_alias(value: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive key ('Edyta 1 ' -> 'edyta1')"""
+    return "".join(value.lower().split()).strip(".,;:-")
+
+
+@dataclass
+class AliasIndex:
+    """Normalized aliases of posts and users"""
+    posts: Dict[str, int] = field(default_factory=dict)
+    users: Dict[str, int] = field(default_factory=dict)
+
+    def resolve(self, value: str) -> Tuple[Optional[int], Optional[int]]:
+        """(post_id, user_id) for a cell; either may be None"""
+        key = normalize_alias(value)
+        return self.posts.get(key), self.users.get(key)
+
+
+def create_alias_index(users, posts) -> AliasIndex:
+    """Index posts by title, title without grade, site shorthand and eligibility["aliases"];
+    users by full name, email and any name word that identifies a single user"""
+    index = AliasIndex()
+    for post in posts:
+        keys = {normalize_alias(post.title)}
+        if post.grade and post.title.lower().endswith(post.grade.lower()):
+            keys.add(normalize_alias(post.title[:-len(post.grade)]))
+        keys.update(normalize_alias(a) for a in (post.eligibility or {}).get("aliases", []))
+        for key in list(keys):
+            for short, full in SITE_ALIASES.items():
+                if key.startswith(full):
+                    keys.add(short + key[len(full):])
+        for key in keys:
+            index.posts.setdefault(key, post.id)
+
+    words: Dict[str, set] = {}
+    for user in users:
+        index.users[normalize_alias(user.name)] = user.id
+        if user.email:
+            index.users[normalize_alias(user.email)] = user.id
+        for word in user.name.split():
+            words.setdefault(normalize_alias(word), set()).add(user.id)
+    for word, ids in words.items():
+        if len(ids) == 1 and word not in index.users and len(word) > 2:
+            index.users[word] = next(iter(ids))
+    return index
+
+
+class GridImporter:
+    """Expand call grid rows into shift records
+
+    A post cell is covered by the post's current holder (``post_holders``); a name
+    cell is booked against that NCHD's current post (``user_posts``).
+    """
+
+    def __init__(self, aliases: AliasIndex, post_holders: Dict[int, int], user_posts: Dict[int, int]):
+        self.aliases = aliases
+        self.post_holders = post_holders
+        self.user_posts = user_posts
+        self.errors: List[str] = []
+
+    def _resolve(self, value: str) -> Tuple[int, int, Optional[str]]:
+        post_id, user_id = self.aliases.resolve(value)
+        if post_id is not None:
+            user_id = self.post_holders.get(post_id)
+            if user_id is None:
+                return -1, -1, f"Post '{value.strip()}' has no current NCHD"
+            return user_id, post_id, None
+        if user_id is not None:
+            post_id = self.user_posts.get(user_id)
+            if post_id is None:
+                return -1, -1, f"User '{value.strip()}' has no current post"
+            return user_id, post_id, None
+        return -1, -1, f"'{value.strip()}' is not a known post or user"
+
+    def parse_grid(self, lines: Iterable[str]) -> List[Dict]:
+        """Parse the grid into records shaped like RosterImporter.iter_records output"""
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if not header:
+            self.errors.append("Grid file is empty")
+            return []
+        slots = parse_grid_header(tuple(header))
+        if not slots:
+            self.errors.append("No call columns found in header")
+            return []
+        columns = [slot.column for slot in slots]
+
+        weeks, cells, line_numbers = [], [], []
+        for values in reader:
+            if not values or not values[0].strip():
+                continue
+            try:
+                week = datetime.strptime(values[0].strip(), "%d/%m/%Y")
+            except ValueError:
+                self.errors.append(f"Line {reader.line_num}: Bad week date '{values[0].strip()}'")
+                continue
+            if week.weekday() != 0:
+                self.errors.append(f"Line {reader.line_num}: {values[0].strip()} is not a Monday")
+                continue
+            weeks.append(week)
+            cells.append([values[c] if c < len(values) else "" for c in columns])
+            line_numbers.append(reader.line_num)
+        if not weeks:
+            return []
+
+        # Resolve each distinct cell value once
+        grid = np.array(cells, dtype=object)
+        values, inverse = np.unique(grid, return_inverse=True)
+        resolved = [self._resolve(v) if v.strip() else (-1, -1, None) for v in values]
+        user_ids = np.array([r[0] for r in resolved], dtype=np.int64)[inverse].reshape(grid.shape)
+        post_ids = np.array([r[1] for r in resolved], dtype=np.int64)[inverse].reshape(grid.shape)
+
+        for w, s in np.argwhere(user_ids < 0):
+            error = resolved[inverse.reshape(grid.shape)[w, s]][2]
+            if error:
+                self.errors.append(f"Line {line_numbers[w]}: {error} ({slots[s].header})")
+
+        # Every week x slot start/end in one broadcast
+        week_minutes = np.array(weeks, dtype="datetime64[m]").astype(np.int64)
+        starts = week_minutes[:, None] + np.array([s.start_offset for s in slots], dtype=np.int64)
+        ends = week_minutes[:, None] + np.array([s.end_offset for s in slots], dtype=np.int64)
+        types = np.array([s.shift_type for s in slots], dtype=object)[None, :].repeat(len(weeks), axis=0)
+
+        keep = user_ids >= 0
+        return [
+            {'user_id': u, 'post_id': p, 'start': s, 'end': e, 'type': t, 'labels': {'source': 'grid'}}
+            for u, p, s, e, t in zip(
+                user_ids[keep].tolist(),
+                post_ids[keep].tolist(),
+                starts[keep].astype("datetime64[m]").tolist(),
+                ends[keep].astype("datetime64[m]").tolist(),
+                types[keep].tolist(),
+            )
+        ]
@@ -1,5 +1,9 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+import codecs
+import csv
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,77 +26,130 @@ def create_post_map(posts) -> Dict[str, int]:
         post_map[post.title.lower()] = post.id
     return post_map
 
+REQUIRED_COLUMNS = ['name', 'post', 'date', 'type']
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of up to ``size`` items"""
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_lines(chunks: Iterable[bytes], encoding: str = 'utf-8-sig') -> Iterator[str]:
+    """Decode a stream of byte chunks into lines (line endings kept for the csv module)"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        # Split on '\n' only ('\r\n' stays whole): str.splitlines would also break on
+        # form feeds, '\x1c'-'\x1e', '\x85' and '\u2028' inside quoted fields
+        *lines, pending = (pending + decoder.decode(chunk)).split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+@lru_cache(maxsize=4096)
+def _parse_datetime(date_str: str, time_str: str) -> datetime:
+    # Historical rosters repeat the same few dates and times, so parse each pair once
+    return datetime.fromisoformat(f"{date_str} {time_str}")
+
 class RosterImporter:
     """Handles importing roster data from CSV"""
     
-    def __init__(self, user_map: Dict[str, int], post_map: Dict[str, int]):
+    def __init__(self, user_map: Dict[str, int], post_map: Dict[str, int],
+                 max_errors: Optional[int] = None):
         self.user_map = user_map
         self.post_map = post_map
         self.errors = []
+        # Errors seen, including any beyond ``max_errors`` that were counted but not kept
+        self.error_count = 0
+        self.max_errors = max_errors
+    
+    def _error(self, message: str):
+        self.error_count += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append(message)
     
     def parse_csv(self, csv_content: str) -> List[Dict]:
         """Parse CSV content into roster data"""
-        lines = csv_content.strip().split('\n')
-        if not lines:
-            self.errors.append("CSV file is empty")
-            return []
+        return [
+            dict(record, start=record['start'].isoformat(), end=record['end'].isoformat())
+            for record in self.iter_records(csv_content.strip().split('\n'))
+        ]
+    
+    def iter_records(self, lines: Iterable[str]) -> Iterator[Dict]:
+        """Parse CSV lines one at a time, yielding records with datetime start/end
+        
+        Rows that cannot be resolved are skipped and reported in ``self.errors``.
+        """
+        reader = csv.reader(lines, skipinitialspace=True)
+        header_row = next(reader, None)
+        if not header_row:
+            self._error("CSV file is empty")
+            return
         
         # Parse header
-        header = [h.strip().lower() for h in lines[0].split(',')]
+        header = [h.strip().lower() for h in header_row]
         
         # Validate required columns
-        required = ['name', 'post', 'date', 'type']
-        missing = [r for r in required if r not in header]
+        missing = [r for r in REQUIRED_COLUMNS if r not in header]
         if missing:
-            self.errors.append(f"Missing required columns: {', '.join(missing)}")
-            return []
+            self._error(f"Missing required columns: {', '.join(missing)}")
+            return
         
-        roster_data = []
-        for i, line in enumerate(lines[1:], start=2):
-            if not line.strip():
+        for values in reader:
+            i = reader.line_num
+            if not any(v.strip() for v in values):
                 continue
             
-            values = [v.strip() for v in line.split(',')]
+            values = [v.strip() for v in values]
             if len(values) != len(header):
-                self.errors.append(f"Line {i}: Column count mismatch")
+                self._error(f"Line {i}: Column count mismatch")
                 continue
             
             row = dict(zip(header, values))
             
             # Map user
-            user_key = row['name'].lower()
-            if user_key not in self.user_map:
-                self.errors.append(f"Line {i}: User '{row['name']}' not found")
+            user_id = self.user_map.get(row['name'].lower())
+            if user_id is None:
+                self._error(f"Line {i}: User '{row['name']}' not found")
                 continue
             
             # Map post
-            post_key = row['post'].lower()
-            if post_key not in self.post_map:
-                self.errors.append(f"Line {i}: Post '{row['post']}' not found")
+            post_id = self.post_map.get(row['post'].lower())
+            if post_id is None:
+                self._error(f"Line {i}: Post '{row['post']}' not found")
                 continue
             
             # Parse date and times
             try:
-                date_str = row['date']
-                start_time = row.get('start_time', '09:00')
-                end_time = row.get('end_time', '17:00')
-                
-                start = datetime.fromisoformat(f"{date_str} {start_time}")
-                end = datetime.fromisoformat(f"{date_str} {end_time}")
-                
-                roster_data.append({
-                    'user_id': self.user_map[user_key],
-                    'post_id': self.post_map[post_key],
-                    'start': start.isoformat(),
-                    'end': end.isoformat(),
-                    'type': row['type'].lower().replace(' ', '_'),
-                    'labels': {}
-                })
+                start = _parse_datetime(row['date'], row.get('start_time') or '09:00')
+                end = _parse_datetime(row['date'], row.get('end_time') or '17:00')
             except Exception as e:
-                self.errors.append(f"Line {i}: Date/time parse error: {str(e)}")
+                self._error(f"Line {i}: Date/time parse error: {str(e)}")
                 continue
-        
-        return roster_data
+            
+            yield {
+                'user_id': user_id,
+                'post_id': post_id,
+                'start': start,
+                'end': end,
+                'type': row['type'].lower().replace(' ', '_'),
+                'labels': {}
+            }
+    
+    @staticmethod
+    def record_error(item: Dict) -> Optional[str]:
+        """EWTD problem that rules out one record, or None when it can be imported"""
+        duration = (item['end'] - item['start']).total_seconds() / 3600
+        if duration > 24:
+            return f"User {item['user_id']}: Shift exceeds 24 hours ({duration:.1f}h)"
+        if duration < 0:
+            return f"User {item['user_id']}: End time before start time"
+        return None
     
     def validate_roster_data(self, roster_data: List[Dict]) -> Tuple[List[Dict], List[str]]:
         """Validate roster data for EWTD compliance"""
@@ -101,21 +158,13 @@ class RosterImporter:
         
         for item in roster_data:
             try:
-                start = datetime.fromisoformat(item['start'])
-                end = datetime.fromisoformat(item['end'])
-                
-                duration = (end - start).total_seconds() / 3600
-                
-                if duration > 24:
-                    errors.append(
-                        f"User {item['user_id']}: Shift exceeds 24 hours ({duration:.1f}h)"
-                    )
-                    continue
-                
-                if duration < 0:
-                    errors.append(
-                        f"User {item['user_id']}: End time before start time"
-                    )
+                error = self.record_error(dict(
+                    item,
+                    start=datetime.fromisoformat(item['start']),
+                    end=datetime.fromisoformat(item['end'])
+                ))
+                if error:
+                    errors.append(error)
                     continue
                 
                 valid_data.append(item)
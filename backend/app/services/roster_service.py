@@ -1,14 +1,84 @@
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
-from datetime import datetime, date
+from typing import List, Dict, Optional, Set, Tuple, Callable, Any, Iterable, Iterator
+from datetime import datetime, date, timedelta
+from collections import Counter
+import csv
+import io
+import json
 import logging
 
-from ..models import Shift, User, Post, Leave
+from ..models import LEAVE_APPROVED, MAX_SHIFT_SPAN, Shift, User, Post, Leave, Group
 from ..engine.roster_engine import RosterEngine, UserConstraints, Shift as EngineShift
-from ..services.roster_import import RosterImporter, create_user_map, create_post_map
+from ..engine.batch import PoolSpec, generate_pools
+from ..engine.ewtd_vector import ShiftColumns, validate_columns, WEEKLY_REST, AVG_WEEKLY_HOURS
+from ..engine.shift_store import to_minutes
+from ..engine.violations import Violation, VIOLATION
+from ..services.roster_import import RosterImporter, chunked, iter_lines, create_user_map, create_post_map
+from ..services.roster_grid import GridImporter, create_alias_index
+from ..services.engine_cache import engine_cache
+from ..services.violation_reports import report_cache, report_margin
 
 logger = logging.getLogger(__name__)
 
+# Rest, rolling-week and consecutive-night rules never reach further than this from a changed shift
+INCREMENTAL_MARGIN = timedelta(days=7)
+
+# Rows per IN (...) list when reading bulk-inserted shifts back
+PERSIST_CHUNK = 500
+
+# Shift columns returned by exports and the fast response paths, and rows per server-side cursor batch
+EXPORT_COLUMNS = ('id', 'user_id', 'post_id', 'start', 'end', 'shift_type', 'labels',
+                  'created_at', 'updated_at')
+EXPORT_BATCH_SIZE = 1000
+
+# CSV import: rows per bulk INSERT, commit modes, and errors reported before truncating
+IMPORT_BATCH_SIZE = 5000
+IMPORT_COMMIT_MODES = ('atomic', 'chunk')
+MAX_IMPORT_ERRORS = 1000
+
+def filter_shifts(query, user_id: Optional[int] = None, post_id: Optional[int] = None,
+                  start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """Apply the shift list filters to an ORM query or Core select
+    
+    The date range keeps shifts overlapping [start_date, end_date], including ones
+    that straddle either edge.
+    """
+    if user_id:
+        query = query.filter(Shift.user_id == user_id)
+    if post_id:
+        query = query.filter(Shift.post_id == post_id)
+    if start_date or end_date:
+        query = query.filter(Shift.overlapping(
+            datetime.combine(start_date, datetime.min.time()) if start_date else None,
+            datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None
+        ))
+    return query
+
+def _capped(errors: List[str], total: int) -> List[str]:
+    """At most MAX_IMPORT_ERRORS messages, plus a count of the ones left out"""
+    kept = errors[:MAX_IMPORT_ERRORS]
+    if total > len(kept):
+        kept.append(f"... {total - len(kept)} more errors")
+    return kept
+
+# progress(phase, state) callbacks of the generation paths
+PhaseCallback = Callable[[str, Dict], None]
+
+def _no_progress(phase: str, state: Dict):
+    pass
+
+def _month_floor(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+def _next_month(dt: datetime) -> datetime:
+    return datetime(dt.year + 1, 1, 1) if dt.month == 12 else datetime(dt.year, dt.month + 1, 1)
+
+def _check_span(start: datetime, end: datetime):
+    """Shifts longer than MAX_SHIFT_SPAN would fall outside Shift.overlapping's index range"""
+    if end - start > MAX_SHIFT_SPAN:
+        raise ValueError(f"Shift cannot span more than {MAX_SHIFT_SPAN.days} days")
+
 class RosterService:
     """Service layer bridging database and roster engine"""
     
@@ -19,62 +89,208 @@ class RosterService:
     def load_shifts_from_db(self, start_date: Optional[date] = None, 
                            end_date: Optional[date] = None) -> List[Shift]:
         """Load shifts from database with optional date filtering"""
-        query = self.db.query(Shift)
+        return filter_shifts(self.db.query(Shift), start_date=start_date, end_date=end_date).all()
+    
+    def export_shifts(self, fmt: str = 'ndjson', user_id: Optional[int] = None,
+                      post_id: Optional[int] = None, start_date: Optional[date] = None,
+                      end_date: Optional[date] = None) -> Iterator[str]:
+        """Yield shifts as NDJSON lines or CSV text, EXPORT_BATCH_SIZE rows at a time
         
-        if start_date:
-            query = query.filter(Shift.start >= datetime.combine(start_date, datetime.min.time()))
-        if end_date:
-            query = query.filter(Shift.end <= datetime.combine(end_date, datetime.max.time()))
+        Rows come from a server-side cursor as plain column tuples, so memory stays flat.
+        """
+        table = Shift.__table__
+        stmt = filter_shifts(select(*(table.c[name] for name in EXPORT_COLUMNS)),
+                             user_id, post_id, start_date, end_date)
+        stmt = stmt.order_by(table.c.start, table.c.id).execution_options(
+            stream_results=True, yield_per=EXPORT_BATCH_SIZE
+        )
+        result = self.db.execute(stmt)
         
-        return query.all()
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            for rows in result.partitions():
+                for row in rows:
+                    writer.writerow([
+                        json.dumps(v) if isinstance(v, dict) else v.isoformat() if isinstance(v, datetime) else v
+                        for v in row
+                    ])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for rows in result.partitions():
+                yield ''.join(
+                    json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=datetime.isoformat) + '\n'
+                    for row in rows
+                )
+    
+    def overlapping_shifts(self, user_id: int, start: datetime, end: datetime,
+                           exclude_id: Optional[int] = None) -> List[Shift]:
+        """A user's shifts intersecting [start, end), answered from the (user_id, start) index"""
+        query = self.db.query(Shift).filter(
+            Shift.user_id == user_id,
+            Shift.overlapping(start, end)
+        )
+        if exclude_id is not None:
+            query = query.filter(Shift.id != exclude_id)
+        return query.order_by(Shift.start).all()
     
     def sync_engine_from_db(self, start_date: Optional[date] = None, 
                            end_date: Optional[date] = None):
-        """Load existing shifts into engine"""
-        shifts = self.load_shifts_from_db(start_date, end_date)
+        """Load existing shifts (optionally those overlapping [start_date, end_date]) into engine"""
+        self.sync_engine_window(
+            datetime.combine(start_date, datetime.min.time()) if start_date else None,
+            datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None,
+            margin=timedelta(0)
+        )
+    
+    def sync_engine_window(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           user_ids: Optional[List[int]] = None,
+                           margin: timedelta = INCREMENTAL_MARGIN, shared: bool = False):
+        """Load shifts overlapping [start - margin, end + margin) into the engine
         
-        roster_data = [{
-            'user_id': s.user_id,
-            'post_id': s.post_id,
-            'start': s.start,
-            'end': s.end,
-            'type': s.shift_type,
-            'labels': s.labels or {}
-        } for s in shifts]
+        The engine comes from the process-level snapshot cache, loaded on a miss by
+        selecting column tuples straight into the engine's store with leave from one
+        query. Open bounds load everything on that side. With ``shared`` the cached
+        snapshot itself is used, so the caller must only read it.
+        """
+        window_start = start - margin if start else None
+        window_end = end + margin if end else None
         
-        # Load user constraints
-        user_constraints = self._load_user_constraints()
+        def load() -> RosterEngine:
+            query = self.db.query(Shift.user_id, Shift.post_id, Shift.start, Shift.end,
+                                  Shift.shift_type, Shift.labels)
+            if user_ids is not None:
+                query = query.filter(Shift.user_id.in_(user_ids))
+            if window_start or window_end:
+                query = query.filter(Shift.overlapping(window_start, window_end))
+            
+            engine = RosterEngine()
+            engine.load_rows(
+                query.yield_per(EXPORT_BATCH_SIZE),
+                self._load_user_constraints(user_ids, window_start, window_end)
+            )
+            logger.info(f"Loaded {len(engine.store)} shifts into engine")
+            return engine
         
-        self.engine.import_existing_roster(roster_data, user_constraints)
-        logger.info(f"Loaded {len(shifts)} shifts into engine")
+        key = (window_start, window_end, None if user_ids is None else tuple(sorted(user_ids)))
+        snapshot = engine_cache.get_or_load(key, (window_start, window_end), user_ids, load)
+        self.engine = snapshot if shared else snapshot.copy()
     
-    def _load_user_constraints(self) -> Dict[int, UserConstraints]:
-        """Build user constraints from database"""
-        users = self.db.query(User).all()
-        constraints = {}
+    def sync_engine_for_user(self, user_id: int, start: datetime, end: datetime):
+        """Use the shared snapshot of one user's shifts over [start, end), widened to whole months
         
-        for user in users:
-            # Get leave periods
-            leave_periods = [(lv.start, lv.end) for lv in user.leave_periods]
-            
-            # Get OPD days from user's posts (if applicable)
-            opd_days = set()
-            # TODO: Extract from post eligibility/rules
+        The snapshot is shared with other requests, so callers must only read it.
+        """
+        self.sync_engine_window(_month_floor(start), _next_month(end), [user_id],
+                                margin=timedelta(0), shared=True)
+    
+    def _load_user_constraints(self, user_ids: Optional[List[int]] = None,
+                               start: Optional[datetime] = None,
+                               end: Optional[datetime] = None) -> Dict[int, UserConstraints]:
+        """Build user constraints from database, with approved leave overlapping [start, end) from one query"""
+        query = self.db.query(User.id)
+        if user_ids is not None:
+            query = query.filter(User.id.in_(user_ids))
+        ids = [uid for (uid,) in query]
+        clinics = self._clinic_constraints(ids)
+        
+        leave_query = self.db.query(Leave.user_id, Leave.start, Leave.end).filter(Leave.status == LEAVE_APPROVED)
+        if user_ids is not None:
+            leave_query = leave_query.filter(Leave.user_id.in_(user_ids))
+        if start:
+            leave_query = leave_query.filter(Leave.end > start)
+        if end:
+            leave_query = leave_query.filter(Leave.start < end)
+        leave_periods: Dict[int, List[Tuple[datetime, datetime]]] = {}
+        for uid, leave_start, leave_end in leave_query.order_by(Leave.user_id, Leave.start):
+            leave_periods.setdefault(uid, []).append((leave_start, leave_end))
+        
+        constraints = {}
+        for uid in ids:
+            # Get OPD days from the clinic_constraints of the user's current post
+            clinic = clinics.get(uid, {})
             
-            constraints[user.id] = UserConstraints(
-                user_id=user.id,
+            constraints[uid] = UserConstraints(
+                user_id=uid,
                 max_nights_per_month=7,  # Default, could come from post
                 min_rest_hours=11,
                 max_consecutive_nights=3,
-                opd_days=opd_days,
-                leave_periods=leave_periods
+                opd_days={d.upper() for d in clinic.get('opd_days', [])},
+                leave_periods=leave_periods.get(uid, []),
+                opd_blocks_day_call=clinic.get('blocks_day_call', True),
+                opd_blocks_night_call_before=clinic.get('blocks_night_call_before', True)
             )
         
         return constraints
     
+    def _clinic_constraints(self, user_ids: List[int]) -> Dict[int, Dict]:
+        """Post clinic_constraints per user, taking the post of each user's latest non-call shift"""
+        if not user_ids:
+            return {}
+        current_post = self._current_posts(user_ids)
+        
+        post_ids = set(current_post.values())
+        posts = {p.id: p for p in self.db.query(Post).filter(Post.id.in_(post_ids))} if post_ids else {}
+        clinics = {}
+        for user_id, post_id in current_post.items():
+            post = posts.get(post_id)
+            clinic = ((post.eligibility or {}).get('clinic_constraints') if post else None) or {}
+            if clinic.get('opd_days'):
+                clinics[user_id] = clinic
+        return clinics
+    
+    @staticmethod
+    def _latest(column, key, value):
+        """Correlated LIMIT 1 for ``column`` of the latest shift where ``key == value``
+        
+        Night calls are left out: they cover a pool rota rather than the post a user
+        holds. Each lookup seeks the (user_id, start) or (post_id, start) index instead
+        of aggregating every shift.
+        """
+        return (select(column).where(key == value, Shift.shift_type != 'night_call')
+                .order_by(Shift.start.desc(), Shift.id.desc()).limit(1).scalar_subquery())
+    
+    def _current_posts(self, user_ids: Optional[List[int]] = None) -> Dict[int, int]:
+        """user -> current post (of their latest shift), for ``user_ids`` or every user"""
+        users = self.db.query(User.id, self._latest(Shift.post_id, Shift.user_id, User.id))
+        if user_ids is not None:
+            users = users.filter(User.id.in_(user_ids))
+        return {u: p for u, p in users if p is not None}
+    
+    def _post_holders(self) -> Dict[int, int]:
+        """post -> current holder (the user of its latest shift)"""
+        posts = self.db.query(Post.id, self._latest(Shift.user_id, Shift.post_id, Post.id))
+        return {p: u for p, u in posts if u is not None}
+    
+    def subscription_scope(self, site: Optional[str] = None,
+                           group_id: Optional[int] = None) -> Tuple[Set[int], Set[int]]:
+        """(post ids, user ids) a change stream subscription covers
+        
+        Posts are those of the site and/or group; users are the ones whose current
+        post is among them, plus a pool group's ``rules["user_ids"]`` members.
+        """
+        query = self.db.query(Post.id)
+        if site is not None:
+            query = query.filter(Post.site == site)
+        if group_id is not None:
+            query = query.filter(Post.groups.any(Group.id == group_id))
+        post_ids = {post_id for (post_id,) in query}
+        
+        user_posts = self._current_posts()
+        user_ids = {uid for uid, post_id in user_posts.items() if post_id in post_ids}
+        group = self.db.get(Group, group_id) if group_id is not None else None
+        if group is not None:
+            user_ids.update((group.rules or {}).get('user_ids') or [])
+        return post_ids, user_ids
+    
     def create_shift(self, user_id: int, post_id: int, start: datetime, 
                     end: datetime, shift_type: str, labels: Optional[Dict] = None) -> Shift:
         """Create a shift in database"""
+        _check_span(start, end)
         shift = Shift(
             user_id=user_id,
             post_id=post_id,
@@ -96,6 +312,7 @@ class RosterService:
         if not shift:
             return None
         
+        _check_span(kwargs.get('start') or shift.start, kwargs.get('end') or shift.end)
         for key, value in kwargs.items():
             if value is not None and hasattr(shift, key):
                 setattr(shift, key, value)
@@ -114,87 +331,538 @@ class RosterService:
         self.db.commit()
         return True
     
+    def create_shift_checked(self, user_id: int, post_id: int, start: datetime,
+                             end: datetime, shift_type: str,
+                             labels: Optional[Dict] = None) -> Tuple[Shift, Dict]:
+        """Create a shift and return the EWTD violation delta around it"""
+        windows = self._affected_windows([(user_id, start, end)])
+        return self._with_ewtd_delta(windows, lambda: self.create_shift(
+            user_id, post_id, start, end, shift_type, labels
+        ))
+    
+    def update_shift_checked(self, shift_id: int, **kwargs) -> Tuple[Optional[Shift], Dict]:
+        """Update a shift and return the EWTD violation delta around its old and new times"""
+        shift = self.db.query(Shift).filter(Shift.id == shift_id).first()
+        if not shift:
+            return None, self._empty_delta()
+        
+        new_user_id = kwargs.get('user_id') or shift.user_id
+        windows = self._affected_windows([
+            (shift.user_id, shift.start, shift.end),
+            (new_user_id, kwargs.get('start') or shift.start, kwargs.get('end') or shift.end),
+        ])
+        return self._with_ewtd_delta(windows, lambda: self.update_shift(shift_id, **kwargs))
+    
+    def delete_shift_checked(self, shift_id: int) -> Tuple[bool, Dict]:
+        """Delete a shift and return the EWTD violation delta around it"""
+        shift = self.db.query(Shift).filter(Shift.id == shift_id).first()
+        if not shift:
+            return False, self._empty_delta()
+        
+        windows = self._affected_windows([(shift.user_id, shift.start, shift.end)])
+        return self._with_ewtd_delta(windows, lambda: self.delete_shift(shift_id))
+    
+    @staticmethod
+    def _affected_windows(changes: List[Tuple[int, datetime, datetime]]) -> Dict[int, Tuple[datetime, datetime]]:
+        """Union the changed periods per user and pad them by the rule margin"""
+        windows = {}
+        for user_id, start, end in changes:
+            start, end = start - INCREMENTAL_MARGIN, end + INCREMENTAL_MARGIN
+            if user_id in windows:
+                start = min(start, windows[user_id][0])
+                end = max(end, windows[user_id][1])
+            windows[user_id] = (start, end)
+        return windows
+    
+    def _validate_windows(self, windows: Dict[int, Tuple[datetime, datetime]]) -> Dict:
+        violations, warnings = [], []
+        for user_id, (start, end) in windows.items():
+            self.sync_engine_for_user(user_id, start, end)
+            result = self.engine.validate_window(user_id, start, end)
+            violations.extend(result['violations'])
+            warnings.extend(result['warnings'])
+        return {'violations': violations, 'warnings': warnings}
+    
+    def _with_ewtd_delta(self, windows: Dict[int, Tuple[datetime, datetime]],
+                         write: Callable[[], Any]) -> Tuple[Any, Dict]:
+        """Run a write and diff the EWTD results of the affected windows before and after"""
+        before = self._validate_windows(windows)
+        result = write()
+        after = self._validate_windows(windows)
+        
+        def diff(a: List[str], b: List[str]) -> List[str]:
+            return list((Counter(a) - Counter(b)).elements())
+        
+        return result, {
+            'compliant': not after['violations'],
+            'new_violations': diff(after['violations'], before['violations']),
+            'resolved_violations': diff(before['violations'], after['violations']),
+            'new_warnings': diff(after['warnings'], before['warnings']),
+            'resolved_warnings': diff(before['warnings'], after['warnings']),
+        }
+    
+    @staticmethod
+    def _empty_delta() -> Dict:
+        return {
+            'compliant': True,
+            'new_violations': [],
+            'resolved_violations': [],
+            'new_warnings': [],
+            'resolved_warnings': [],
+        }
+    
     def generate_roster(self, month: int, year: int, post_ids: List[int], 
-                       calls_per_night: int = 1) -> Dict:
-        """Generate roster for a month using the engine"""
-        # Sync engine with current DB state
-        self.sync_engine_from_db()
+                       calls_per_night: int = 1, solver: str = 'round_robin',
+                       time_budget: float = 1.0, seed: Optional[int] = None,
+                       restarts: int = 1, workers: Optional[int] = None,
+                       progress: Optional[PhaseCallback] = None) -> Dict:
+        """Generate roster for a month using the engine
+        
+        ``progress(phase, state)`` is called as the run moves through loading, solving
+        (with the solver's progress state) and persisting; raising from it before the
+        persisting phase returns abandons the run without writing anything.
+        """
+        progress = progress or _no_progress
+        # Sync engine with the month being generated (plus the rule margin either side)
+        progress('loading', {})
+        month_start = datetime(year, month, 1)
+        self.sync_engine_window(month_start, _next_month(month_start))
+        first_new_row = self.engine.store.row_count
         
         # Generate night calls
         result = self.engine.generate_night_calls(
             month=month,
             year=year,
             post_ids=post_ids,
-            calls_per_night=calls_per_night
+            calls_per_night=calls_per_night,
+            solver=solver,
+            time_budget=time_budget,
+            seed=seed,
+            restarts=restarts,
+            workers=workers,
+            shift_rules=self._shift_rules_for_posts(post_ids),
+            user_posts=self._current_posts(list(self.engine.user_constraints)),
+            progress=lambda state: progress('solving', state)
         )
         
         # Persist generated shifts to database
-        created_shifts = []
-        for engine_shift in self.engine.shifts:
-            # Check if shift already exists
-            existing = self.db.query(Shift).filter(
-                Shift.user_id == engine_shift.user_id,
-                Shift.start == engine_shift.start,
-                Shift.end == engine_shift.end
-            ).first()
-            
-            if not existing:
-                shift = self.create_shift(
-                    user_id=engine_shift.user_id,
-                    post_id=engine_shift.post_id,
-                    start=engine_shift.start,
-                    end=engine_shift.end,
-                    shift_type=engine_shift.shift_type,
-                    labels=engine_shift.labels
-                )
-                created_shifts.append(shift)
+        progress('persisting', {})
+        result['shifts_created'] = self._persist_engine_shifts(self.engine.shifts_since(first_new_row))
+        return result
+    
+    def _shift_rules_for_posts(self, post_ids: List[int]) -> List[Dict]:
+        """``rules["shifts"]`` of the first on-call pool containing any of the posts"""
+        if not post_ids:
+            return []
+        group = self.db.query(Group).filter(
+            Group.kind == 'on_call_pool',
+            Group.posts.any(Post.id.in_(post_ids))
+        ).order_by(Group.id).first()
+        return ((group.rules or {}).get('shifts') or []) if group else []
+    
+    def _persist_engine_shifts(self, engine_shifts: Iterable[EngineShift]) -> List[Dict]:
+        """Write engine shifts that are not already in the database
+        
+        Existing (user_id, start, end) keys come from one range query; the new rows are
+        written with a single executemany INSERT ... RETURNING and one commit.
+        """
+        candidates: Dict[Tuple[int, datetime, datetime], EngineShift] = {}
+        for engine_shift in engine_shifts:
+            candidates.setdefault((engine_shift.user_id, engine_shift.start, engine_shift.end), engine_shift)
+        if not candidates:
+            return []
+        
+        starts = [start for _, start, _ in candidates]
+        existing = set(self.db.query(Shift.user_id, Shift.start, Shift.end).filter(
+            Shift.start >= min(starts),
+            Shift.start <= max(starts)
+        ).all())
+        
+        rows = [{
+            'user_id': s.user_id,
+            'post_id': s.post_id,
+            'start': s.start,
+            'end': s.end,
+            'shift_type': s.shift_type,
+            'labels': dict(s.labels or {})
+        } for key, s in candidates.items() if key not in existing]
+        if len(rows) < len(candidates):
+            logger.warning(f"Skipped {len(candidates) - len(rows)} generated shifts already in the database")
+        if not rows:
+            return []
+        
+        try:
+            ids = self._bulk_insert_shifts(rows, returning=True)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return self._load_shifts_by_id(ids)
+    
+    def _bulk_insert_shifts(self, rows: List[Dict], returning: bool = False) -> List[int]:
+        """executemany INSERT of shift rows in the current transaction (no commit)"""
+        if not rows:
+            return []
+        if returning:
+            return list(self.db.scalars(insert(Shift).returning(Shift.id), rows))
+        self.db.execute(insert(Shift), rows)
+        return []
+    
+    def _load_shifts_by_id(self, ids: List[int]) -> List[Dict]:
+        """Load rows back as plain dicts in a few IN (...) queries rather than one refresh each"""
+        table = Shift.__table__
+        columns = [table.c[name] for name in EXPORT_COLUMNS]
+        loaded = []
+        for i in range(0, len(ids), PERSIST_CHUNK):
+            loaded.extend(self.db.execute(select(*columns).where(table.c.id.in_(ids[i:i + PERSIST_CHUNK]))))
+        loaded.sort(key=lambda row: row[0])
+        return [dict(zip(EXPORT_COLUMNS, row)) for row in loaded]
+    
+    def pool_specs(self, group_ids: List[int]) -> List[PoolSpec]:
+        """Resolve on-call pool groups into posts, member users and rule caps
+        
+        Members come from ``rules["user_ids"]`` when set, otherwise from the users who
+        have held shifts on the pool's posts.
+        """
+        groups = self.db.query(Group).filter(Group.id.in_(group_ids)).all()
+        cap_fields = ('max_nights_per_month', 'min_rest_hours', 'max_consecutive_nights')
+        specs = []
+        for group in sorted(groups, key=lambda g: group_ids.index(g.id)):
+            rules = group.rules or {}
+            post_ids = [p.id for p in group.posts]
+            user_ids = rules.get('user_ids')
+            if user_ids is None and post_ids:
+                rows = self.db.query(Shift.user_id).filter(Shift.post_id.in_(post_ids)).distinct().all()
+                user_ids = sorted(uid for (uid,) in rows)
+            caps = {k: v for k, v in (rules.get('caps') or {}).items() if k in cap_fields}
+            specs.append(PoolSpec(
+                group_id=group.id,
+                name=group.name,
+                post_ids=post_ids,
+                user_ids=list(user_ids or []),
+                caps=caps,
+                shift_rules=rules.get('shifts') or []
+            ))
+        return specs
+    
+    def generate_batch(self, group_ids: List[int], year: int, month: int, months: int = 1,
+                       calls_per_night: int = 1, solver: str = 'round_robin',
+                       time_budget: float = 1.0, seed: Optional[int] = None,
+                       restarts: int = 1, workers: Optional[int] = None,
+                       progress: Optional[PhaseCallback] = None) -> Dict:
+        """Generate night calls for several on-call pools over a multi-month horizon
+        
+        ``progress`` is called per phase as in generate_roster (pools may solve in
+        other processes, so there is no per-iteration solver state).
+        """
+        progress = progress or _no_progress
+        progress('loading', {})
+        horizon_start = horizon_end = datetime(year, month, 1)
+        for _ in range(months):
+            horizon_end = _next_month(horizon_end)
+        self.sync_engine_window(horizon_start, horizon_end)
+        pools = self.pool_specs(group_ids)
+        
+        progress('solving', {})
+        results = generate_pools(
+            self.engine, pools, year, month, months=months, workers=workers,
+            calls_per_night=calls_per_night, solver=solver,
+            time_budget=time_budget, seed=seed, restarts=restarts,
+            user_posts=self._current_posts(sorted({u for p in pools for u in p.user_ids}))
+        )
+        
+        progress('persisting', {})
+        created = len(self._persist_engine_shifts(
+            shift for pool in pools for shift in results[pool.group_id]['shifts']
+        ))
+        
+        return {
+            'pools': [{
+                'group_id': pool.group_id,
+                'name': pool.name,
+                'members': len(pool.user_ids),
+                'months': results[pool.group_id]['months'],
+            } for pool in pools],
+            'shifts_created': created
+        }
+    
+    def validate_ewtd(self, user_id: Optional[int] = None,
+                      reference_weeks: Optional[int] = None,
+                      start_date: Optional[date] = None,
+                      end_date: Optional[date] = None) -> Dict:
+        """Validate EWTD compliance
+        
+        With ``reference_weeks`` set, the columnar validator also checks weekly rest
+        and the rolling average weekly hours over that reference period. A date range
+        limits loading to shifts around [start_date, end_date].
+        """
+        margin = max(INCREMENTAL_MARGIN, timedelta(weeks=reference_weeks or 0))
+        window_start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+        self.sync_engine_window(
+            window_start,
+            datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None,
+            user_ids=None if user_id is None else [user_id],
+            margin=margin,
+            shared=True
+        )
+        result = self.engine.validate_roster(user_id)
+        
+        if reference_weeks:
+            # The engine may be a shared snapshot: look the user up without adding a timeline
+            rows = None
+            if user_id is not None:
+                rows = self.engine.timelines.get(user_id).shifts.rows() if user_id in self.engine.timelines else []
+            # Shifts are loaded from margin before start_date, so averages may reach back that far
+            data_start = to_minutes(window_start - margin) if window_start else None
+            columnar = validate_columns(ShiftColumns.from_store(self.engine.store, rows),
+                                        reference_weeks=reference_weeks, data_start=data_start)
+            extra = columnar.messages(rules=(WEEKLY_REST, AVG_WEEKLY_HOURS))
+            result['violations'].extend(extra['violations'])
+            result['warnings'].extend(extra['warnings'])
+            result['compliant'] = not result['violations']
         
-        result['shifts_created'] = created_shifts
         return result
     
-    def validate_ewtd(self, user_id: Optional[int] = None) -> Dict:
-        """Validate EWTD compliance"""
-        self.sync_engine_from_db()
-        return self.engine.validate_roster(user_id)
+    def violation_report(self, year: int, month: int, user_id: Optional[int] = None,
+                         group_id: Optional[int] = None, rule: Optional[str] = None,
+                         severity: Optional[str] = None, offset: int = 0, limit: int = 100) -> Dict:
+        """Structured EWTD findings for one month, filtered and paginated
+        
+        Covers one user, the members of an on-call group, or every user. Reports
+        come from the per-user-per-month cache; users without one are validated
+        together from a single engine load.
+        """
+        if user_id is not None:
+            user_ids = [user_id]
+        elif group_id is not None:
+            specs = self.pool_specs([group_id])
+            user_ids = specs[0].user_ids if specs else []
+        else:
+            user_ids = [uid for (uid,) in self.db.query(User.id).order_by(User.id)]
+        
+        keys = [(uid, year, month) for uid in user_ids]
+        reports = report_cache.get_many(keys)
+        missing = [uid for uid, _, _ in keys if (uid, year, month) not in reports]
+        if missing:
+            version = engine_cache.version
+            # A full dashboard miss shares the all-users engine snapshot
+            load_all = user_id is None and group_id is None and len(missing) == len(keys)
+            built = self._build_reports(year, month, missing, load_all)
+            nights = max((self.engine.user_constraints[uid].max_consecutive_nights
+                          for uid in missing if uid in self.engine.user_constraints), default=0)
+            report_cache.put_many(built, version, margin=report_margin(nights))
+            reports.update(built)
+        
+        findings = [f for key in keys for f in reports.get(key, ())]
+        compliant = not any(f['severity'] == VIOLATION for f in findings)
+        counts = Counter(f['rule'] for f in findings)
+        if rule:
+            findings = [f for f in findings if f['rule'] == rule]
+        if severity:
+            findings = [f for f in findings if f['severity'] == severity]
+        
+        return {
+            'year': year,
+            'month': month,
+            'users_checked': len(user_ids),
+            'compliant': compliant,
+            'counts': dict(counts),
+            'total': len(findings),
+            'violations': findings[offset:offset + limit],
+        }
     
-    def import_csv(self, csv_content: str) -> Dict:
-        """Import roster from CSV"""
-        # Get user and post maps
-        users = self.db.query(User).all()
-        posts = self.db.query(Post).all()
-        
-        user_map = create_user_map(users)
-        post_map = create_post_map(posts)
-        
-        # Parse CSV
-        importer = RosterImporter(user_map, post_map)
-        roster_data = importer.parse_csv(csv_content)
-        
-        if importer.errors:
-            return {
-                'imported': 0,
-                'errors': importer.errors,
-                'shifts': []
-            }
-        
-        # Validate
-        valid_data, validation_errors = importer.validate_roster_data(roster_data)
-        
-        # Create shifts
-        created_shifts = []
-        for item in valid_data:
-            shift = self.create_shift(
-                user_id=item['user_id'],
-                post_id=item['post_id'],
-                start=datetime.fromisoformat(item['start']),
-                end=datetime.fromisoformat(item['end']),
-                shift_type=item['type'],
-                labels=item.get('labels', {})
+    def _build_reports(self, year: int, month: int, user_ids: List[int],
+                       load_all: bool = False) -> Dict[Tuple[int, int, int], Tuple[Dict, ...]]:
+        """Validate one month for ``user_ids`` and key the findings by user
+        
+        Checks run over the month padded by the rule margin so rest and rolling-week
+        rules see the neighbouring shifts; only findings starting in the month are kept.
+        """
+        month_start = datetime(year, month, 1)
+        month_end = _next_month(month_start)
+        self.sync_engine_window(month_start, month_end, user_ids=None if load_all else user_ids, shared=True)
+        window = (month_start - INCREMENTAL_MARGIN, month_end + INCREMENTAL_MARGIN)
+        
+        found: Dict[int, List[Violation]] = {uid: [] for uid in user_ids}
+        for uid in user_ids:
+            for v in self.engine.violations(uid, window=window):
+                if month_start <= v.start < month_end:
+                    found[uid].append(v)
+        
+        # Resolve the shift spans of the findings to ids with one windowed query
+        flagged = [uid for uid, issues in found.items() if any(v.shifts for v in issues)]
+        shift_ids: Dict[Tuple[int, datetime, datetime], int] = {}
+        if flagged:
+            query = self.db.query(Shift.id, Shift.user_id, Shift.start, Shift.end).filter(
+                Shift.overlapping(*window)
             )
-            created_shifts.append(shift)
+            if not load_all:
+                query = query.filter(Shift.user_id.in_(flagged))
+            for shift_id, uid, start, end in query:
+                shift_ids.setdefault((uid, start, end), shift_id)
+        
+        reports = {}
+        for uid, issues in found.items():
+            issues.sort(key=lambda v: (v.start, v.rule))
+            reports[(uid, year, month)] = tuple(
+                {**v.to_dict(), 'shift_ids': [shift_ids[(uid, s, e)] for s, e in v.shifts if (uid, s, e) in shift_ids]}
+                for v in issues
+            )
+        return reports
+    
+    def import_csv(self, csv_content: str, batch_size: int = IMPORT_BATCH_SIZE,
+                   commit_mode: str = 'atomic', return_shifts: bool = True) -> Dict:
+        """Import roster from CSV"""
+        return self.import_csv_lines(csv_content.strip().split('\n'), batch_size=batch_size,
+                                     commit_mode=commit_mode, return_shifts=return_shifts)
+    
+    def import_csv_lines(self, lines: Iterable[str], batch_size: int = IMPORT_BATCH_SIZE,
+                         commit_mode: str = 'atomic', return_shifts: bool = False,
+                         on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Batched CSV import: parse incrementally, validate and bulk insert per chunk
+        
+        ``commit_mode='atomic'`` writes everything in one transaction and rolls it all
+        back if any row fails to parse. ``commit_mode='chunk'`` commits each chunk of
+        ``batch_size`` rows on its own and skips only the chunks with parse errors.
+        Rows failing EWTD checks are skipped and reported in either mode.
+        ``on_progress`` is called after every chunk with the running totals.
+        """
+        if commit_mode not in IMPORT_COMMIT_MODES:
+            raise ValueError(f"Unknown commit mode '{commit_mode}'")
+        
+        # Resolve users and posts from maps built once per import
+        importer = RosterImporter(create_user_map(self.db.query(User).all()),
+                                  create_post_map(self.db.query(Post).all()),
+                                  max_errors=MAX_IMPORT_ERRORS)
+        validation_errors: List[str] = []
+        validation_count = 0
+        imported = chunks = rows_read = seen_errors = 0
+        ids: List[int] = []
         
+        try:
+            for chunk in chunked(importer.iter_records(lines), batch_size):
+                # Parse errors hit while reading this chunk's lines
+                chunk_failed = importer.error_count > seen_errors
+                seen_errors = importer.error_count
+                rows_read += len(chunk)
+                rows = []
+                for item in chunk:
+                    error = importer.record_error(item)
+                    if error:
+                        validation_count += 1
+                        if len(validation_errors) < MAX_IMPORT_ERRORS:
+                            validation_errors.append(error)
+                        continue
+                    rows.append({
+                        'user_id': item['user_id'],
+                        'post_id': item['post_id'],
+                        'start': item['start'],
+                        'end': item['end'],
+                        'shift_type': item['type'],
+                        'labels': item['labels']
+                    })
+                
+                # Atomic imports keep parsing after a parse error so every error is
+                # reported, but write nothing
+                skip = importer.error_count if commit_mode == 'atomic' else chunk_failed
+                if not skip:
+                    ids.extend(self._bulk_insert_shifts(rows, returning=return_shifts))
+                    imported += len(rows)
+                    chunks += 1
+                    if commit_mode == 'chunk':
+                        self.db.commit()
+                
+                if on_progress:
+                    on_progress({
+                        'rows_read': rows_read,
+                        'imported': imported,
+                        'chunks': chunks,
+                        'errors': importer.error_count + validation_count
+                    })
+            
+            if commit_mode == 'atomic' and importer.error_count:
+                self.db.rollback()
+                return {
+                    'imported': 0,
+                    'errors': _capped(importer.errors, importer.error_count),
+                    'shifts': [],
+                    'chunks': 0,
+                    'rows_read': rows_read
+                }
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        return {
+            'imported': imported,
+            'errors': _capped(importer.errors + validation_errors,
+                              importer.error_count + validation_count),
+            'shifts': self._load_shifts_by_id(ids) if return_shifts else [],
+            'chunks': chunks,
+            'rows_read': rows_read
+        }
+    
+    def import_grid(self, csv_content: str, skip_unresolved: bool = False) -> Dict:
+        """Import a weekly call grid (the roster_template.csv layout)
+        
+        Post cells are booked to the post's current holder and name cells to the NCHD's
+        current post. Unless ``skip_unresolved`` is set, nothing is written when any
+        cell cannot be resolved. Shifts already in the database are not duplicated.
+        Records only get the per-shift checks on the way in, so the result carries the
+        cross-shift EWTD delta (rest, continuous duty, weekly hours) of the imported weeks.
+        """
+        importer = GridImporter(
+            create_alias_index(self.db.query(User).all(), self.db.query(Post).all()),
+            self._post_holders(), self._current_posts()
+        )
+        records = importer.parse_grid(csv_content.strip().split('\n'))
+        if importer.errors and not skip_unresolved:
+            return {'imported': 0, 'errors': _capped(importer.errors, len(importer.errors)),
+                    'shifts': [], 'chunks': 0, 'ewtd': self._empty_delta()}
+        
+        validation_errors = []
+        valid = []
+        for item in records:
+            error = RosterImporter.record_error(item)
+            if error:
+                validation_errors.append(error)
+                continue
+            valid.append(EngineShift(user_id=item['user_id'], post_id=item['post_id'],
+                                     start=item['start'], end=item['end'],
+                                     shift_type=item['type'], labels=item['labels']))
+        
+        windows = self._affected_windows([(s.user_id, s.start, s.end) for s in valid])
+        created, delta = self._with_ewtd_delta(windows, lambda: self._persist_engine_shifts(valid))
+        errors = importer.errors + validation_errors
         return {
-            'imported': len(created_shifts),
-            'errors': validation_errors,
-            'shifts': created_shifts
+            'imported': len(created),
+            'errors': _capped(errors, len(errors)),
+            'shifts': created,
+            'chunks': 1 if created else 0,
+            'ewtd': delta
         }
+    
+    def import_csv_stream(self, body: Iterable[bytes], batch_size: int = IMPORT_BATCH_SIZE,
+                          commit_mode: str = 'atomic',
+                          on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Import CSV from a stream of byte chunks without holding the file in memory"""
+        bytes_read = 0
+        
+        def counted() -> Iterator[bytes]:
+            nonlocal bytes_read
+            for chunk in body:
+                bytes_read += len(chunk)
+                yield chunk
+        
+        def progress(event: Dict):
+            event['bytes_read'] = bytes_read
+            logger.info("CSV import: %(rows_read)d rows read, %(imported)d imported, "
+                        "%(bytes_read)d bytes", event)
+            if on_progress:
+                on_progress(event)
+        
+        result = self.import_csv_lines(iter_lines(counted()), batch_size=batch_size,
+                                       commit_mode=commit_mode, on_progress=progress)
+        result['bytes_read'] = bytes_read
+        return result
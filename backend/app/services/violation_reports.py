@@ -0,0 +1,98 @@
+"""Per-user, per-month cache of structured EWTD findings.
+
+A report is dropped by any commit touching that user's shifts or leave within
+the report margin of its month, or by any commit the engine cache cannot replay.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .engine_cache import Change, change_span, engine_cache
+
+REPORT_CACHE_ENTRIES = int(os.getenv("REPORT_CACHE_ENTRIES", "20000"))
+
+# How far a shift or leave change can move findings in a neighbouring month: the rolling
+# week, or further when a night run may be longer than that
+WEEKLY_MARGIN = timedelta(days=7)
+
+# (user_id, year, month)
+ReportKey = Tuple[int, int, int]
+
+
+def report_margin(max_consecutive_nights: int) -> timedelta:
+    """Reach of a change for reports built with runs of up to ``max_consecutive_nights`` allowed"""
+    return max(WEEKLY_MARGIN, timedelta(days=max_consecutive_nights + 1))
+
+
+def months_between(start: datetime, end: datetime) -> List[Tuple[int, int]]:
+    """(year, month) pairs of every month intersecting [start, end]"""
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class ReportCache:
+    """LRU of per-(user, month) reports, dropped by the commits that touch them"""
+
+    def __init__(self, max_entries: int = REPORT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.margin = WEEKLY_MARGIN
+        self._reports: "OrderedDict[ReportKey, Tuple[Dict, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._reports)
+
+    def get_many(self, keys: Iterable[ReportKey]) -> Dict[ReportKey, Tuple[Dict, ...]]:
+        with self._lock:
+            found = {}
+            for key in keys:
+                report = self._reports.get(key)
+                if report is not None:
+                    self._reports.move_to_end(key)
+                    found[key] = report
+            return found
+
+    def put_many(self, reports: Dict[ReportKey, Tuple[Dict, ...]], version: int,
+                 margin: timedelta = WEEKLY_MARGIN):
+        """Store reports built from data read at engine_cache ``version`` (skipped if a commit landed since)
+
+        ``margin`` is how far a change can reach into these reports; invalidation uses the
+        widest margin of any cached report.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version != engine_cache.version:
+                return
+            self.margin = max(self.margin, margin)
+            for key, report in reports.items():
+                self._reports[key] = report
+                self._reports.move_to_end(key)
+            while len(self._reports) > self.max_entries:
+                self._reports.popitem(last=False)
+
+    def invalidate(self, changes: Optional[List[Change]]):
+        with self._lock:
+            if changes is None:
+                self._reports.clear()
+                self.margin = WEEKLY_MARGIN
+                return
+            for change in changes:
+                user_id, start, end = change_span(change)
+                for year, month in months_between(start - self.margin, end + self.margin):
+                    self._reports.pop((user_id, year, month), None)
+
+    def clear(self):
+        with self._lock:
+            self._reports.clear()
+            self.margin = WEEKLY_MARGIN
+
+
+report_cache = ReportCache()
+engine_cache.subscribe(report_cache.invalidate)
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The database is chosen when app.db is imported, so point it at a scratch file first
+_DB_DIR = tempfile.mkdtemp(prefix="nchd-roster-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_DIR}/test.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Leave, Shift, User  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """App with the seeded posts and groups plus 14 users (one database for the session)"""
+    with TestClient(app) as test_client:
+        db = SessionLocal()
+        try:
+            if not db.query(User).count():
+                db.add_all(User(name=f"Dr {i}", email=f"user{i}@example.ie", grade="SHO") for i in range(14))
+                db.commit()
+        finally:
+            db.close()
+        yield test_client
+
+
+@pytest.fixture
+def db(client):
+    """A session on a roster with no shifts or leave"""
+    session = SessionLocal()
+    session.query(Shift).delete()
+    session.query(Leave).delete()
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
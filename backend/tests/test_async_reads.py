@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app import models
+from app.db import ReadSessionLocal, ThreadpoolSession
+from app.routers.api import _post_to_dict
+from app.routers.groups import _group_to_dict
+from app.services.roster_service import RosterService
+
+
+def test_threadpool_session_matches_sync_session(client, db):
+    stmt = select(models.User.id, models.User.name).order_by(models.User.id)
+    session = ThreadpoolSession(ReadSessionLocal())
+
+    async def read():
+        try:
+            return ((await session.execute(stmt)).all(), (await session.scalars(stmt)).all(),
+                    await session.scalar(select(models.User.name).where(models.User.id == 1)),
+                    (await session.get(models.User, 1)).email)
+        finally:
+            await session.close()
+
+    rows, ids, name, email = asyncio.run(read())
+    assert rows == db.execute(stmt).all()
+    assert ids == db.scalars(stmt).all()
+    assert (name, email) == (db.get(models.User, 1).name, db.get(models.User, 1).email)
+
+
+def test_async_list_routes_match_the_database(client, db):
+    first = datetime(2024, 6, 1, 17)
+    service = RosterService(db)
+    for day in range(3):
+        service.create_shift(day + 1, 1, first + timedelta(days=day), first + timedelta(days=day, hours=16),
+                             'night_call')
+
+    assert client.get("/api/posts").json() == [
+        _post_to_dict(p) for p in db.query(models.Post).order_by(models.Post.id)
+    ]
+    assert client.get("/api/groups").json() == [_group_to_dict(g) for g in db.query(models.Group)]
+    listed = client.get("/api/roster/shifts").json()
+    assert listed['total'] == 3
+    assert [(s['id'], s['user_id'], s['start']) for s in listed['shifts']] == [
+        (s.id, s.user_id, s.start.isoformat()) for s in db.query(models.Shift).order_by(models.Shift.start)
+    ]
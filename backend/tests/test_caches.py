@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.models import Post, Shift
+from app.services import change_capture as change_capture_module
+from app.services.change_capture import change_capture
+from app.services.engine_cache import engine_cache
+from app.services.http_cache import table_versions
+from app.services.roster_service import RosterService
+from app.services.violation_reports import report_cache, report_margin
+
+
+def _versions():
+    return engine_cache.version, table_versions.get('shifts'), table_versions.get('posts')
+
+
+def test_commit_invalidates_caches_and_rollback_does_not(client, db):
+    service = RosterService(db)
+    service.validate_ewtd()
+    etag = client.get('/api/roster/shifts').headers['etag']
+    assert client.get('/api/roster/shifts', headers={'If-None-Match': etag}).status_code == 304
+    before = _versions()
+
+    db.add(Shift(user_id=1, post_id=1, start=datetime(2025, 12, 1, 9), end=datetime(2025, 12, 1, 17),
+                 shift_type='base', labels={}))
+    db.get(Post, 1).notes = 'rolled back'
+    db.flush()
+    db.rollback()
+    assert _versions() == before
+    assert client.get('/api/roster/shifts', headers={'If-None-Match': etag}).status_code == 304
+
+    report_cache.put_many({(1, 2025, 12): ()}, engine_cache.version)
+    service.create_shift(1, 1, datetime(2025, 12, 1, 9), datetime(2025, 12, 1, 17), 'base')
+    after = _versions()
+    assert after[0] == before[0] + 1 and after[1] > before[1] and after[2] == before[2]
+    assert report_cache.get_many([(1, 2025, 12)]) == {}
+    response = client.get('/api/roster/shifts', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['etag'] != etag
+
+
+def test_bulk_insert_past_the_cap_keeps_only_a_summary(client, db, monkeypatch):
+    monkeypatch.setattr(change_capture_module, 'MAX_CAPTURED_ROWS', 5)
+    published = []
+    change_capture.subscribe(published.append)
+    try:
+        RosterService(db).create_shift(1, 1, datetime(2025, 12, 1, 9), datetime(2025, 12, 1, 17), 'base')
+        service = RosterService(db)
+        service.validate_ewtd()
+        assert len(engine_cache)
+        rows = [dict(user_id=2 + i % 3, post_id=1, start=datetime(2025, 12, 2 + i, 9),
+                     end=datetime(2025, 12, 2 + i, 17), shift_type='base', labels={}) for i in range(8)]
+        db.execute(insert(Shift), rows[:4])
+        db.execute(insert(Shift), rows[4:])
+        db.commit()
+    finally:
+        change_capture._listeners.remove(published.append)
+
+    writes = published[-1].writes
+    assert [(w.rows, w.count) for w in writes] == [(None, 4), (None, 4)]
+    assert writes[1].start == datetime(2025, 12, 6, 9) and writes[1].end == datetime(2025, 12, 9, 17)
+    assert writes[0].user_ids == {2, 3, 4} and writes[0].post_ids == {1}
+    # Without the rows the engine cache cannot replay the insert, so every snapshot goes
+    assert len(engine_cache) == 0
+
+
+def test_violation_report_is_rebuilt_after_a_write(client, db):
+    params = {'year': 2024, 'month': 8, 'user_id': 2}
+    assert client.get('/api/roster/violations', params=params).json()['compliant']
+    assert report_cache.get_many([(2, 2024, 8)]) == {(2, 2024, 8): ()}
+
+    service = RosterService(db)
+    for day in range(4):
+        start = datetime(2024, 8, 5, 20) + timedelta(days=day)
+        service.create_shift(2, 1, start, start + timedelta(hours=12), 'night_call')
+    assert report_cache.get_many([(2, 2024, 8)]) == {}
+    report = client.get('/api/roster/violations', params=params).json()
+    assert not report['compliant'] and report['counts']
+
+
+def test_report_margin_covers_long_night_runs(client, db):
+    # A change ten days before the month can end a run of more than seven nights inside it
+    report_cache.put_many({(2, 2024, 9): ()}, engine_cache.version, margin=report_margin(10))
+    RosterService(db).create_shift(2, 1, datetime(2024, 8, 21, 20), datetime(2024, 8, 22, 8), 'night_call')
+    assert report_cache.get_many([(2, 2024, 9)]) == {}
+    report_cache.clear()
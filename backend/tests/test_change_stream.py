@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime
+
+from app.models import Post
+from app.services.change_stream import Subscription, change_broker
+from app.services.roster_service import RosterService
+
+
+def _drain(loop, subscription):
+    """Run the pushes the broker scheduled on the subscriber's loop and return the queued events"""
+    loop.run_until_complete(asyncio.sleep(0))
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return [(e.kind, e.payload['op'], e.payload.get('post_id', e.payload.get('id'))) for e in events]
+
+
+def test_site_subscription_follows_posts_moving_between_sites(client, db):
+    posts = db.query(Post).order_by(Post.id).all()
+    site = posts[0].site
+    outside = next(p for p in posts if p.site != site)
+    home_site = outside.site
+    post_ids, user_ids = RosterService(db).subscription_scope(site=site)
+    assert outside.id not in post_ids
+
+    loop = asyncio.new_event_loop()
+    subscription = Subscription(loop, frozenset(post_ids), frozenset(user_ids), site=site)
+    change_broker.subscribe(subscription)
+    service = RosterService(db)
+    user_id = 1
+    try:
+        service.create_shift(user_id, posts[0].id, datetime(2025, 11, 3, 9), datetime(2025, 11, 3, 17), 'base')
+        service.create_shift(user_id, outside.id, datetime(2025, 11, 4, 9), datetime(2025, 11, 4, 17), 'base')
+        assert _drain(loop, subscription) == [('shift', 'created', posts[0].id)]
+
+        # Moving into the site brings the post's later shifts with it
+        outside.site = site
+        db.commit()
+        service.create_shift(user_id, outside.id, datetime(2025, 11, 5, 9), datetime(2025, 11, 5, 17), 'base')
+        assert _drain(loop, subscription) == [('post', 'updated', outside.id), ('shift', 'created', outside.id)]
+
+        # Moving out is sent once, then the post is dropped
+        outside.site = home_site
+        db.commit()
+        service.create_shift(user_id, outside.id, datetime(2025, 11, 6, 9), datetime(2025, 11, 6, 17), 'base')
+        assert _drain(loop, subscription) == [('post', 'updated', outside.id)]
+
+        # Rolled-back writes are never sent
+        posts[0].status = 'VACANT'
+        db.flush()
+        db.rollback()
+        assert _drain(loop, subscription) == []
+    finally:
+        change_broker.unsubscribe(subscription)
+        loop.close()
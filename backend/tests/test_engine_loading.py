@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.db import engine
+from app.models import Leave
+from app.services.roster_service import RosterService
+
+
+def _count_statements(fn):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return statements
+
+
+def test_window_loads_only_overlapping_shifts(client, db):
+    service = RosterService(db)
+    night = lambda day: (datetime(2024, 3, day, 17), datetime(2024, 3, day + 1, 9))
+    for day in (1, 9, 14, 20):
+        service.create_shift(2, 1, *night(day), 'night_call')
+    service.create_shift(5, 1, *night(14), 'night_call')
+
+    # The night of the 9th ends inside the window, so it is loaded; the 1st and 20th are not
+    service.sync_engine_window(datetime(2024, 3, 10), datetime(2024, 3, 16), [2], margin=timedelta(0))
+    assert sorted((s.user_id, s.start) for s in service.engine.store) == [
+        (2, datetime(2024, 3, 9, 17)), (2, datetime(2024, 3, 14, 17))
+    ]
+    assert set(service.engine.user_constraints) == {2}
+
+
+def test_repeated_window_is_served_from_the_snapshot(client, db):
+    service = RosterService(db)
+    service.create_shift(2, 1, datetime(2024, 4, 3, 17), datetime(2024, 4, 4, 9), 'night_call')
+    load = lambda: service.sync_engine_window(datetime(2024, 4, 1), datetime(2024, 5, 1))
+    assert _count_statements(load)
+    assert _count_statements(load) == []
+
+    # A write to the window invalidates the snapshot, and copies keep callers apart
+    service.engine.add_leave(2, datetime(2024, 4, 10), datetime(2024, 4, 12))
+    service.create_shift(2, 1, datetime(2024, 4, 20, 17), datetime(2024, 4, 21, 9), 'night_call')
+    load()
+    assert len(service.engine.store) == 2
+    assert service.engine.user_constraints[2].leave_periods == []
+
+
+def test_only_approved_leave_is_loaded(client, db):
+    week = (datetime(2024, 5, 6), datetime(2024, 5, 13))
+    pending = Leave(user_id=2, start=week[0], end=week[1], status='pending')
+    db.add_all([Leave(user_id=2, start=datetime(2024, 5, 20), end=datetime(2024, 5, 22)), pending,
+                Leave(user_id=2, start=datetime(2024, 5, 1), end=datetime(2024, 5, 3), status='rejected')])
+    db.commit()
+
+    service = RosterService(db)
+    load = lambda: service.sync_engine_window(datetime(2024, 5, 1), datetime(2024, 6, 1), [2])
+    load()
+    assert service.engine.user_constraints[2].leave_periods == [(datetime(2024, 5, 20), datetime(2024, 5, 22))]
+
+    # Approving the request (as a route would, on a loaded row) is replayed onto the cached snapshot
+    assert db.get(Leave, pending.id).status == 'pending'
+    pending.status = 'approved'
+    db.commit()
+    assert _count_statements(load) == []
+    assert week in service.engine.user_constraints[2].leave_periods
+    assert service.engine.timelines.get(2).on_leave(datetime(2024, 5, 7, 9), datetime(2024, 5, 7, 17))
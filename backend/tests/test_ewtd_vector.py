@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from app.engine.ewtd_vector import (
+    AVG_WEEKLY_HOURS, DAILY_REST, OVERLAP, ShiftColumns, to_epoch_minutes, validate_columns,
+)
+
+
+def _columns(*periods, user_id=1):
+    return ShiftColumns.from_arrays([user_id] * len(periods),
+                                    to_epoch_minutes(s for s, _ in periods),
+                                    to_epoch_minutes(e for _, e in periods))
+
+
+def test_overlap_and_rest_use_the_running_latest_end():
+    day = datetime(2025, 11, 3)
+    cols = _columns((day.replace(hour=8), day.replace(hour=20)),
+                    (day.replace(hour=9), day.replace(hour=10)),
+                    (day.replace(hour=11), day.replace(hour=12)),
+                    (day.replace(hour=22), day.replace(hour=23)))
+    result = validate_columns(cols)
+    assert len(result.by_rule[OVERLAP]) == 2
+    assert result.by_rule[DAILY_REST].measured.tolist() == [2.0]
+
+
+def test_average_covers_only_the_loaded_part_of_a_window():
+    start = datetime(2025, 11, 3)
+    # Four weeks of 60h: over 48h a week, though far under it spread over 17 weeks
+    periods = [(start + timedelta(days=d, hours=8), start + timedelta(days=d, hours=20))
+               for week in range(4) for d in range(week * 7, week * 7 + 5)]
+    result = validate_columns(_columns(*periods), reference_weeks=17)
+    assert len(result.by_rule[AVG_WEEKLY_HOURS]) == 1
+    assert result.by_rule[AVG_WEEKLY_HOURS].measured[0] >= 60
+
+    # With the data known to start 13 weeks earlier, the same hours average out
+    data_start = int(to_epoch_minutes([start - timedelta(weeks=13)])[0])
+    result = validate_columns(_columns(*periods), reference_weeks=17, data_start=data_start)
+    assert len(result.by_rule[AVG_WEEKLY_HOURS]) == 0
@@ -0,0 +1,46 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from app.engine.fairness import FairnessAccumulator, FairnessWeights, weighted_hours
+from app.engine.roster_engine import fairness_score
+
+
+def test_accumulator_matches_fairness_score_through_updates():
+    rng = random.Random(7)
+    users = list(range(10))
+    loads = FairnessAccumulator(users, baseline={0: 16.0, 3: 24.0})
+    shifts = []
+    for _ in range(500):
+        if shifts and rng.random() < 0.4:
+            user, hours = shifts.pop(rng.randrange(len(shifts)))
+            if rng.random() < 0.5:
+                loads.unassign(user, hours)
+            else:
+                other = rng.choice(users)
+                loads.move(user, other, hours)
+                shifts.append((other, hours))
+        else:
+            user, hours = rng.choice(users), rng.choice((16.0, 22.0, 23.0))
+            assert loads.score_if(user, hours) == pytest.approx(
+                fairness_score([(u, h + hours * (u == user)) for u, h in loads.loads().items()]))
+            loads.assign(user, hours)
+            shifts.append((user, hours))
+        assert loads.score == pytest.approx(fairness_score(list(loads.loads().items())), abs=1e-9)
+
+
+def test_swap_exchanges_hours():
+    loads = FairnessAccumulator([1, 2], baseline={1: 16.0, 2: 24.0})
+    loads.swap(1, 16.0, 2, 24.0)
+    assert loads.loads() == {1: 24.0, 2: 16.0}
+    assert loads.score == pytest.approx(fairness_score([(1, 24.0), (2, 16.0)]))
+
+
+def test_bank_holidays_outweigh_weekends():
+    weights = FairnessWeights(night=1.5, weekend=2.0, bank_holiday=3.0)
+    christmas = datetime(2027, 12, 25, 17)  # a Saturday
+    saturday = datetime(2027, 12, 18, 17)
+    assert weighted_hours(christmas, christmas.replace(day=26, hour=9), 'night_call', weights, {christmas.date()}) == 16 * 1.5 * 3.0
+    assert weighted_hours(saturday, saturday.replace(day=19, hour=9), 'night_call', weights) == 16 * 1.5 * 2.0
+    assert weighted_hours(saturday, saturday.replace(hour=20), 'day_call', FairnessWeights()) == 3.0
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from app.engine.availability import clinic_span, overlaps_clinic
+from app.engine.roster_engine import RosterEngine, UserConstraints
+from app.models import Group, Post, Shift, User
+from app.services.roster_service import RosterService
+
+
+def test_generating_twice_keeps_each_users_opd_days(client, db):
+    user_ids = [u.id for u in db.query(User).order_by(User.id)]
+    posts = {p.id: p for p in db.query(Post)}
+    opd_post = next(p for p in posts.values() if p.eligibility['clinic_constraints']['opd_days'] == ["MON", "TUE"])
+    plain_post = next(p for p in posts.values() if not p.eligibility['clinic_constraints']['opd_days'])
+    own_post = {uid: (opd_post.id if i % 2 else plain_post.id) for i, uid in enumerate(user_ids)}
+    service = RosterService(db)
+    for uid, post_id in own_post.items():
+        service.create_shift(uid, post_id, datetime(2025, 6, 2, 9), datetime(2025, 6, 2, 17), 'base')
+
+    expected = service._clinic_constraints(user_ids)
+    assert set(expected) == {uid for uid, post_id in own_post.items() if post_id == opd_post.id}
+
+    for month in (7, 8):
+        response = client.post('/api/roster/generate', json={
+            'month': month, 'year': 2025, 'post_ids': [1], 'solver': 'anneal', 'time_budget': 0.5, 'seed': 1,
+        })
+        assert response.status_code == 200
+        assert response.json()['unassigned_dates'] == []
+
+    db.expire_all()
+    assert RosterService(db)._clinic_constraints(user_ids) == expected
+    calls = db.query(Shift).filter(Shift.shift_type == 'night_call', Shift.user_id.in_(user_ids)).all()
+    assert calls and all(call.post_id == own_post[call.user_id] for call in calls)
+    for call in calls:
+        if call.user_id in expected:
+            assert not overlaps_clinic(["MON", "TUE"], *clinic_span(call.start, call.end, 'night_call'))
+
+def test_calendar_and_fallback_agree_on_clinic_days():
+    # A Friday OPD blocks a night starting on Friday afternoon as well as the night before
+    constraint = UserConstraints(user_id=1, opd_days={"FRI"})
+    without_calendar = RosterEngine()
+    without_calendar.user_constraints[1] = constraint
+    with_calendar = RosterEngine()
+    with_calendar.user_constraints[1] = constraint
+    with_calendar.build_availability(datetime(2025, 7, 1), datetime(2025, 8, 1))
+    for start, end in ((datetime(2025, 7, 4, 13), datetime(2025, 7, 5, 11)), (datetime(2025, 7, 3, 20), datetime(2025, 7, 4, 8)),
+                       (datetime(2025, 7, 5, 20), datetime(2025, 7, 6, 8))):
+        assert ("OPD day" in without_calendar.check_assignment(1, start, end, 'night_call')) == \
+            ("OPD day" in with_calendar.check_assignment(1, start, end, 'night_call'))
+    assert "OPD day" in without_calendar.check_assignment(1, datetime(2025, 7, 4, 13), datetime(2025, 7, 5, 11), 'night_call')
+
+
+def test_batch_generation_refuses_pools_without_members(client, db):
+    pool = db.query(Group).filter(Group.kind == 'on_call_pool', ~Group.posts.any()).first()
+    assert not (pool.rules or {}).get('user_ids')
+    for path in ('/api/roster/generate-batch', '/api/roster/jobs/generate-batch'):
+        response = client.post(path, json={'group_ids': [pool.id], 'month': 9, 'year': 2025})
+        assert response.status_code == 400
+        assert pool.name in response.json()['detail']
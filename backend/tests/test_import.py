@@ -0,0 +1,126 @@
+import json
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from app.models import Post, Shift, User
+from app.services import change_capture as change_capture_module
+from app.services.change_capture import change_capture
+from app.services.roster_service import RosterService
+
+GRID = (
+    "Week Commencing,Friday Night Call 1300 to 1100 next day,Saturday Night Call 1100 to 1000 next day\n"
+    "06/10/2025,{name},{name}\n"
+)
+
+
+def test_grid_import_reports_cross_shift_ewtd(client, db):
+    user = db.query(User).order_by(User.id.desc()).first()
+    post = db.query(Post).order_by(Post.id).first()
+    RosterService(db).create_shift(user.id, post.id, datetime(2025, 9, 29, 9), datetime(2025, 9, 29, 17), 'base')
+
+    response = client.post('/api/roster/import-grid', json={'csv_content': GRID.format(name=user.name)})
+    assert response.status_code == 200
+    body = response.json()
+    assert body['imported'] == 2 and body['errors'] == []
+    assert {s['post_id'] for s in body['shifts']} == {post.id}
+    assert not body['ewtd']['compliant']
+    assert any('Continuous duty exceeds 24 hours' in v for v in body['ewtd']['new_violations'])
+
+
+def test_csv_stream_import_streams_ndjson_progress(client, db):
+    users = db.query(User).order_by(User.id).limit(3).all()
+    post = db.query(Post).order_by(Post.id).first()
+    rows = [f"{u.name},{post.title},2025-11-{day:02d},base,09:00,17:00" for u in users for day in range(3, 7)]
+    body = "name,post,date,type,start_time,end_time\n" + "\n".join(rows) + "\n"
+
+    response = client.post('/api/roster/import-csv/stream?batch_size=5', content=body.encode())
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    records = [json.loads(line) for line in response.text.splitlines()]
+    *progress, result = records
+    assert [p['type'] for p in progress] == ['progress'] * 3
+    assert [p['rows_read'] for p in progress] == [5, 10, 12]
+    assert result == {'type': 'result', 'imported': 12, 'errors': [], 'chunks': 3,
+                      'rows_read': 12, 'bytes_read': len(body)}
+
+
+def test_csv_stream_keeps_line_separators_inside_quoted_fields(client, db):
+    user = db.query(User).order_by(User.id).first()
+    post = db.query(Post).order_by(Post.id).first()
+    body = ("name,post,date,type,notes\r\n"
+            f'{user.name},{post.title},2025-11-03,base,"swap agreed\x0cby phone"\r\n'
+            f"{user.name},{post.title},2025-11-04,base,\r\n")
+
+    response = client.post('/api/roster/import-csv/stream', content=body.encode())
+    result = [json.loads(line) for line in response.text.splitlines()][-1]
+    assert result['type'] == 'result'
+    assert (result['imported'], result['errors'], result['rows_read']) == (2, [], 2)
+
+
+def _csv_lines(users, post, days):
+    yield "name,post,date,type\n"
+    for day in range(days):
+        for user in users:
+            yield f"{user.name},{post.title},{date(2026, 1, 1) + timedelta(days=day)},base\n"
+
+
+def test_atomic_import_holds_no_rows_until_commit(client, db, monkeypatch):
+    monkeypatch.setattr(change_capture_module, 'MAX_CAPTURED_ROWS', 500)
+    users = db.query(User).order_by(User.id).all()
+    post = db.query(Post).order_by(Post.id).first()
+
+    def import_peak(days):
+        db.query(Shift).delete()
+        db.commit()
+        published = []
+        change_capture.subscribe(published.append)
+        tracemalloc.start()
+        try:
+            result = RosterService(db).import_csv_lines(_csv_lines(users, post, days), batch_size=200)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            change_capture._listeners.remove(published.append)
+        assert result['imported'] == days * len(users)
+        inserts = [w for w in published[-1].writes if w.table == 'shifts']
+        assert sum(w.count for w in inserts) == days * len(users)
+        assert all(w.rows is None for w in inserts)
+        return peak
+
+    small, large = import_peak(50), import_peak(200)
+    # Four times the rows: memory held by the import must not grow with them
+    assert large < small * 1.5
+
+
+def _import_body(user, post, rows):
+    return "Name,Post,Date,Type,Start_Time,End_Time\n" + "\n".join(
+        f"{name or user.name},{post.title},{day},base,{start},{end}" for name, day, start, end in rows)
+
+
+def test_csv_import_commit_modes(client, db):
+    user = db.query(User).order_by(User.id).first()
+    post = db.query(Post).order_by(Post.id).first()
+    rows = [(None, f"2026-03-{d:02d}", "09:00", "17:00") for d in range(2, 8)]
+    rows[4] = ("Nobody", "2026-03-06", "09:00", "17:00")  # parse error in the third chunk
+    csv_content = _import_body(user, post, rows)
+
+    atomic = client.post('/api/roster/import-csv', json={'csv_content': csv_content, 'batch_size': 2})
+    assert atomic.status_code == 200
+    assert atomic.json()['imported'] == 0 and "User 'Nobody' not found" in atomic.json()['errors'][0]
+    assert db.query(Shift).count() == 0
+
+    chunked = client.post('/api/roster/import-csv', json={
+        'csv_content': csv_content, 'batch_size': 2, 'commit_mode': 'chunk', 'return_shifts': False})
+    body = chunked.json()
+    assert (body['imported'], body['chunks'], body['shifts']) == (4, 2, [])
+    assert sorted(s.start.day for s in db.query(Shift)) == [2, 3, 4, 5]
+
+
+def test_csv_import_skips_rows_failing_ewtd_checks(client, db):
+    user = db.query(User).order_by(User.id).first()
+    post = db.query(Post).order_by(Post.id).first()
+    csv_content = _import_body(user, post, [(None, "2026-03-02", "09:00", "17:00"),
+                                            (None, "2026-03-03", "17:00", "09:00")])
+    body = client.post('/api/roster/import-csv', json={'csv_content': csv_content}).json()
+    assert body['imported'] == 1 and body['errors'] == [f"User {user.id}: End time before start time"]
+    assert [s['start'] for s in body['shifts']] == ['2026-03-02T09:00:00']
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from app.services.jobs import CANCELLED, RUNNING, SUCCEEDED, JobConflict, JobRunner
+
+
+def _wait(job, timeout=5):
+    job.future.result(timeout=timeout)
+
+
+def _solve_until_cancelled(started: threading.Event):
+    def run(job):
+        started.set()
+        while True:
+            job.report('solving', {'iterations': job.iterations + 1})
+            threading.Event().wait(0.005)
+    return run
+
+
+def test_cancel_stops_running_job():
+    runner = JobRunner(workers=1)
+    started = threading.Event()
+    try:
+        job = runner.submit("generate", {}, _solve_until_cancelled(started), scope=frozenset({(2025, 11)}))
+        assert started.wait(5)
+        assert runner.get(job.id).status == RUNNING
+        runner.cancel(job.id)
+        _wait(job)
+        assert job.status == CANCELLED
+        assert job.finished_at is not None and job.result is None
+    finally:
+        runner.shutdown()
+
+
+def test_cancel_drops_queued_job():
+    runner = JobRunner(workers=1)
+    started = threading.Event()
+    try:
+        running = runner.submit("generate", {}, _solve_until_cancelled(started), scope=frozenset({(2025, 11)}))
+        assert started.wait(5)
+        queued = runner.submit("generate", {}, lambda job: 'ran', scope=frozenset({(2025, 12)}))
+        runner.cancel(queued.id)
+        runner.cancel(running.id)
+        _wait(running)
+        assert queued.status == CANCELLED and queued.result is None
+    finally:
+        runner.shutdown()
+
+
+def test_overlapping_months_conflict():
+    runner = JobRunner(workers=1)
+    started = threading.Event()
+    try:
+        job = runner.submit("generate", {}, _solve_until_cancelled(started), scope=frozenset({(2025, 11)}))
+        other_month = runner.submit("generate", {}, lambda job: 'ran', scope=frozenset({(2025, 12)}))
+        with pytest.raises(JobConflict):
+            runner.submit("generate-batch", {}, lambda job: 'ran', scope=frozenset({(2025, 10), (2025, 11)}))
+        runner.cancel(job.id)
+        _wait(job)
+        _wait(other_month)
+        assert other_month.status == SUCCEEDED and other_month.result == 'ran'
+    finally:
+        runner.shutdown()
+
+
+def test_claims_and_jobs_exclude_each_other():
+    runner = JobRunner(workers=1)
+    started = threading.Event()
+    try:
+        with runner.claim(frozenset({(2025, 11)})):
+            with pytest.raises(JobConflict):
+                runner.submit("generate", {}, lambda job: 'ran', scope=frozenset({(2025, 11)}))
+            with pytest.raises(JobConflict):
+                with runner.claim(frozenset({(2025, 11)})):
+                    pass
+        job = runner.submit("generate", {}, _solve_until_cancelled(started), scope=frozenset({(2025, 11)}))
+        with pytest.raises(JobConflict):
+            with runner.claim(frozenset({(2025, 11)})):
+                pass
+        runner.cancel(job.id)
+        _wait(job)
+        with runner.claim(frozenset({(2025, 11)})):
+            pass
+    finally:
+        runner.shutdown()
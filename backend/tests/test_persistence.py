@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.db import engine
+from app.engine.roster_engine import Shift as EngineShift
+from app.models import Shift
+from app.services.roster_service import RosterService
+
+
+def _calls(first: datetime, count: int, user_id: int = 3):
+    return [EngineShift(user_id=user_id, post_id=1, start=first + timedelta(days=i),
+                        end=first + timedelta(days=i, hours=16), shift_type='night_call')
+            for i in range(count)]
+
+
+def test_generated_shifts_are_persisted_in_a_few_statements(client, db):
+    service = RosterService(db)
+    first = datetime(2024, 1, 1, 17)
+    service.create_shift(3, 1, first, first + timedelta(hours=16), 'night_call')
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        # A duplicate in the batch and a row already in the database are both written once
+        created = service._persist_engine_shifts(_calls(first, 1200) + _calls(first + timedelta(days=5), 1))
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert len(created) == 1199
+    assert [row['start'] for row in created] == [first + timedelta(days=i) for i in range(1, 1200)]
+    assert all(row['id'] and row['shift_type'] == 'night_call' for row in created)
+    assert db.query(Shift).filter(Shift.user_id == 3).count() == 1200
+    # One lookup of existing keys, the bulk insert, and the read-back in chunks: nothing per row
+    assert len(statements) < 12
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.db import SQLITE_TUNED, ReadSessionLocal, engine, read_engine
+from app.models import Shift
+from app.services.roster_service import RosterService
+
+
+def test_sqlite_file_runs_in_wal_mode(client):
+    assert SQLITE_TUNED
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 0
+
+
+def test_read_pool_rejects_writes_and_sees_commits(client, db):
+    assert read_engine is not engine
+    RosterService(db).create_shift(4, 1, datetime(2024, 7, 1, 17), datetime(2024, 7, 2, 9), 'night_call')
+
+    read = ReadSessionLocal()
+    try:
+        assert read.query(Shift).filter(Shift.user_id == 4).count() == 1
+        with pytest.raises(OperationalError, match="readonly"):
+            read.execute(text("DELETE FROM shifts"))
+        read.rollback()
+    finally:
+        read.close()
+    assert db.query(Shift).filter(Shift.user_id == 4).count() == 1
@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.models import Shift
+
+
+def _seed(db, count=23):
+    # Several shifts share each start so the cursor has to break ties on id
+    rows = [dict(user_id=1 + i % 4, post_id=1, start=datetime(2026, 4, 1, 9) + timedelta(days=i // 3),
+                 end=datetime(2026, 4, 1, 17) + timedelta(days=i // 3), shift_type='base', labels={})
+            for i in range(count)]
+    db.execute(insert(Shift), rows)
+    db.commit()
+    return [s.id for s in db.query(Shift).order_by(Shift.start, Shift.id)]
+
+
+def test_cursor_walk_returns_every_row_once(client, db):
+    expected = _seed(db)
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 4, **({'cursor': cursor} if cursor else {})}
+        page = client.get('/api/roster/shifts', params=params).json()
+        seen += [s['id'] for s in page['shifts']]
+        assert page['total'] == len(expected)
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == expected
+    assert client.get('/api/roster/shifts', params={'cursor': 'not-a-cursor'}).status_code == 400
+
+
+def test_export_streams_every_matching_shift(client, db):
+    expected = _seed(db)
+    ndjson = client.get('/api/roster/shifts/export', params={'format': 'ndjson'})
+    assert ndjson.headers['content-type'].startswith('application/x-ndjson')
+    assert [json.loads(line)['id'] for line in ndjson.text.splitlines()] == expected
+
+    exported = client.get('/api/roster/shifts/export', params={'format': 'csv', 'user_id': 2})
+    rows = list(csv.DictReader(io.StringIO(exported.text)))
+    assert [int(r['id']) for r in rows] == [s.id for s in db.query(Shift).filter(Shift.user_id == 2)
+                                                                       .order_by(Shift.start, Shift.id)]
+
+
+def test_columns_format_matches_rows(client, db):
+    _seed(db)
+    for params in ({'limit': 5}, {'limit': 5, 'user_id': 3}, {'user_id': 99}):
+        rows = client.get('/api/roster/shifts', params=params).json()
+        columns = client.get('/api/roster/shifts', params={**params, 'format': 'columns'}).json()
+        assert (columns['total'], columns['next_cursor']) == (rows['total'], rows['next_cursor'])
+        names = list(columns['columns'])
+        assert [dict(zip(names, values)) for values in zip(*columns['columns'].values())] == rows['shifts']
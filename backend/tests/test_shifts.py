@@ -0,0 +1,56 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.roster_service import RosterService
+
+
+def test_shifts_longer_than_max_span_are_rejected(client, db):
+    body = {'user_id': 1, 'post_id': 1, 'start': '2026-01-05T09:00:00', 'end': '2026-01-13T09:00:00',
+            'shift_type': 'base', 'labels': {}}
+    assert client.post('/api/roster/shifts', json=body).status_code == 422
+
+    created = client.post('/api/roster/shifts', json=dict(body, end='2026-01-05T17:00:00'))
+    assert created.status_code == 201
+    shift_id = created.json()['id']
+    update = {'start': '2026-01-05T09:00:00', 'end': '2026-01-20T09:00:00', 'shift_type': 'base', 'labels': {}}
+    assert client.put(f'/api/roster/shifts/{shift_id}', json=update).status_code == 422
+
+    # The service checks the merged span too, for callers that bypass the schemas
+    with pytest.raises(ValueError):
+        RosterService(db).update_shift(shift_id, end=datetime(2026, 1, 20, 9))
+    with pytest.raises(ValueError):
+        RosterService(db).create_shift(1, 1, datetime(2026, 2, 1), datetime(2026, 2, 9), 'base')
+
+
+def _full(service, user_id):
+    result = service.validate_ewtd(user_id)
+    return Counter(result['violations']), Counter(result['warnings'])
+
+
+def test_write_deltas_match_full_validation(client, db):
+    rng = random.Random(3)
+    service = RosterService(db)
+    user_id, shift_ids, seen = 2, [], []
+    for step in range(40):
+        day = datetime(2025, 12, 1) + timedelta(days=rng.randrange(28), hours=rng.choice((8, 9, 13, 17)))
+        hours = rng.choice((1, 8, 12, 16, 20, 26))
+        shift_type = 'night_call' if hours >= 16 else 'base'
+        before = _full(service, user_id)
+        if shift_ids and step % 3 == 2:
+            shift_id = shift_ids.pop(rng.randrange(len(shift_ids)))
+            _, delta = service.delete_shift_checked(shift_id)
+        elif shift_ids and step % 3 == 1:
+            _, delta = service.update_shift_checked(rng.choice(shift_ids), start=day, end=day + timedelta(hours=hours))
+        else:
+            shift, delta = service.create_shift_checked(user_id, 1, day, day + timedelta(hours=hours), shift_type)
+            shift_ids.append(shift.id)
+        after = _full(service, user_id)
+        assert Counter(delta['new_violations']) == after[0] - before[0]
+        assert Counter(delta['resolved_violations']) == before[0] - after[0]
+        assert Counter(delta['new_warnings']) == after[1] - before[1]
+        assert Counter(delta['resolved_warnings']) == before[1] - after[1]
+        seen += delta['new_violations'] + delta['resolved_warnings']
+    assert seen
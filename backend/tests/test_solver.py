@@ -0,0 +1,76 @@
+import time
+from datetime import date, datetime, timedelta
+
+from app.engine.roster_engine import RosterEngine, UserConstraints
+from app.engine.solver import NightCallSolver, SolverResult, solve_multistart
+
+
+def _nights(first: date, count: int, every: int = 1):
+    return [(datetime.combine(first + timedelta(days=i * every), datetime.min.time()) + timedelta(hours=17),
+             datetime.combine(first + timedelta(days=i * every + 1), datetime.min.time()) + timedelta(hours=9))
+            for i in range(count)]
+
+
+def _solver(slots, user_ids, caps=None, history=None, seed=1):
+    return NightCallSolver(slots, user_ids, [set(user_ids)] * len(slots),
+                           caps or {u: 7 for u in user_ids}, {u: 11 for u in user_ids},
+                           {u: 3 for u in user_ids}, history_nights=history, seed=seed)
+
+
+def test_caps_leave_slots_unfilled_rather_than_break():
+    result = _solver(_nights(date(2025, 11, 3), 6, every=2), [1, 2], caps={1: 2, 2: 2}).solve(time_budget=0.5)
+    assert result.feasible and result.unfilled == 2
+    assert all(result.assignments.count(u) <= 2 for u in (1, 2))
+
+
+def test_runs_too_long_in_history_alone_are_not_hard_violations():
+    # Five nights in a row last month break the three-night limit on their own
+    history = {1: {date(2025, 10, 1) + timedelta(days=i) for i in range(5)}}
+    result = _solver(_nights(date(2025, 11, 3), 1), [1], history=history).solve(time_budget=5.0)
+    assert result.hard_violations == 0 and result.unfilled == 0
+    # Feasible and nothing left to balance: the search stops straight away
+    assert result.iterations == 0 and result.elapsed < 1.0
+
+
+def test_setup_counts_against_the_budget():
+    solver = _solver(_nights(date(2025, 11, 1), 30), list(range(1, 21)))
+    time.sleep(0.3)
+    began = time.perf_counter()
+    result = solver.solve(time_budget=0.2)
+    assert time.perf_counter() - began < 0.15
+    assert result.elapsed >= 0.3
+
+
+def test_generation_books_no_call_that_breaks_a_rule(monkeypatch):
+    engine = RosterEngine()
+    for uid in (1, 2):
+        engine.user_constraints[uid] = UserConstraints(user_id=uid, max_nights_per_month=2)
+
+    def everything_to_user_1(slots, user_ids, *args, **kwargs):
+        return SolverResult([1] * len(slots), hard_violations=len(slots), unfilled=0,
+                            fairness=0.0, iterations=0, elapsed=0.0)
+    monkeypatch.setattr(engine, '_solve_night_calls', everything_to_user_1)
+
+    summary = engine.generate_night_calls(month=11, year=2025, post_ids=[1], solver='anneal')
+    booked = [s for s in engine.store if s.shift_type == 'night_call']
+    assert [s.user_id for s in booked] == [1, 1]
+    assert summary['assigned'] == 2 and summary['hard_violations'] == summary['total_nights'] - 2
+    assert engine.validate_roster()['compliant']
+
+
+def _problem():
+    slots = _nights(date(2025, 11, 3), 8, every=2)
+    users = [1, 2, 3, 4]
+    return dict(slots=slots, user_ids=users, allowed=[set(users)] * len(slots), caps={u: 7 for u in users},
+                min_rest_hours={u: 11 for u in users}, max_consecutive={u: 3 for u in users})
+
+
+def test_multistart_in_processes_matches_in_process_runs():
+    reports = []
+    pooled = solve_multistart(_problem(), runs=3, time_budget=2.0, workers=2, seed=5, progress=reports.append)
+    in_process = solve_multistart(_problem(), runs=3, time_budget=2.0, workers=1, seed=5)
+    # Eight equal nights over four users balance exactly, so every run stops at its greedy start
+    assert pooled.feasible and pooled.unfilled == 0 and pooled.fairness == 0
+    assert (pooled.assignments, pooled.seed) == (in_process.assignments, in_process.seed)
+    assert pooled.seed == 5
+    assert [r['fraction'] for r in reports] == [1 / 3, 2 / 3, 1.0]
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from app.engine.roster_engine import RosterEngine
+from app.engine.shift_store import ShiftStore, to_minutes
+from app.engine.timeline import UserTimeline
+
+
+def _timeline(*periods):
+    store = ShiftStore()
+    timeline = UserTimeline(1, store)
+    timeline.load([store.append(1, 1, to_minutes(start), to_minutes(end), 'base') for start, end in periods])
+    return timeline
+
+
+def test_rest_before_runs_from_the_latest_end():
+    day = datetime(2025, 11, 3)
+    # A long shift with a short one starting inside it: rest runs from 20:00, not 10:00
+    timeline = _timeline((day.replace(hour=8), day.replace(hour=20)), (day.replace(hour=9), day.replace(hour=10)))
+    before, after = timeline.rest_gaps(day.replace(hour=22), day.replace(hour=23))
+    assert before == timedelta(hours=2)
+    assert after is None
+
+
+def test_remove_leave_drops_the_period_with_matching_end():
+    engine = RosterEngine()
+    day = datetime(2025, 11, 3)
+    engine.add_leave(1, day, day + timedelta(days=1))
+    engine.add_leave(1, day, day + timedelta(days=5))
+    assert engine.remove_leave(1, day, day + timedelta(days=5))
+    # The one-day period stays; the rest of the week is free again
+    timeline = engine.timelines.get(1)
+    assert timeline.on_leave(day.replace(hour=9), day.replace(hour=17))
+    assert not timeline.on_leave(day + timedelta(days=3), day + timedelta(days=3, hours=8))
+    assert not engine.remove_leave(1, day, day + timedelta(days=5))